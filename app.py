@@ -1,23 +1,49 @@
-import pandas as pd
+import click
 import numpy as np
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, make_response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
-from sklearn.ensemble import RandomForestClassifier
-from fpdf import FPDF
-import joblib
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import json
+import logging
+import queue
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from auth import HasherBusy, PasswordHasher, UserCache
+from migrations import add_missing_columns
+from storage import configure_database, read_only_endpoints, write_transaction
+from diagnosis_cache import DiagnosisCache
+from dialogue import DialogueEngine
+from inference import build_symptom_matrix, top_k
+from knowledge_base import KnowledgeBase
+from metrics import Metrics
+from model_registry import ModelRegistry
+from rate_limit import RateLimiter, parse_limits, retry_after_header
+from session_state import SessionState, Vocabulary
+from reports import ReportFailed, ReportService, ReportsUnavailable, report_key
+from retention import archived_messages, claim_run, finish_run, last_report, restore_session, run_maintenance
+from search import install_search, search_hits, search_supported
+from symptom_matcher import SymptomMatcher
+
+# LOG_LEVEL=DEBUG shows per-message detail; below the configured level log calls cost one check.
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+log = logging.getLogger('healthbot')
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'supersecretkey'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# DATABASE_URL, SQLite WAL/busy timeout and write transactions: see storage.py
+configure_database(app)
 
 db = SQLAlchemy(app)
+# Per-stage timers and /metrics; TRACE_SAMPLE_RATE logs the stage breakdown of that fraction of requests.
+metrics = Metrics(trace_sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', 0)))
+metrics.init_app(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -25,7 +51,7 @@ login_manager.login_view = 'login'
 # --- DATABASE MODELS ---
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(150), unique=True, nullable=False)
+    username = db.Column(db.String(150), unique=True, index=True, nullable=False)
     password = db.Column(db.String(150), nullable=False)
     sessions = db.relationship('ChatSession', backref='owner', lazy=True)
 
@@ -35,214 +61,286 @@ class ChatSession(db.Model):
     title = db.Column(db.String(100), default="New Consultation")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(50), default="started") 
-    collected_symptoms = db.Column(db.Text, default="[]") 
+    # Symptoms as a bitmask over the model's columns (see session_state.py), plus dialogue flags.
+    symptom_bits = db.Column(db.LargeBinary, nullable=True)
+    symptom_vocab = db.Column(db.String(16), nullable=True)
+    flags = db.Column(db.Text, nullable=False, default='', server_default='')
+    # Older versions stored a JSON list here; it is converted on the session's next turn (or by migrations.py).
+    collected_symptoms = db.Column(db.Text, nullable=True)
+    # Set once retention.py has moved the session's messages into chat_archive.
+    archived_at = db.Column(db.DateTime, nullable=True)
     messages = db.relationship('ChatMessage', backref='session', cascade="all, delete-orphan")
+    archive = db.relationship('ChatArchive', uselist=False, cascade="all, delete-orphan")
+
+    # Sidebar query: one user's sessions, newest first.
+    __table_args__ = (db.Index('ix_chat_session_user_created', 'user_id', 'created_at'),)
+
+class SymptomVocabulary(db.Model):
+    """ Column lists that session bitmasks were written against, so they stay readable after a retrain. """
+    digest = db.Column(db.String(16), primary_key=True)
+    columns = db.Column(db.Text, nullable=False)
 
 class ChatMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), index=True, nullable=False)
     sender = db.Column(db.String(10), nullable=False)
+    # 'text' messages hold their text; 'diagnosis' messages hold a compact JSON record (see encode_diagnosis).
+    kind = db.Column(db.String(10), nullable=False, default='text', server_default='text')
     content = db.Column(db.Text, nullable=False)
     options = db.Column(db.String(200), nullable=True) 
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class ChatArchive(db.Model):
+    """ An archived session's messages as one gzip-compressed JSON document (see retention.py). """
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), primary_key=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+class MaintenanceRun(db.Model):
+    """ One retention/compaction run; the newest start time keeps workers from running it twice. """
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    report = db.Column(db.Text, nullable=True)
+
+def init_db():
+    """ Creates missing tables, and missing indexes on tables made by older versions. """
+    with app.app_context():
+        db.create_all()
+        add_missing_columns(db.engine, db.metadata)
+        for table in db.metadata.tables.values():
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        # FTS5 tables and the triggers that keep them current (see search.py).
+        if search_supported(db.engine):
+            install_search(db.engine)
+        # Don't hand pooled connections to forked gunicorn workers.
+        db.engine.dispose()
+
+init_db()
+
+# pbkdf2 runs in a small process pool with admission control (see auth.py); PASSWORD_WORKERS=0 hashes inline.
+hasher = PasswordHasher(
+    workers=int(os.environ.get('PASSWORD_WORKERS', 1)),
+    max_pending=int(os.environ.get('PASSWORD_MAX_PENDING', 8)),
+)
+# Logged-in users are kept per worker for USER_CACHE_TTL seconds instead of re-read on every request (0 disables).
+user_cache = UserCache(ttl=float(os.environ.get('USER_CACHE_TTL', 60)))
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id), User.query.get)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def forget_user(mapper, connection, user):
+    user_cache.invalidate(user.id)
+
+# --- SESSION STATE ---
+_vocabularies = {}
+
+def model_vocabulary(loaded):
+    """ Vocabulary for a model's columns, recorded in the database the first time it is seen. """
+    vocab = _vocabularies.get(loaded.version)
+    if vocab is not None:
+        return vocab
+    vocab = Vocabulary(loaded.columns)
+    if db.session.get(SymptomVocabulary, vocab.digest) is None:
+        # Not cached until a later turn finds the row committed: this request may still roll back.
+        try:
+            with db.session.begin_nested():
+                db.session.add(SymptomVocabulary(digest=vocab.digest, columns=json.dumps(vocab.columns)))
+        except IntegrityError:
+            pass  # another worker recorded it first
+        return vocab
+    _vocabularies[loaded.version] = _vocabularies[vocab.digest] = vocab
+    return vocab
+
+def stored_vocabulary(digest):
+    if digest not in _vocabularies:
+        row = db.session.get(SymptomVocabulary, digest)
+        if row is None: return None
+        _vocabularies[digest] = Vocabulary(json.loads(row.columns))
+    return _vocabularies[digest]
+
+def load_state(chat_session, vocab):
+    """ The session's symptoms and flags over `vocab`, converting older formats on the way. """
+    if chat_session.symptom_bits is None:
+        return SessionState.from_names(vocab, json.loads(chat_session.collected_symptoms or '[]'))
+    if chat_session.symptom_vocab == vocab.digest:
+        return SessionState.from_columns(vocab, chat_session.symptom_bits, chat_session.flags)
+    # Written against another model's columns: re-lay the symptoms out over the current ones.
+    old = stored_vocabulary(chat_session.symptom_vocab)
+    names = old.names(old.unpack(chat_session.symptom_bits)) if old else []
+    return SessionState.from_names(vocab, names + chat_session.flags.split())
+
+def save_state(chat_session, state):
+    chat_session.symptom_bits = state.bits()
+    chat_session.symptom_vocab = state.vocab.digest
+    chat_session.flags = state.flags_text()
+    chat_session.collected_symptoms = None
+
+def session_symptoms(chat_session):
+    """ Symptom names for display; flags are left out. """
+    if chat_session.symptom_bits is None:
+        loaded = registry.get()
+        names = json.loads(chat_session.collected_symptoms or '[]')
+        return [s for s in names if s in loaded.column_index] if loaded else names
+    vocab = stored_vocabulary(chat_session.symptom_vocab)
+    return vocab.names(vocab.unpack(chat_session.symptom_bits)) if vocab else []
+
+# --- PAGINATION ---
+HISTORY_PAGE_SIZE = 50
+SESSION_PAGE_SIZE = 30
+SEARCH_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+def page_limit(default):
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+def encode_diagnosis(diagnosis):
+    return json.dumps(diagnosis, separators=(',', ':'))
+
+def serialize_message(msg):
+    options = msg.options.split(',') if msg.options else None
+    if msg.kind == 'diagnosis':
+        return {"id": msg.id, "sender": msg.sender, "kind": "diagnosis", "diagnosis": json.loads(msg.content), "options": options}
+    return {"id": msg.id, "sender": msg.sender, "kind": "text", "content": msg.content, "options": options}
+
+def details_for(messages):
+    """ Disease details for every diagnosis in a page of serialized messages, each sent once. """
+    keys = {m["diagnosis"]["details"] for m in messages if m["kind"] == "diagnosis"}
+    return {key: get_disease_details(key) for key in keys}
+
+def archived_page(messages, before_id, after_id, limit):
+    """ get_chat_history's cursor pages over an archived session's messages (oldest first). """
+    if after_id is not None:
+        rows = [m for m in messages if m.id > after_id][:limit + 1]
+        return rows[:limit], len(rows) > limit
+    if before_id is not None:
+        messages = [m for m in messages if m.id < before_id]
+    return messages[max(len(messages) - limit, 0):], len(messages) > limit
+
+def serialize_session(session):
+    return {"id": session.id, "title": session.title, "created_at": session.created_at.isoformat() if session.created_at else None}
+
+def session_page(user_id, before_id=None, limit=SESSION_PAGE_SIZE):
+    """ One page of a user's sessions, newest first, starting below the `before_id` cursor. """
+    query = ChatSession.query.filter(ChatSession.user_id == user_id)
+    if before_id is not None:
+        cursor = db.session.get(ChatSession, before_id)
+        if cursor is None or cursor.user_id != user_id:
+            return [], False
+        query = query.filter(db.or_(
+            ChatSession.created_at < cursor.created_at,
+            db.and_(ChatSession.created_at == cursor.created_at, ChatSession.id < cursor.id),
+        ))
+    rows = query.order_by(ChatSession.created_at.desc(), ChatSession.id.desc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
 
 # --- ML CONFIGURATION ---
-DATASET_PATH = 'Training.csv'  
+MAX_BATCH_ROWS = int(os.environ.get('MAX_BATCH_ROWS', 10000))
 MODEL_PATH = 'disease_model.pkl'
 COLUMNS_PATH = 'symptom_columns.pkl'
+MANIFEST_PATH = 'model_manifest.json'
+FREQUENCIES_PATH = 'symptom_frequencies.npz'
+SYNONYMS_PATH = os.path.join('data', 'symptom_synonyms.json')
+DISEASE_INFO_PATH = os.path.join('data', 'disease_info.json')
+DIALOGUE_RULES_PATH = os.environ.get('DIALOGUE_RULES_PATH', os.path.join('data', 'dialogue_rules.json'))
 
-def train_model_if_needed():
-    if not os.path.exists(MODEL_PATH):
-        try:
-            df = pd.read_csv(DATASET_PATH)
-            X = df.iloc[:, :-1] 
-            y = df.iloc[:, -1]  
-            model = RandomForestClassifier(n_estimators=100, random_state=42)
-            model.fit(X, y)
-            joblib.dump(model, MODEL_PATH)
-            joblib.dump(X.columns.tolist(), COLUMNS_PATH)
-            print("Model Trained.")
-        except Exception as e:
-            print(f"Error: {e}")
-
-train_model_if_needed()
+# The web app only loads artifacts; `python train.py` trains and promotes a new version.
+NO_MODEL_HINT = f"No model at {MODEL_PATH}. Run 'python train.py' to train and promote one."
+if not os.path.exists(MODEL_PATH):
+    log.warning(NO_MODEL_HINT)
+
+# Artifacts are loaded once per worker and hot-swapped when the files change on disk.
+registry = ModelRegistry(MODEL_PATH, COLUMNS_PATH, manifest_path=MANIFEST_PATH, mmap_mode=os.environ.get('MODEL_MMAP_MODE') or None,
+                         frequencies_path=FREQUENCIES_PATH)
+
+# When the model is loaded (see create_app):
+#   preload    - before serving. gunicorn.conf.py does this once in the master, and the forked
+#                workers share the loaded forest copy-on-write instead of each unpickling their own.
+#   background - in a thread once the worker is up; pages that don't need the model are served meanwhile.
+#   lazy       - on first use.
+MODEL_WARMUP = os.environ.get('MODEL_WARMUP') or ('lazy' if os.environ.get('PRELOAD_MODEL') == '0' else 'background')
+_warmup = {"pid": None, "thread": None, "error": None, "seconds": None}
+
+# Finished diagnoses keyed on (model version, symptom set). Set DIAGNOSIS_CACHE_PATH to share them across workers.
+diagnosis_cache = DiagnosisCache(
+    maxsize=int(os.environ.get('DIAGNOSIS_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('DIAGNOSIS_CACHE_TTL', 3600)),
+    path=os.environ.get('DIAGNOSIS_CACHE_PATH'),
+)
+
+# PDF reports render in a background process pool and are cached on disk, shared by all workers.
+REPORT_WAIT_SECONDS = float(os.environ.get('REPORT_WAIT_SECONDS', 10))
+reports = ReportService(
+    os.environ.get('REPORT_CACHE_DIR', 'report_cache'),
+    workers=int(os.environ.get('REPORT_WORKERS', 1)),
+)
+
+# Keyword table is compiled into a single regex once, instead of rebuilt on every message.
+SYMPTOM_MATCHER = SymptomMatcher.from_file(SYNONYMS_PATH)
+
+# Result-card details for every disease, built once; a diagnosis only looks its card up.
+KNOWLEDGE = KnowledgeBase.from_file(DISEASE_INFO_PATH)
+
+# Ranked diagnoses, and yes/no follow-up questions while the top one is below the confidence bar.
+TOP_K_RESULTS = 3
+FOLLOWUP_CANDIDATES = 5
+CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.6))
+MAX_FOLLOWUPS = int(os.environ.get('MAX_FOLLOWUPS', 3))
+FOLLOWUP_MIN_GAIN = 0.05
+AFFIRMATIVE = {'yes', 'yeah', 'yep', 'y', 'sure', 'correct'}
+
+# Clarifying questions and answer mappings, reloaded when the rule file is edited.
+DIALOGUE = DialogueEngine(DIALOGUE_RULES_PATH)
 
 # --- INTELLIGENCE ENGINE ---
 
 def extract_symptoms(user_text):
-    if not os.path.exists(COLUMNS_PATH): return None, []
-    symptom_columns = joblib.load(COLUMNS_PATH)
-    user_text = user_text.lower()
-    
-    symptom_map = {
-        'high_fever': ['fever', 'high temp', 'hot', 'temperature', 'burning up'],
-        'mild_fever': ['mild fever', 'low fever', 'slightly warm'],
-        'chills': ['chills', 'shivering', 'cold', 'shaking', 'freezing'],
-        'fatigue': ['tired', 'exhausted', 'drained', 'fatigued', 'lethargic', 'low energy', 'weak'],
-        'malaise': ['unwell', 'feeling bad', 'sick', 'body feels off'],
-        'muscle_pain': ['muscle pain', 'body ache', 'sore muscles', 'pain in body', 'aches'],
-        'sweating': ['sweat', 'perspiring', 'clammy', 'soaked', 'night sweats'],
-        'headache': ['head', 'migraine', 'head hurts', 'throbbing', 'pounding head'],
-        'dizziness': ['dizzy', 'spin', 'lightheaded', 'faint', 'woozy'],
-        'altered_sensorium': ['confused', 'drowsy', 'lost senses', 'disoriented', 'brain fog'],
-        'stomach_pain': ['stomach', 'belly', 'pain in tummy', 'abdominal', 'gut pain', 'cramps'],
-        'acidity': ['acid', 'heartburn', 'sour', 'reflux', 'burning stomach'],
-        'vomiting': ['vomit', 'puke', 'throw up', 'nausea', 'queasy', 'retching'],
-        'diarrhoea': ['diarrhea', 'loose motion', 'runny poop', 'the runs', 'watery stool'],
-        'cough': ['cough', 'coughing', 'dry cough'],
-        'breathlessness': ['breath', 'breathing', 'short of breath', 'cant breathe', 'gasping', 'panting'],
-        'chest_pain': ['chest', 'heart', 'ribs', 'tightness in chest', 'heart pain', 'pressure on chest'],
-        'throat_irritation': ['sore throat', 'itchy throat', 'throat hurts', 'scratchy throat'],
-        'runny_nose': ['runny nose', 'sniffles', 'watery nose'],
-        'congestion': ['congestion', 'stuffy', 'blocked nose', 'nose block'],
-        'continuous_sneezing': ['sneeze', 'sneezing', 'keep sneezing'],
-        'itching': ['itch', 'scratch', 'itchy skin'],
-        'skin_rash': ['rash', 'spots', 'redness', 'hives', 'bumps', 'breakout'],
-        'yellowish_skin': ['yellow skin', 'jaundice', 'pale', 'skin is yellow'],
-        'joint_pain': ['joint', 'knees', 'elbows', 'wrists', 'ankles', 'aching joints'],
-        'muscle_weakness': ['weak muscles', 'hard to lift', 'weakness', 'cant lift'],
-        'neck_pain': ['neck', 'stiff neck', 'cant turn head'],
-        'weakness_of_one_body_side': ['paralysis', 'cant move one side', 'numbness on one side', 'stroke', 'one side weak', 'drooping face'],
-        'weight_loss': ['lost weight', 'weight loss', 'skinny', 'thinning'], 
-        'weight_gain': ['gained weight', 'fat'],
-        'excessive_hunger': ['hungry', 'starving', 'eat a lot', 'always hungry'],
-        'polyuria': ['peeing a lot', 'lots of urine']
-    }
-    
-    detected = []
-    for col, keywords in symptom_map.items():
-        for k in keywords:
-            if k in user_text:
-                if col in symptom_columns:
-                    detected.append(col)
-                    break
-    return detected
-
-def get_next_question(current_symptoms):
-    # Rule 1: Chest Pain -> Heart Attack Check
-    if 'chest_pain' in current_symptoms and 'checked_chest' not in current_symptoms:
-        if 'breathlessness' not in current_symptoms and 'sweating' not in current_symptoms:
-            return ("Chest pain can be serious. Are you experiencing difficulty breathing or sweating?", "Yes Difficulty Breathing,Yes Sweating,No just Pain", "clarifying_chest")
-    
-    # Rule 2: Fever + Chills -> Malaria Check
-    if 'high_fever' in current_symptoms and 'chills' in current_symptoms and 'checked_malaria' not in current_symptoms:
-        if 'muscle_pain' not in current_symptoms:
-            return ("With fever and chills, do you also have body aches or excessive sweating?", "Yes Body Ache,Yes Sweating,No", "clarifying_malaria")
-    
-    # Rule 3: Diabetes Check
-    if ('polyuria' in current_symptoms or 'excessive_hunger' in current_symptoms) and 'checked_diabetes' not in current_symptoms:
-        return ("Have you noticed sudden weight loss or blurry vision?", "Yes Weight Loss,Yes Blurry Vision,No", "clarifying_diabetes")
-    
-    # Rule 4: Headache -> Migraine Check
-    if 'headache' in current_symptoms and 'migraine' not in current_symptoms and 'checked_headache' not in current_symptoms:
-        return ("To help me pinpoint the cause, where exactly is the pain?", "Forehead (Sinus),One Side (Migraine),Back of Head,All Over", "clarifying_headache")
-    
-    # Rule 5: Fever -> Viral/Rash Check
-    if 'high_fever' in current_symptoms and 'checked_fever' not in current_symptoms:
-        if 'skin_rash' not in current_symptoms:
-            return ("Are you also shivering or do you see a rash?", "Yes Shivering,I have a Rash too,No", "clarifying_fever")
-            
-    return None
+    loaded = registry.get()
+    if loaded is None: return []
+    symptom_columns = loaded.column_index
+    return [col for col in SYMPTOM_MATCHER.match(user_text) if col in symptom_columns]
 
 def get_disease_details(disease_name):
     """ Returns a dictionary with detailed educational info about the disease. """
-    
-    # Generic Fallback
-    default = {
-        "desc": "A medical condition affecting the body's normal functions.",
-        "causes": "Various factors including infections, genetics, or lifestyle.",
-        "risk": "Complications may arise if left untreated.",
-        "action": "Consult a general physician for a proper diagnosis.",
-        "link": f"https://www.google.com/search?q={disease_name}+symptoms+treatment"
-    }
+    return KNOWLEDGE.card(disease_name)
 
-    db = {
-        'Fungal infection': {
-            "desc": "A skin infection caused by a fungus.",
-            "causes": "Moisture trapped in skin folds, weak immune system, or contact with infected surfaces.",
-            "risk": "Can spread to other body parts or cause secondary bacterial infections.",
-            "action": "Keep the area dry. Use antifungal creams.",
-            "link": "https://www.healthline.com/health/fungal-infection"
-        },
-        'Allergy': {
-            "desc": "An immune system reaction to a foreign substance.",
-            "causes": "Pollen, pet dander, dust mites, or certain foods.",
-            "risk": "Can lead to sinus infections or severe anaphylaxis in rare cases.",
-            "action": "Identify triggers. Take antihistamines.",
-            "link": "https://www.mayoclinic.org/diseases-conditions/allergies/symptoms-causes/syc-20351497"
-        },
-        'GERD': {
-            "desc": "Gastroesophageal Reflux Disease (Acid Reflux).",
-            "causes": "Stomach acid flowing back into the tube connecting your mouth and stomach.",
-            "risk": "Esophageal damage, dental problems, and chronic cough.",
-            "action": "Avoid spicy food/caffeine. Don't lie down immediately after eating.",
-            "link": "https://www.webmd.com/heartburn-gerd/guide/reflux-disease-gerd-1"
-        },
-        'Heart attack': {
-            "desc": "A blockage of blood flow to the heart muscle.",
-            "causes": "Blocked arteries (coronary artery disease), blood clots.",
-            "risk": "Permanent heart damage, heart failure, or death.",
-            "action": "EMERGENCY: Call ambulance. Chew aspirin immediately.",
-            "link": "https://www.heart.org/en/health-topics/heart-attack"
-        },
-        'Migraine': {
-            "desc": "A headache of varying intensity, often accompanied by nausea and sensitivity to light.",
-            "causes": "Hormonal changes, stress, drinks (alcohol/caffeine), sensory stimuli.",
-            "risk": "Chronic daily headaches, status migrainosus.",
-            "action": "Rest in a dark, quiet room. Apply a cold compress.",
-            "link": "https://www.mayoclinic.org/diseases-conditions/migraine-headache/symptoms-causes/syc-20360201"
-        },
-        'Malaria': {
-            "desc": "A disease caused by a plasmodium parasite, transmitted by the bite of infected mosquitoes.",
-            "causes": "Bite of an infected Anopheles mosquito.",
-            "risk": "Kidney failure, seizures, mental confusion, coma, or death if untreated.",
-            "action": "Consult a doctor immediately for blood tests. Use mosquito nets.",
-            "link": "https://www.cdc.gov/malaria/about/disease.html"
-        },
-        'Jaundice': {
-            "desc": "A condition causing yellowing of the skin and eyes.",
-            "causes": "Excess bilirubin, hepatitis, gallstones, or tumors.",
-            "risk": "Liver failure, bleeding disorders, or kidney failure.",
-            "action": "Rest completely. Eat boiled, oil-free food. Drink sugarcane juice.",
-            "link": "https://www.nhs.uk/conditions/jaundice/"
-        },
-        'Typhoid': {
-            "desc": "A bacterial infection that can lead to a high fever, diarrhea, and vomiting.",
-            "causes": "Salmonella typhi bacteria via contaminated food or water.",
-            "risk": "Intestinal bleeding or holes (perforation), which can be fatal.",
-            "action": "Antibiotics are required. Drink only boiled water.",
-            "link": "https://www.mayoclinic.org/diseases-conditions/typhoid-fever/symptoms-causes/syc-20378661"
-        },
-        'Common Cold': {
-            "desc": "A viral infection of your nose and throat (upper respiratory tract).",
-            "causes": "Viruses (rhinoviruses) spread through air or contact.",
-            "risk": "Ear infections, asthma attacks, or sinusitis.",
-            "action": "Rest, hydration, and steam inhalation.",
-            "link": "https://www.mayoclinic.org/diseases-conditions/common-cold/symptoms-causes/syc-20351605"
-        },
-        'Paralysis (brain hemorrhage)': {
-            "desc": "Loss of muscle function in part of your body.",
-            "causes": "Stroke, spinal cord injury, or nerve damage.",
-            "risk": "Permanent disability, difficulty speaking or swallowing.",
-            "action": "EMERGENCY: Seek hospital admission immediately.",
-            "link": "https://medlineplus.gov/paralysis.html"
-        }
-    }
-    
-    return db.get(disease_name.strip(), default)
-
-def check_critical_rules(detected_symptoms):
-    if 'chest_pain' in detected_symptoms:
-        if 'breathlessness' in detected_symptoms or 'sweating' in detected_symptoms:
-            return "Heart attack"
-        return "Potential Heart Risk"
-    if 'weakness_of_one_body_side' in detected_symptoms or 'altered_sensorium' in detected_symptoms:
-        return "Paralysis (brain hemorrhage)"
-    return None
+def check_knowledge_base(loaded):
+    """ Logs the diagnoses (model classes and safety-check labels) that have no entry in the knowledge base. """
+    if loaded is None or loaded.model is None:
+        log.error("%s Until then /ready and /predict answer 503.", NO_MODEL_HINT)
+        return []
+    missing = KNOWLEDGE.missing([*loaded.model.classes_, *SAFETY_LABELS])
+    if missing:
+        log.warning("No disease info for %d diagnoses, they get a generic card: %s", len(missing), ', '.join(missing))
+    return missing
+
+def rank_diseases(loaded, state):
+    """ (labels, probabilities) of the most likely diseases for the session, best first. """
+    row = state.row()
+    proba = loaded.flat.predict_proba(row) if loaded.flat is not None else loaded.model.predict_proba(row)
+    labels, scores = top_k(proba, loaded.model.classes_, FOLLOWUP_CANDIDATES)
+    return [str(d) for d in labels[0]], [float(p) for p in scores[0]]
+
+def choose_followup(loaded, state, ranked):
+    """ The symptom column whose answer best separates the ranked candidates, or None. """
+    if loaded.frequencies is None:
+        return None
+    asked = [f[6:] for f in state.flags if f.startswith('asked:')]
+    if len(asked) >= MAX_FOLLOWUPS:
+        return None
+    exclude = state.mask.copy()
+    exclude[[loaded.column_index[c] for c in asked if c in loaded.column_index]] = True
+    labels = [d for d, _ in ranked]
+    best = loaded.frequencies.best_question(labels, [p for _, p in ranked], exclude, FOLLOWUP_MIN_GAIN)
+    return loaded.columns[best[0]] if best else None
+
+# Diagnoses apply_safety_check can give instead of the model's; the knowledge base needs entries for them too.
+SAFETY_LABELS = ("Migraine", "Viral Fever", "Gastritis or Anxiety")
 
 def apply_safety_check(prediction, detected_symptoms):
     if prediction == 'Paralysis (brain hemorrhage)':
@@ -253,13 +351,60 @@ def apply_safety_check(prediction, detected_symptoms):
         if 'chest_pain' not in detected_symptoms: return "Gastritis or Anxiety"
     return prediction
 
+def apply_safety_check_batch(predictions, X, column_index):
+    """ Same rules as apply_safety_check, applied to a whole column of predictions at once. """
+    predictions = np.asarray(predictions, dtype=object).copy()
+    by_column = X.tocsc()
+
+    def has(symptom):
+        idx = column_index.get(symptom)
+        if idx is None: return np.zeros(X.shape[0], dtype=bool)
+        return by_column[:, idx].toarray().ravel() > 0
+
+    paralysis = (predictions == 'Paralysis (brain hemorrhage)') & ~(has('weakness_of_one_body_side') | has('altered_sensorium'))
+    headache = has('headache')
+    predictions[paralysis & headache] = "Migraine"
+    predictions[paralysis & ~headache] = "Viral Fever"
+    predictions[(predictions == 'Heart attack') & ~has('chest_pain')] = "Gastritis or Anxiety"
+    return predictions
+
+# --- RATE LIMITING ---
+# Token buckets per user and per client IP (see rate_limit.py), e.g. RATE_LIMITS="predict=30/minute,new_chat=10/minute".
+# Buckets are per worker unless RATE_LIMIT_DB names a SQLite file all workers share. RATE_LIMITING=0 turns it off.
+RATE_LIMITING = os.environ.get('RATE_LIMITING', '1') == '1'
+rate_limiter = RateLimiter(
+    parse_limits(os.environ.get('RATE_LIMITS', 'predict=30/minute,predict_stream=30/minute,new_chat=10/minute')),
+    parse_limits(os.environ.get('IP_RATE_LIMITS', 'predict=120/minute,predict_stream=120/minute,new_chat=40/minute')),
+    path=os.environ.get('RATE_LIMIT_DB') or None,
+)
+# Behind a reverse proxy every request comes from the proxy's address; PROXY_FIX_X_FOR=1 trusts one X-Forwarded-For hop.
+if int(os.environ.get('PROXY_FIX_X_FOR', 0)):
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ['PROXY_FIX_X_FOR']))
+
+@app.before_request
+def check_rate_limit():
+    if not RATE_LIMITING or request.endpoint not in rate_limiter.endpoints:
+        return None
+    # Anonymous requests only count against their IP; login_required turns them away anyway.
+    user_id = current_user.id if current_user.is_authenticated else None
+    denied = rate_limiter.hit(request.endpoint, user_id, request.remote_addr)
+    if denied is None:
+        return None
+    scope, wait = denied
+    metrics.inc('healthbot_rate_limited_total', 'Requests refused by the rate limiter.', endpoint=request.endpoint, scope=scope)
+    retry_after = retry_after_header(wait)
+    return jsonify({'error': f"Too many requests. Please wait {retry_after}s and try again.",
+                    'retry_after': int(retry_after)}), 429, {'Retry-After': retry_after}
+
 # --- ROUTES ---
 
 @app.route('/')
 @login_required
 def home():
-    sessions = ChatSession.query.filter_by(user_id=current_user.id).order_by(ChatSession.created_at.desc()).all()
-    return render_template('index.html', user_name=current_user.username, sessions=sessions)
+    sessions, has_more = session_page(current_user.id)
+    with metrics.timer('render'):
+        return render_template('index.html', user_name=current_user.username, sessions=sessions, has_more_sessions=has_more)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -267,40 +412,60 @@ def login():
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password, password):
+        try:
+            valid = user is not None and hasher.verify(user.password, password)
+        except HasherBusy:
+            return auth_busy('login.html')
+        if valid:
             login_user(user)
             return redirect(url_for('home'))
         else:
             flash('Invalid credentials')
-    return render_template('login.html')
+    with metrics.timer('render'):
+        return render_template('login.html')
+
+def auth_busy(template):
+    """ Sign-in page with a 503 while the password hashing pool is full. """
+    metrics.inc('healthbot_auth_rejected_total', 'Logins and registrations refused because password hashing was saturated.')
+    flash('Too many sign-ins right now. Please try again in a few seconds.')
+    with metrics.timer('render'):
+        return render_template(template), 503, {'Retry-After': '2'}
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        # Hash before the first query: this request's transaction takes the SQLite write lock,
+        # and pbkdf2 shouldn't run while holding it.
+        try:
+            password_hash = hasher.hash(password)
+        except HasherBusy:
+            return auth_busy('register.html')
         if User.query.filter_by(username=username).first():
             flash('Username taken.')
             return redirect(url_for('register'))
-        new_user = User(username=username, password=generate_password_hash(password, method='pbkdf2:sha256'))
+        new_user = User(username=username, password=password_hash)
         db.session.add(new_user)
         db.session.commit()
         login_user(new_user)
         return redirect(url_for('home'))
-    return render_template('register.html')
+    with metrics.timer('render'):
+        return render_template('register.html')
 
 @app.route('/logout')
 @login_required
 def logout():
+    user_cache.invalidate(current_user.id)
     logout_user()
     return redirect(url_for('login'))
 
 @app.route('/new_chat', methods=['POST'])
 @login_required
 def new_chat():
-    new_session = ChatSession(user_id=current_user.id, title="New Consultation", status="started", collected_symptoms="[]")
+    new_session = ChatSession(user_id=current_user.id, title="New Consultation", status="started")
     db.session.add(new_session)
-    db.session.commit()
+    db.session.flush()  # assigns new_session.id; session and welcome message commit together
     
     user_name = current_user.username.capitalize()
     greetings = [f"Hello {user_name}, I'm Dr. Bot. How can I help you today?", f"Hi {user_name}. What symptoms are bothering you?"]
@@ -317,6 +482,7 @@ def delete_chat(session_id):
     if session.user_id != current_user.id: return jsonify({"error": "Unauthorized"}), 403
     db.session.delete(session)
     db.session.commit()
+    reports.invalidate(session_id)
     return jsonify({"success": True})
 
 @app.route('/get_chat_history/<int:session_id>')
@@ -324,267 +490,619 @@ def delete_chat(session_id):
 def get_chat_history(session_id):
     session = ChatSession.query.get_or_404(session_id)
     if session.user_id != current_user.id: return jsonify({"error": "Unauthorized"}), 403
-    messages = [{"sender": msg.sender, "content": msg.content, "options": msg.options.split(',') if msg.options else None} for msg in session.messages]
-    return jsonify({"messages": messages})
+
+    # Cursor pagination by message id: ?before_id= pages back through older messages,
+    # ?after_id= returns only what arrived since the client's newest message.
+    limit = page_limit(HISTORY_PAGE_SIZE)
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    if session.archived_at is not None:
+        with metrics.timer('archive'):
+            rows, has_more = archived_page(archived_messages(db.session, session_id), before_id, after_id, limit)
+        messages = [serialize_message(msg) for msg in rows]
+        return jsonify({"messages": messages, "details": details_for(messages), "has_more": has_more})
+    query = ChatMessage.query.filter(ChatMessage.session_id == session_id)
+    if after_id is not None:
+        rows = query.filter(ChatMessage.id > after_id).order_by(ChatMessage.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        if before_id is not None:
+            query = query.filter(ChatMessage.id < before_id)
+        rows = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+    messages = [serialize_message(msg) for msg in rows]
+    return jsonify({"messages": messages, "details": details_for(messages), "has_more": has_more})
+
+@app.route('/sessions')
+@login_required
+def list_sessions():
+    sessions, has_more = session_page(current_user.id, request.args.get('before_id', type=int), page_limit(SESSION_PAGE_SIZE))
+    return jsonify({"sessions": [serialize_session(s) for s in sessions], "has_more": has_more})
+
+@app.route('/search')
+@login_required
+def search():
+    """ Ranked full-text hits over the user's session titles and messages: ?q=, &limit=, &offset=. """
+    if not search_supported(db.engine):
+        return jsonify({"error": "Search is only available with the SQLite database"}), 501
+    query = request.args.get('q', '').strip()
+    limit = page_limit(SEARCH_PAGE_SIZE)
+    offset = max(0, request.args.get('offset', 0, type=int))
+    with metrics.timer('search'):
+        hits, has_more = search_hits(db.session, current_user.id, query, limit, offset)
+    sessions = {s.id: s for s in ChatSession.query.filter(ChatSession.id.in_({h["session_id"] for h in hits}))} if hits else {}
+    for hit in hits:
+        hit["session"] = serialize_session(sessions[hit["session_id"]])
+    return jsonify({"query": query, "hits": hits, "has_more": has_more,
+                    "next_offset": offset + len(hits) if has_more else None})
+
+def owned_session(session_id):
+    session = ChatSession.query.get_or_404(session_id)
+    return session if session.user_id == current_user.id else None
+
+def report_job(session):
+    """ Cache key and render arguments for a session's report; the key changes whenever its contents do. """
+    fields = {
+        "username": current_user.username,
+        "created_at": session.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        "title": session.title,
+        "symptoms": session_symptoms(session),
+    }
+    return report_key(session.id, **fields), fields
+
+def report_status(session, key):
+    status = reports.status(key)
+    return {"session_id": session.id, "job_id": key, "status": status,
+            "download_url": url_for('download_report', session_id=session.id) if status == 'ready' else None}
+
+def reports_unavailable():
+    """ 503 while the report pool is broken; the next request starts a new one. """
+    metrics.inc('healthbot_reports_unavailable_total', 'Report requests refused because the render pool was broken.')
+    return jsonify({"error": "Reports are temporarily unavailable. Please try again shortly."}), 503, {'Retry-After': '2'}
+
+@app.route('/reports/<int:session_id>', methods=['GET', 'POST'])
+@login_required
+def report_job_status(session_id):
+    session = owned_session(session_id)
+    if session is None: return jsonify({"error": "Unauthorized"}), 403
+    key, fields = report_job(session)
+    if request.method == 'POST':
+        try:
+            reports.submit(key, fields)
+        except ReportsUnavailable:
+            return reports_unavailable()
+    body = report_status(session, key)
+    return jsonify(body), 200 if body["status"] == 'ready' else 202
 
 @app.route('/download_report/<int:session_id>')
 @login_required
 def download_report(session_id):
-    session = ChatSession.query.get_or_404(session_id)
-    if session.user_id != current_user.id:
+    session = owned_session(session_id)
+    if session is None:
         return jsonify({"error": "Unauthorized"}), 403
 
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(200, 10, txt="HealthBot AI - Consultation Report", ln=True, align='C')
-    pdf.ln(10)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"Patient: {current_user.username}", ln=True)
-    pdf.cell(200, 10, txt=f"Date: {session.created_at.strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-    pdf.ln(10)
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, txt="Diagnosis Result:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"{session.title}", ln=True)
-    pdf.ln(5)
-    symptoms = json.loads(session.collected_symptoms)
-    formatted_symptoms = [s.replace('_', ' ').title() for s in symptoms]
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, txt="Reported Symptoms:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, txt=", ".join(formatted_symptoms) if formatted_symptoms else "No specific symptoms recorded.")
-    pdf.ln(10)
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(128, 128, 128)
-    pdf.multi_cell(0, 10, txt="Disclaimer: AI-generated report. Consult a doctor.")
-    response = make_response(pdf.output(dest='S').encode('latin-1'))
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=HealthBot_Report_{session.id}.pdf'
+    # Rendering happens in the report pool; a click waits briefly for it, then gets a job to poll.
+    key, fields = report_job(session)
+    try:
+        with metrics.timer('report'):
+            path = reports.get(key, fields, wait=REPORT_WAIT_SECONDS)
+    except FutureTimeout:
+        return jsonify(report_status(session, key)), 202
+    except ReportFailed:
+        return jsonify({"error": "The report could not be generated."}), 500
+    except ReportsUnavailable:
+        return reports_unavailable()
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'HealthBot_Report_{session.id}.pdf')
+
+@app.route('/reports/export')
+@login_required
+def export_reports():
+    sessions = ChatSession.query.filter_by(user_id=current_user.id).order_by(ChatSession.created_at.asc(), ChatSession.id.asc()).all()
+    items = [(f'HealthBot_Report_{s.id}.pdf',) + report_job(s) for s in sessions]
+    try:
+        chunks = reports.stream_zip(items)
+    except ReportsUnavailable:
+        return reports_unavailable()
+    response = app.response_class(chunks, mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename=HealthBot_Reports.zip'
     return response
 
-@app.route('/predict', methods=['POST'])
+read_only_endpoints.update(['report_job_status'])
+
+@app.route('/model_status')
+def model_status():
+    return jsonify(registry.status())
+
+@app.route('/ready')
+def ready():
+    """ Readiness probe: 200 once this worker can diagnose, 503 while the model is still loading. """
+    loaded = registry.current
+    if loaded is not None and loaded.model is not None:
+        return jsonify({"ready": True, "model_version": loaded.version, "warmup": MODEL_WARMUP,
+                        "warmup_seconds": _warmup["seconds"]})
+    if _warmup["error"]:
+        return jsonify({"ready": False, "state": "failed", "error": _warmup["error"]}), 503
+    if _warmup["seconds"] is not None:
+        return jsonify({"ready": False, "state": "no_model", "error": NO_MODEL_HINT}), 503
+    # A probe against a lazy worker is a good moment to start loading.
+    start_warmup()
+    return jsonify({"ready": False, "state": "loading"}), 503
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(diagnosis_cache.info())
+
+@metrics.gauge
+def model_and_cache_gauges():
+    # A scrape reports what is loaded; it never loads (or re-checks) the model itself.
+    loaded = registry.current
+    cache = diagnosis_cache.info()
+    gauges = [
+        ('healthbot_model_loaded', {}, int(loaded is not None and loaded.model is not None), 'Whether a model is loaded.'),
+        ('healthbot_model_reloads', {}, registry.reloads, 'Model (re)loads in this worker.'),
+        ('healthbot_dialogue_rule_reloads', {}, DIALOGUE.reloads, 'Dialogue rule file reloads in this worker.'),
+        ('healthbot_diagnosis_cache_size', {}, cache['size'], 'Entries in the in-memory diagnosis cache.'),
+        ('healthbot_diagnosis_cache_hit_rate', {}, cache['hit_rate'], 'Diagnosis cache hit rate.'),
+    ]
+    gauges += [('healthbot_diagnosis_cache_lookups', {'result': k}, cache[k], 'Diagnosis cache lookups by outcome.')
+               for k in ('hits', 'disk_hits', 'misses', 'evictions', 'expired')]
+    users = user_cache.info()
+    gauges += [('healthbot_user_cache_lookups', {'result': k}, users[k], 'Logged-in user lookups by outcome.')
+               for k in ('hits', 'misses')]
+    gauges.append(('healthbot_password_hashes', {}, hasher.stats['calls'], 'Password hashes and checks in this worker.'))
+    limits = rate_limiter.info()
+    gauges += [('healthbot_rate_limit_checks', {'result': k}, limits[k], 'Rate limit checks in this worker by outcome.')
+               for k in ('allowed', 'limited_user', 'limited_ip')]
+    gauges.append(('healthbot_rate_limit_buckets', {}, limits['buckets'], 'In-memory rate limit buckets in this worker.'))
+    if loaded is not None:
+        gauges.append(('healthbot_model_info', {'version': loaded.version,
+                                                'artifact': loaded.manifest.get('version') if loaded.manifest else ''},
+                       1, 'Served model version.'))
+        gauges.append(('healthbot_knowledge_base_missing', {},
+                       len(KNOWLEDGE.missing([*loaded.model.classes_, *SAFETY_LABELS])) if loaded.model is not None else None,
+                       'Diagnoses (model classes and safety-check labels) without a knowledge base entry.'))
+        gauges.append(('healthbot_model_load_seconds', {}, loaded.load_seconds, 'Time the current model took to load.'))
+    return gauges
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def parse_batch_rows():
+    """ Reads /predict_batch input: a JSON body {"items": [...]} or one JSON value per NDJSON line.
+    Returns (rows, top_k, ndjson); raises ValueError or TypeError on malformed input. """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        k, ndjson = 3, True
+    else:
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        elif not isinstance(data, dict):
+            raise TypeError("body must be a JSON object")
+        rows, k, ndjson = data.get('items', []), data.get('top_k', 3), False
+    if not isinstance(rows, list):
+        raise TypeError("items must be a list")
+    try:
+        k = int(request.args.get('top_k', k))
+    except (TypeError, ValueError):
+        raise ValueError("top_k must be an integer") from None
+    return rows, k, ndjson
+
+read_only_endpoints.update(['login', 'predict_batch'])
+
+@app.route('/predict_batch', methods=['POST'])
 @login_required
-def predict():
-    data = request.get_json()
-    user_text = data.get('message', '')
-    session_id = data.get('session_id')
-    
-    # --- DEBUG LINE ---
-    print(f"DEBUG: User said: {user_text}")
-    
-    chat_session = ChatSession.query.get(session_id)
-    if not chat_session:
-        return jsonify({'error': 'Session not found'}), 404
+def predict_batch():
+    try:
+        rows, k, ndjson = parse_batch_rows()
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Malformed batch request: {e}'}), 400
+    if len(rows) > MAX_BATCH_ROWS:
+        return jsonify({'error': f'Batch too large (max {MAX_BATCH_ROWS} rows)'}), 413
 
-    # 1. Save User Message
-    user_msg = ChatMessage(session_id=session_id, sender='user', content=user_text)
-    db.session.add(user_msg)
-    
-    # 2. Extract Symptoms
-    current_symptoms = json.loads(chat_session.collected_symptoms)
-    new_symptoms = [] 
-    
-    # --- FIX 1: TUPLE ERROR FIX ---
-    raw_result = extract_symptoms(user_text)
-    if isinstance(raw_result, tuple):
-        # Extract the list from the tuple if it exists
-        if len(raw_result) > 0 and isinstance(raw_result[0], list):
-             new_symptoms = raw_result[0]
-        elif len(raw_result) > 1 and isinstance(raw_result[1], list):
-             new_symptoms = raw_result[1]
+    loaded = registry.get()
+    if loaded is None or loaded.model is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+
+    # Each row is a list of symptom names, {"symptoms": [...]}, or {"message": "free text"}.
+    ids, symptom_lists = [], []
+    for i, row in enumerate(rows):
+        if isinstance(row, dict):
+            ids.append(row.get('id', i))
+            symptoms = row.get('symptoms')
+            if symptoms is None: symptoms = extract_symptoms(row.get('message', ''))
         else:
-             new_symptoms = []
-    else:
-        new_symptoms = raw_result if raw_result else []
-
-   # --- FIX 2: EXPANDED ANSWER MAPPER ---
-    user_lower = user_text.lower()
-    print(f"DEBUG: Checking keywords in '{user_lower}'") 
-
-    # 1. Headache/Sinus Logic
-    if "sinus" in user_lower:
-        new_symptoms.append("sinus_pressure")
-        new_symptoms.append("checked_headache") # Stop asking
-    elif "migraine" in user_lower or "one side" in user_lower:
-        new_symptoms.append("visual_disturbances")
-        new_symptoms.append("irritability")
-        new_symptoms.append("checked_headache")
-    elif "back of head" in user_lower:
-        new_symptoms.append("stiff_neck")
-        new_symptoms.append("checked_headache")
-    elif "all over" in user_lower:
-        new_symptoms.append("checked_headache") # Just generic headache
-
-    # 2. Fever/Malaria Logic
-    elif "body ache" in user_lower:
-        new_symptoms.append("muscle_pain")
-        new_symptoms.append("checked_malaria")
-    elif "shivering" in user_lower:
-        new_symptoms.append("chills")
-        new_symptoms.append("checked_fever")
-    elif "rash" in user_lower:
-        new_symptoms.append("skin_rash")
-        new_symptoms.append("checked_fever")
+            ids.append(i)
+            symptoms = row
+        symptom_lists.append(symptoms if isinstance(symptoms, list) else [])
+
+    X, unknown = build_symptom_matrix(symptom_lists, loaded.column_index)
+    results = []
+    if X.shape[0]:
+        with metrics.timer('batch_inference'):
+            proba = loaded.model.predict_proba(X)
+        labels, scores = top_k(proba, loaded.model.classes_, k)
+        safe = apply_safety_check_batch(labels[:, 0], X, loaded.column_index)
+        for i in range(X.shape[0]):
+            results.append({
+                'id': ids[i],
+                'prediction': safe[i],
+                'top_k': [{'disease': d, 'probability': round(float(p), 4)} for d, p in zip(labels[i], scores[i])],
+                'unknown_symptoms': unknown[i],
+            })
+
+    if ndjson:
+        return app.response_class((json.dumps(r) + '\n' for r in results), mimetype='application/x-ndjson')
+    return jsonify({'model_version': loaded.version, 'results': results})
+
+# --- CHAT TURNS ---
+# A turn has a cheap half (symptoms and clarifying questions) and a model half (ranking,
+# follow-ups, diagnosis), so /predict_stream can answer before inference has run.
+
+def reopen_archived(chat_session):
+    """ A new turn in an archived session first moves its messages back into chat_message. """
+    if chat_session.archived_at is not None:
+        with metrics.timer('archive'):
+            restore_session(db.session, chat_session.id)
+        db.session.expire(chat_session, ['archived_at'])
+
+def read_message(chat_session, user_text, loaded):
+    """ Merges the message's symptoms, and its answer to a pending follow-up, into the session. Returns (state, rules). """
+    with metrics.timer('session_state'):
+        state = load_state(chat_session, model_vocabulary(loaded))
     
-    # 3. Chest/Heart Logic
-    elif "difficulty breathing" in user_lower:
-        new_symptoms.append("breathlessness")
-        new_symptoms.append("checked_chest")
-    elif "sweating" in user_lower:
-        new_symptoms.append("sweating")
-        new_symptoms.append("checked_chest")
-        new_symptoms.append("checked_malaria") # Covers both
-        
-    # 4. Diabetes Logic
-    elif "weight loss" in user_lower:
-        new_symptoms.append("weight_loss")
-        new_symptoms.append("checked_diabetes")
-    elif "blurry" in user_lower:
-        new_symptoms.append("visual_disturbances")
-        new_symptoms.append("checked_diabetes")
-
-    # 5. THE "NO" LOGIC (Stop Loops)
-    elif "no" in user_lower:
-        # If user says "No", we mark the active questions as "checked"
-        # so they don't appear again.
-        new_symptoms.append("checked_chest")
-        new_symptoms.append("checked_malaria")
-        new_symptoms.append("checked_diabetes")
-        new_symptoms.append("checked_fever")
-        new_symptoms.append("checked_headache")
-        print("DEBUG: User said NO -> Skipping clarifying questions")
-    # ----------------------------------
-    # ----------------------------------
+    with metrics.timer('extract'):
+        new_symptoms = extract_symptoms(user_text)
+
+    # Answers to clarifying questions ("Forehead (Sinus)", "No", ...) map onto symptoms via the rule table.
+    with metrics.timer('dialogue'):
+        rules = DIALOGUE.get()
+        new_symptoms.extend(rules.answer(user_text))
+
+    # A pending "Do you also have ...?" follow-up is answered yes or no.
+    state_changed = False
+    for flag in [f for f in state.flags if f.startswith('ask:')]:
+        symptom = flag[4:]
+        if AFFIRMATIVE.intersection(user_text.lower().replace(',', ' ').split()):
+            new_symptoms.append(symptom)
+        state.flags.discard(flag)
+        state.flags.add('asked:' + symptom)
+        state_changed = True
     
     # Merge and Save
-    if new_symptoms:
-        for s in new_symptoms:
-            if s not in current_symptoms:
-                current_symptoms.append(s)
-        chat_session.collected_symptoms = json.dumps(current_symptoms)
-
-    # 3. Decision Logic
-    bot_response = ""
-    options = []
-    
+    if state.add(new_symptoms) or state_changed or chat_session.symptom_bits is None:
+        save_state(chat_session, state)
+    return state, rules
+
+def ask_before_diagnosing(chat_session, state, rules):
+    """ (text, options) to reply with without running the model, or None once it is time to rank diseases. """
     # If no symptoms found yet
-    if not current_symptoms:
-        bot_response = "I couldn't detect specific symptoms in that message. Could you describe your symptoms differently? (e.g., 'I have a headache and fever')"
+    if not state:
+        return "I couldn't detect specific symptoms in that message. Could you describe your symptoms differently? (e.g., 'I have a headache and fever')", []
+
+    # Check for clarifying questions, unless an answer already pins the diagnosis down
+    with metrics.timer('dialogue'):
+        symptom_set = state.names()
+        if chat_session.status != 'diagnosed' and not rules.should_diagnose(symptom_set):
+            next_q = rules.next_question(symptom_set)
+            if next_q:
+                return next_q.question, list(next_q.options)
+    return None
+
+def diagnose(chat_session, state, loaded):
+    """ Ranks the session's symptoms; returns (text, options, diagnosis, details) for a follow-up or a diagnosis. """
+    model_symptoms = state.symptoms()
+    cache_key = diagnosis_cache.key(loaded.version, model_symptoms)
+    cached = diagnosis_cache.get(cache_key)
     
-    else:
-        # Check for clarifying questions
-        next_q = get_next_question(current_symptoms)
+    if cached is None or "top_k" not in cached:
+        # The input row is unpacked straight from the session's bitmask
+        with metrics.timer('inference'):
+            labels, scores = rank_diseases(loaded, state)
         
-        # --- FIX 3: FORCE DIAGNOSIS (BREAK INFINITE LOOP) ---
-        force_predict = False
-        if "sinus_pressure" in current_symptoms or "visual_disturbances" in current_symptoms or "stiff_neck" in current_symptoms:
-            force_predict = True
-        # ----------------------------------------------------
-
-        if next_q and chat_session.status != 'diagnosed' and not force_predict:
-            # Ask the next question
-            question, opts, tag = next_q
-            bot_response = question
-            options = opts.split(',')
+        # Safety Checks
+        prediction = apply_safety_check(labels[0], model_symptoms)
         
-        else:
-            # --- MAKE PREDICTION ---
-            if not os.path.exists(MODEL_PATH):
-                bot_response = "System is initializing. Please try again in 10 seconds."
-            else:
-                model = joblib.load(MODEL_PATH)
-                columns = joblib.load(COLUMNS_PATH)
-                
-                # Prepare vector
-                input_vector = np.zeros(len(columns))
-                for symptom in current_symptoms:
-                    if symptom in columns:
-                        idx = columns.index(symptom)
-                        input_vector[idx] = 1
-                
-                prediction = model.predict([input_vector])[0]
-                
-                # Safety Checks
-                prediction = apply_safety_check(prediction, current_symptoms)
-                
-                # Get Educational Info
-                info = get_disease_details(prediction)
-                
-                # --- FIX 4: GENERATE CARD WITH MOBILE-FRIENDLY MAP LINK ---
-                bot_response = f"""
-                <div class="bg-teal-50 dark:bg-slate-700/50 p-4 rounded-xl border border-teal-100 dark:border-slate-600 mb-6 shadow-sm"> 
-                    <div class="flex items-center gap-3 mb-3 border-b border-teal-200 dark:border-slate-600 pb-2">
-                        <div class="w-10 h-10 bg-teal-100 dark:bg-teal-900 rounded-full flex items-center justify-center text-teal-600 dark:text-teal-400">
-                            <i class="fa-solid fa-user-doctor text-lg"></i>
-                        </div>
-                        <div>
-                            <p class="text-xs font-bold text-gray-400 uppercase tracking-wider">Analysis Result</p>
-                            <h3 class="text-lg font-bold text-gray-800 dark:text-white">{prediction}</h3>
-                        </div>
-                    </div>
-                    
-                    <div class="space-y-3 text-sm">
-                        <div>
-                            <p class="font-semibold text-gray-500 dark:text-gray-400 text-xs mb-1"><i class="fa-solid fa-circle-info"></i> ABOUT</p>
-                            <p class="text-gray-700 dark:text-gray-300 leading-relaxed">{info['desc']}</p>
-                        </div>
-                        
-                        <div class="grid grid-cols-1 md:grid-cols-2 gap-3">
-                            <div class="bg-white dark:bg-slate-800 p-3 rounded-lg">
-                                <p class="font-bold text-gray-500 text-xs mb-1">CAUSES</p>
-                                <p class="text-gray-600 dark:text-gray-400 text-xs">{info['causes']}</p>
-                            </div>
-                            <div class="bg-red-50 dark:bg-red-900/20 p-3 rounded-lg">
-                                <p class="font-bold text-red-500 text-xs mb-1">RISK IF IGNORED</p>
-                                <p class="text-red-600 dark:text-red-300 text-xs">{info['risk']}</p>
-                            </div>
-                        </div>
-
-                        <div class="bg-teal-100/50 dark:bg-teal-900/30 p-3 rounded-lg border border-teal-200 dark:border-teal-800/50">
-                            <p class="font-bold text-teal-700 dark:text-teal-400 text-xs mb-1"><i class="fa-solid fa-notes-medical"></i> IMMEDIATE ACTION</p>
-                            <p class="text-gray-700 dark:text-gray-300 font-medium">{info['action']}</p>
-                        </div>
-                    </div>
-
-                    <div class="mt-4 pt-3 border-t border-gray-200 dark:border-gray-600 text-center">
-                        <p class="text-[10px] text-gray-400 italic">
-                            <i class="fa-solid fa-triangle-exclamation"></i> 
-                            AI Prediction is not 100% accurate. This is not a substitute for professional medical advice. 
-                            <span class="block mt-1">Please consult a real doctor.</span>
-                        </p>
-                    </div>
-
-                    <div class="mt-4 flex gap-2">
-                        <a href="https://www.google.com/maps/search/?api=1&query=doctors+near+me" target="_blank"  class="flex-1 bg-teal-600 hover:bg-teal-700 text-white text-center py-2 rounded-lg text-sm font-semibold transition shadow-sm">
-                             <i class="fa-solid fa-user-doctor mr-1"></i> Find Doctor
-                        </a>
-                        <a href="{info['link']}" target="_blank" class="flex-1 bg-[#1e293b] hover:bg-black text-white text-center py-2 rounded-lg text-sm font-semibold transition shadow-sm">
-                            <i class="fa-solid fa-book-medical mr-1"></i> Read More
-                        </a>
-                    </div>
-                </div>
-                """
-                chat_session.status = 'diagnosed'
-                # Generate a title if it's the first diagnosis
-                if chat_session.title == "New Consultation":
-                    chat_session.title = f"Consultation: {prediction}"
-
-    # 4. Save Bot Message
-    bot_msg = ChatMessage(session_id=session_id, sender='bot', content=bot_response, options=",".join(options) if options else None)
+        cached = {"prediction": prediction, "top_k": [[d, round(p, 4)] for d, p in zip(labels, scores)]}
+        diagnosis_cache.set(cache_key, cached)
+    
+    prediction = cached["prediction"]
+    ranked = cached["top_k"]
+    confidence = ranked[0][1]
+
+    # Not sure yet: ask about the symptom that best separates the leading candidates.
+    # A safety-check override means the rules already decided, so it never waits on follow-ups.
+    followup = None
+    if chat_session.status != 'diagnosed' and confidence < CONFIDENCE_THRESHOLD and prediction == ranked[0][0]:
+        with metrics.timer('followup'):
+            followup = choose_followup(loaded, state, ranked)
+
+    if followup:
+        state.flags.add('ask:' + followup)
+        save_state(chat_session, state)
+        return f"To narrow it down: do you also have {followup.replace('_', ' ').strip()}?", ["Yes", "No"], None, {}
+
+    # Stored as a small record; the result card is rendered by the frontend.
+    diagnosis = {
+        "prediction": prediction, "details": prediction.strip(), "model": loaded.version,
+        "confidence": confidence if prediction == ranked[0][0] else None,
+        "top_k": [{"disease": d, "probability": p} for d, p in ranked[:TOP_K_RESULTS]],
+    }
+    chat_session.status = 'diagnosed'
+    # Generate a title if it's the first diagnosis
+    if chat_session.title == "New Consultation":
+        chat_session.title = f"Consultation: {prediction}"
+    return "", [], diagnosis, {diagnosis["details"]: get_disease_details(prediction)}
+
+def save_reply(chat_session, user_msg, bot_response, options, diagnosis, details):
+    """ Stores the bot's message, commits the turn and returns the /predict response body. """
+    if diagnosis:
+        bot_msg = ChatMessage(session_id=chat_session.id, sender='bot', kind='diagnosis', content=encode_diagnosis(diagnosis))
+    else:
+        bot_msg = ChatMessage(session_id=chat_session.id, sender='bot', content=bot_response, options=",".join(options) if options else None)
     db.session.add(bot_msg)
-    db.session.commit()
+    with metrics.timer('db_commit'):
+        db.session.commit()
     
-    return jsonify({
+    return {
         'response': bot_response, 
+        'diagnosis': diagnosis,
+        'details': details,
         'options': options,
-        'new_title': chat_session.title if chat_session.status == 'diagnosed' else None
-    })
+        'new_title': chat_session.title if chat_session.status == 'diagnosed' else None,
+        'message_ids': [user_msg.id, bot_msg.id]
+    }
 
+# Columns a turn changes on the session row.
+TURN_COLUMNS = ('symptom_bits', 'symptom_vocab', 'flags', 'collected_symptoms', 'status', 'title')
 
-if __name__ == '__main__':
+def session_columns(chat_session):
+    return {c: getattr(chat_session, c) for c in TURN_COLUMNS}
+
+def compute_turn(chat_session, user_text, loaded, ack=None):
+    """ Applies a turn to the session in memory; returns save_reply()'s arguments. """
+    reopen_archived(chat_session)
+    user_msg = ChatMessage(session_id=chat_session.id, sender='user', content=user_text)
+    db.session.add(user_msg)
+    state, rules = read_message(chat_session, user_text, loaded)
+    reply = ask_before_diagnosing(chat_session, state, rules)
+    if ack:
+        ack(state, reply)
+    if reply:
+        bot_response, options = reply
+        return user_msg, bot_response, options, None, {}
+    return (user_msg, *diagnose(chat_session, state, loaded))
+
+def play_turn(chat_session, find_session, user_text, loaded, ack=None):
+    """
+    Runs and commits a chat turn; returns the /predict body, or None if the session is gone.
+
+    The message is read and the model run in the request's read transaction, so SQLite's write
+    lock is only held to store the result. If another turn on the same session committed in the
+    meantime, this one is run again on top of it under the lock. find_session() re-reads the row.
+    """
+    # Restoring an archive or recording a new vocabulary writes mid-turn, so those turns hold the lock throughout.
+    if chat_session.archived_at is None and loaded.version in _vocabularies:
+        seen = session_columns(chat_session)
+        with db.session.no_autoflush:
+            user_msg, *reply = compute_turn(chat_session, user_text, loaded, ack)
+        changes = session_columns(chat_session)
+        ack = None  # already sent
+        db.session.rollback()
+        with write_transaction():
+            chat_session = find_session()
+            if chat_session is not None and session_columns(chat_session) == seen:
+                for column, value in changes.items():
+                    setattr(chat_session, column, value)
+                db.session.add(user_msg)
+                return save_reply(chat_session, user_msg, *reply)
+    db.session.rollback()
+    with write_transaction():
+        chat_session = find_session()
+        if chat_session is None:
+            return None
+        return save_reply(chat_session, *compute_turn(chat_session, user_text, loaded, ack))
+
+@app.route('/predict', methods=['POST'])
+@login_required
+def predict():
+    data = request.get_json()
+    user_text = data.get('message', '')
+    session_id = data.get('session_id')
+    
+    log.debug("predict session=%s message=%r", session_id, user_text)
+    
+    with metrics.timer('db_load'):
+        chat_session = ChatSession.query.get(session_id)
+    if not chat_session:
+        return jsonify({'error': 'Session not found'}), 404
+
+    loaded = registry.get()
+    if loaded is None or loaded.model is None:
+        return jsonify({'error': 'The diagnosis model is not available yet. Please try again later.'}), 503
+
+    body = play_turn(chat_session, lambda: ChatSession.query.get(session_id), user_text, loaded)
+    if body is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(body)
+
+# A turn's writes take the write lock in play_turn(), once the model has run.
+read_only_endpoints.update(['predict'])
+
+# --- STREAMING CHAT ---
+# /predict_stream runs the turn on a small thread pool and streams Server-Sent Events:
+# an "ack" naming the symptoms noted as soon as the message is read, then the "reply"
+# (the /predict body) once the model has run. Request threads only wait on a queue, so
+# with threaded workers (GUNICORN_THREADS) one process holds many open conversations
+# while at most INFERENCE_WORKERS turns use the CPU and database at a time.
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 2))
+INFERENCE_QUEUE = int(os.environ.get('INFERENCE_QUEUE', 64))
+STREAM_TIMEOUT_SECONDS = float(os.environ.get('STREAM_TIMEOUT_SECONDS', 30))
+STREAM_KEEPALIVE_SECONDS = 15
+# Threads start on first submit, so a preloading gunicorn master never forks with them running.
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='inference')
+inference_slots = threading.BoundedSemaphore(INFERENCE_QUEUE)
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def run_turn(user_id, session_id, user_text, events):
+    """ A whole chat turn on an inference thread; progress goes to `events` as (event, data) pairs. """
+    def ack(state, reply):
+        events.put(('ack', {'symptoms': [s.replace('_', ' ').strip() for s in state.symptoms()],
+                            'diagnosing': reply is None}))
+
+    def find_session():
+        return ChatSession.query.filter_by(id=session_id, user_id=user_id).first()
+
+    try:
+        with app.app_context():
+            with metrics.timer('db_load'):
+                chat_session = find_session()
+            if not chat_session:
+                events.put(('error', {'error': 'Session not found', 'status': 404}))
+                return
+            loaded = registry.get()
+            if loaded is None or loaded.model is None:
+                events.put(('error', {'error': 'The diagnosis model is not available yet. Please try again later.', 'status': 503}))
+                return
+            body = play_turn(chat_session, find_session, user_text, loaded, ack)
+            events.put(('reply', body) if body is not None else ('error', {'error': 'Session not found', 'status': 404}))
+    except Exception:
+        log.exception("Streaming turn failed for session %s", session_id)
+        events.put(('error', {'error': 'Something went wrong. Please try again.', 'status': 500}))
+    finally:
+        inference_slots.release()
+
+@app.route('/predict_stream', methods=['POST'])
+@login_required
+def predict_stream():
+    data = request.get_json(silent=True) or {}
+    user_text = data.get('message', '')
+    session_id = data.get('session_id')
+    log.debug("predict_stream session=%s message=%r", session_id, user_text)
+
+    # Full queue: turn the request away now rather than let it wait out the stream timeout.
+    if not inference_slots.acquire(blocking=False):
+        metrics.inc('healthbot_stream_rejected_total', 'Streaming turns refused because the inference queue was full.')
+        return jsonify({'error': 'The server is busy. Please try again in a moment.'}), 503
+    events = queue.Queue()
+    inference_pool.submit(run_turn, current_user.id, session_id, user_text, events)
+    # The turn uses its own connection; don't hold this one for as long as the stream is open.
+    db.session.close()
+
+    def stream():
+        deadline = time.monotonic() + STREAM_TIMEOUT_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield sse('error', {'error': 'Timed out waiting for a reply.', 'status': 504})
+                return
+            try:
+                event, payload = events.get(timeout=min(remaining, STREAM_KEEPALIVE_SECONDS))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse(event, payload)
+            if event != 'ack':
+                return
+
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx-style proxies not to buffer the events.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# The request itself only reads the user; the turn's writes happen on the inference thread.
+read_only_endpoints.update(['predict_stream'])
+
+
+# --- MAINTENANCE ---
+# Archiving sessions idle for RETENTION_DAYS (0 keeps everything live) and compacting the
+# database (see retention.py) never runs inside the web workers. `flask --app app maintenance`
+# runs it once, e.g. from cron; with MAINTENANCE_INTERVAL_HOURS set, the gunicorn master
+# runs that command on its own schedule (see gunicorn.conf.py). Both default to off.
+RETENTION_DAYS = float(os.environ.get('RETENTION_DAYS', 0))
+MAINTENANCE_INTERVAL_HOURS = float(os.environ.get('MAINTENANCE_INTERVAL_HOURS', 0))
+
+def maintain(retention_days=None, vacuum=True, if_due_hours=0):
+    """ One recorded maintenance run; None if another one started within if_due_hours. """
     with app.app_context():
-        db.create_all()
-    print("Starting Server...")
+        run_id = claim_run(db.engine, if_due_hours * 3600)
+        if run_id is None:
+            return None
+        report = run_maintenance(db.engine, RETENTION_DAYS if retention_days is None else retention_days, vacuum=vacuum)
+        finish_run(db.engine, run_id, report)
+        return report
+
+@app.cli.command('maintenance')
+@click.option('--days', type=float, default=None, help="Archive sessions idle this many days (default RETENTION_DAYS, 0 only compacts).")
+@click.option('--no-vacuum', is_flag=True, help="Skip ANALYZE/VACUUM.")
+@click.option('--if-due', type=float, default=0, metavar='HOURS', help="Do nothing if a run started within this many hours.")
+def maintenance_command(days, no_vacuum, if_due):
+    """ Archives idle sessions and compacts the database. """
+    report = maintain(days, vacuum=not no_vacuum, if_due_hours=if_due)
+    click.echo(json.dumps(report, indent=2) if report is not None else "Skipped: a maintenance run started recently.")
+
+@metrics.gauge
+def maintenance_gauges():
+    with app.app_context():
+        report = last_report(db.engine)
+    if report is None:
+        return []
+    archived = report["archived"] or {}
+    return [
+        ('healthbot_maintenance_archived_sessions', {}, archived.get("sessions", 0), 'Sessions archived by the last maintenance run.'),
+        ('healthbot_maintenance_reclaimed_bytes', {}, report.get("bytes_reclaimed"), 'Database bytes reclaimed by the last maintenance run.'),
+        ('healthbot_maintenance_seconds', {}, report["seconds"], 'Duration of the last maintenance run.'),
+    ]
+
+# --- STARTUP ---
+_warmup_lock = threading.Lock()
+
+def start_warmup():
+    """ Loads the model in a background thread, once per process. """
+    with _warmup_lock:
+        if _warmup["pid"] == os.getpid():
+            return _warmup["thread"]
+
+        def run():
+            start = time.perf_counter()
+            try:
+                check_knowledge_base(registry.get())
+            except Exception as e:
+                _warmup["error"] = repr(e)
+                log.exception("Model warmup failed")
+            _warmup["seconds"] = round(time.perf_counter() - start, 4)
+            log.info("Model warmup finished in %.2fs", _warmup["seconds"])
+
+        thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+        _warmup.update(pid=os.getpid(), thread=thread, error=None, seconds=None)
+        thread.start()
+        return thread
+
+@app.before_request
+def ensure_warmup():
+    # Threads don't survive a fork, so each worker starts its own on its first request
+    # (gunicorn.conf.py starts it earlier, right after the fork).
+    if MODEL_WARMUP == 'background' and _warmup["pid"] != os.getpid():
+        start_warmup()
+
+def create_app(warmup=None):
+    """ Entry point for servers: `gunicorn 'app:create_app()'`. Importing app.py never loads the model. """
+    global MODEL_WARMUP
+    MODEL_WARMUP = warmup or MODEL_WARMUP
+    if MODEL_WARMUP == 'preload':
+        start = time.perf_counter()
+        check_knowledge_base(registry.get())
+        _warmup.update(seconds=round(time.perf_counter() - start, 4))
+    return app
+
+if __name__ == '__main__':
+    log.info("Starting Server...")
+    create_app()
     app.run(debug=True, port=5000)
\ No newline at end of file
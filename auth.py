@@ -0,0 +1,129 @@
+"""
+Password hashing off the request threads, and a per-worker cache of logged-in users.
+
+pbkdf2 is slow on purpose: each hash or check is tens of milliseconds of pure CPU
+that holds the GIL. Run inline, a burst of logins stalls every other thread in
+the worker, chat turns included. PasswordHasher runs them in a small process pool
+and admits at most `max_pending` at once. Past that it raises HasherBusy straight
+away, so the caller can answer 503 instead of queueing more CPU work.
+
+Flask-Login loads the user on every authenticated request. UserCache keeps the
+few fields requests read (id, username) for `ttl` seconds, so a chat turn does
+not cost an extra SELECT. Entries are per worker: invalidate() only clears the
+worker that handled the change, so the other workers keep serving the old identity
+until its TTL runs out. Keep USER_CACHE_TTL short for that reason.
+"""
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from multiprocessing import get_context
+
+from flask_login import UserMixin
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_METHOD = 'pbkdf2:sha256'
+
+
+class HasherBusy(Exception):
+    """ The hashing pool is full, or a call did not finish within its timeout. """
+
+
+def _hash(password):
+    return generate_password_hash(password, method=HASH_METHOD)
+
+
+class PasswordHasher:
+    def __init__(self, workers=1, max_pending=8, timeout=10):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "rejected": 0}
+
+    def _executor(self):
+        # Created lazily in each worker process; a pool must not be inherited across fork.
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'))
+                self._pool_pid = os.getpid()
+                # Otherwise the pool's children outlive a process that exits without shutting it down.
+                atexit.register(self.close)
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pool_pid == os.getpid():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _call(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.stats["rejected"] += 1
+            raise HasherBusy()
+        try:
+            self.stats["calls"] += 1
+            if not self.workers:
+                return fn(*args)
+            return self._executor().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy() from None
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._call(_hash, password)
+
+    def verify(self, password_hash, password):
+        return self._call(check_password_hash, password_hash, password)
+
+
+class UserIdentity(UserMixin):
+    """ The logged-in user as requests see it; not bound to any database session. """
+    __slots__ = ('id', 'username')
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+
+class UserCache:
+    def __init__(self, ttl=60, maxsize=4096):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, user_id, load):
+        """ The cached identity for `user_id`, or `load(user_id)` (a User or None) on a miss. """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+        user = load(user_id)
+        if user is None:
+            return None
+        identity = UserIdentity(user.id, user.username)
+        if self.ttl > 0:
+            with self._lock:
+                if len(self._entries) >= self.maxsize:
+                    self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) < self.maxsize:
+                    self._entries[user_id] = (now + self.ttl, identity)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries), ttl=self.ttl)
@@ -0,0 +1,153 @@
+"""
+Authentication costs: login throughput, chat latency during a login storm, and
+database queries per authenticated request.
+
+  storm   - --logins concurrent logins (real pbkdf2 hashes) while one client keeps
+            calling GET /sessions. Run once with hashing inline and once through
+            the password pool, and reports logins/s, rejected (503) logins and
+            the chat client's latency percentiles.
+  queries - SQL statements per request for a few authenticated routes, with the
+            user cache off and on.
+
+Run from the project root (after python train.py):
+    python -m benchmarks.bench_auth
+    python -m benchmarks.bench_auth --logins 64 --threads 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+def percentiles_ms(samples):
+    if not samples:
+        return "no samples"
+    p50, p95, p99 = (float(np.percentile(samples, q)) * 1e3 for q in (50, 95, 99))
+    return f"p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms"
+
+
+def storm(healthbot, hasher, logins, threads):
+    healthbot.hasher = hasher
+    chat = healthbot.app.test_client()
+    chat.post('/login', data={'username': 'bench0', 'password': 'bench'})
+    stop = threading.Event()
+    chat_latency = []
+
+    def chat_loop():
+        while not stop.is_set():
+            start = time.perf_counter()
+            chat.get('/sessions')
+            chat_latency.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    todo = list(range(logins))
+    lock = threading.Lock()
+    outcomes = {"ok": 0, "rejected": 0, "failed": 0}
+
+    def login_loop():
+        client = healthbot.app.test_client()
+        while True:
+            with lock:
+                if not todo:
+                    return
+                i = todo.pop()
+            response = client.post('/login', data={'username': f'bench{i % 8}', 'password': 'bench'})
+            key = "ok" if response.status_code == 302 else "rejected" if response.status_code == 503 else "failed"
+            with lock:
+                outcomes[key] += 1
+
+    chatter = threading.Thread(target=chat_loop)
+    chatter.start()
+    start = time.perf_counter()
+    workers = [threading.Thread(target=login_loop) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    wall = time.perf_counter() - start
+    stop.set()
+    chatter.join()
+    return outcomes, wall, chat_latency
+
+
+def count_queries(healthbot, ttl, requests):
+    from sqlalchemy import event
+
+    healthbot.user_cache.ttl = ttl
+    healthbot.user_cache._entries.clear()
+    client = healthbot.app.test_client()
+    client.post('/login', data={'username': 'bench0', 'password': 'bench'})
+    sid = client.post('/new_chat').get_json()['session_id']
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    routes = {
+        "GET /sessions": lambda: client.get('/sessions'),
+        "GET /get_chat_history": lambda: client.get(f'/get_chat_history/{sid}'),
+        "POST /predict": lambda: client.post('/predict', json={'message': 'I have a headache', 'session_id': sid}),
+    }
+    with healthbot.app.app_context():
+        engine = healthbot.db.engine
+    results = {}
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        for name, call in routes.items():
+            call()  # warm the cache
+            statements.clear()
+            for _ in range(requests):
+                call()
+            results[name] = len(statements) / requests
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Login throughput and per-request query counts.")
+    parser.add_argument('--logins', type=int, default=48)
+    parser.add_argument('--threads', type=int, default=8, help="concurrent login clients")
+    parser.add_argument('--pool-workers', type=int, default=1)
+    parser.add_argument('--max-pending', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50, help="requests per route when counting queries")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='healthbot-auth-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['REPORT_CACHE_DIR'] = os.path.join(workdir, 'reports')
+    # One client sends every request; the per-user limits would turn most of them away.
+    os.environ.setdefault('RATE_LIMITING', '0')
+    import app as healthbot
+    from auth import PasswordHasher, _hash
+
+    with healthbot.app.app_context():
+        password_hash = _hash('bench')
+        healthbot.db.session.add_all(healthbot.User(username=f'bench{i}', password=password_hash) for i in range(8))
+        healthbot.db.session.commit()
+
+    print(f"Login storm: {args.logins} logins from {args.threads} threads, one chat client polling /sessions")
+    for label, hasher in (("inline", PasswordHasher(workers=0, max_pending=args.logins)),
+                          (f"pool ({args.pool_workers} proc, {args.max_pending} pending)",
+                           PasswordHasher(workers=args.pool_workers, max_pending=args.max_pending))):
+        if hasher.workers:
+            hasher.verify(password_hash, 'bench')  # start the pool outside the measurement
+        outcomes, wall, chat_latency = storm(healthbot, hasher, args.logins, args.threads)
+        print(f"  {label:<28} {outcomes['ok'] / wall:6.1f} logins/s  ok {outcomes['ok']}  "
+              f"rejected {outcomes['rejected']}  failed {outcomes['failed']}  | chat {percentiles_ms(chat_latency)}")
+
+    print("\nSQL statements per request")
+    off = count_queries(healthbot, 0, args.requests)
+    on = count_queries(healthbot, 60, args.requests)
+    print(f"  {'route':<24} {'cache off':>10} {'cache on':>10}")
+    for name in off:
+        print(f"  {name:<24} {off[name]:>10.1f} {on[name]:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
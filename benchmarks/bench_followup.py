@@ -0,0 +1,73 @@
+"""
+Latency budget for the diagnosis decision step: ranking the top-k diseases with
+predict_proba and, when the best one is below the confidence bar, choosing the
+information-gain follow-up question.
+
+Exits non-zero when the p99 of a decision exceeds the budget, so it can gate a release.
+
+Run from the project root (after python train.py):
+    python -m benchmarks.bench_followup
+    python -m benchmarks.bench_followup --budget-ms 2 --samples 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency budget for top-k ranking + follow-up selection.")
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--budget-ms', type=float, default=5.0, help="maximum allowed p99 per decision")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Throwaway database: importing app.py initialises one.
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    import app as healthbot
+    from session_state import SessionState, Vocabulary
+
+    loaded = healthbot.registry.get()
+    if loaded is None or loaded.model is None:
+        print("No model loaded; run 'python train.py' first.")
+        return 1
+    if loaded.frequencies is None:
+        print(f"No symptom frequencies at {healthbot.FREQUENCIES_PATH}; follow-up selection is not measured.")
+
+    vocab = Vocabulary(loaded.columns)
+    rng = np.random.default_rng(args.seed)
+    states = []
+    for _ in range(args.samples):
+        names = rng.choice(loaded.columns, size=rng.integers(1, 6), replace=False)
+        states.append(SessionState.from_names(vocab, names))
+
+    for state in states[:50]:  # warm-up
+        healthbot.rank_diseases(loaded, state)
+
+    timings, asked = [], 0
+    for state in states:
+        start = time.perf_counter()
+        labels, scores = healthbot.rank_diseases(loaded, state)
+        if scores[0] < healthbot.CONFIDENCE_THRESHOLD:
+            asked += healthbot.choose_followup(loaded, state, list(zip(labels, scores))) is not None
+        timings.append(time.perf_counter() - start)
+
+    p50, p95, p99 = (percentile_ms(timings, q) for q in (50, 95, 99))
+    print(f"{len(timings)} decisions ({asked} asked a follow-up): "
+          f"p50 {p50:.3f} ms  p95 {p95:.3f} ms  p99 {p99:.3f} ms  (budget {args.budget_ms} ms)")
+    if p99 > args.budget_ms:
+        print("FAIL: p99 over budget")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
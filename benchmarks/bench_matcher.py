@@ -0,0 +1,60 @@
+"""
+Microbenchmark: compiled SymptomMatcher vs the old nested keyword scan.
+
+Run from the project root:
+    python -m benchmarks.bench_matcher
+"""
+import json
+import random
+import timeit
+
+from symptom_matcher import SymptomMatcher
+
+SYNONYMS_PATH = 'data/symptom_synonyms.json'
+
+FILLER = ("i have been feeling like this since monday and i do not know what to do "
+          "my family says i should rest but work is busy and i keep going ").split()
+
+
+def legacy_extract(table, user_text):
+    # The loop extract_symptoms() used to run: substring test for every keyword.
+    user_text = user_text.lower()
+    detected = []
+    for col, keywords in table.items():
+        for k in keywords:
+            if k in user_text:
+                detected.append(col)
+                break
+    return detected
+
+
+def make_message(table, n_words, rng):
+    phrases = [p for ps in table.values() for p in ps]
+    words = []
+    while len(words) < n_words:
+        words.extend(rng.choice(FILLER) for _ in range(8))
+        words.append(rng.choice(phrases))
+    return ' '.join(words[:n_words])
+
+
+def main():
+    with open(SYNONYMS_PATH) as f:
+        table = json.load(f)
+    matcher = SymptomMatcher(table)
+    rng = random.Random(0)
+
+    print(f"{'words':>8} {'symptoms':>9} {'legacy us':>12} {'compiled us':>12} {'speedup':>8}")
+    cases = [(n, True) for n in (10, 100, 1000, 10000)] + [(n, False) for n in (100, 10000)]
+    for n_words, with_symptoms in cases:
+        if with_symptoms:
+            msg = make_message(table, n_words, rng)
+        else:
+            msg = ' '.join(rng.choice(FILLER) for _ in range(n_words))
+        number = max(1, 20000 // n_words)
+        legacy = min(timeit.repeat(lambda: legacy_extract(table, msg), number=number, repeat=5)) / number
+        compiled = min(timeit.repeat(lambda: matcher.match(msg), number=number, repeat=5)) / number
+        print(f"{n_words:>8} {'yes' if with_symptoms else 'no':>9} {legacy * 1e6:>12.1f} {compiled * 1e6:>12.1f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
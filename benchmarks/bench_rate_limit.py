@@ -0,0 +1,107 @@
+"""
+Rate limiter overhead: the cost of one check (a user bucket and an IP bucket) in
+memory and in the shared SQLite mode, and the latency it adds to a request.
+
+The request comparison limits GET /sessions (cheap and read-only) with limits too
+high to be reached, and times it with the limiter on and off in alternating rounds.
+
+Run from the project root:
+    python -m benchmarks.bench_rate_limit
+    python -m benchmarks.bench_rate_limit --checks 200000 --users 10000 --budget-us 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+UNREACHABLE = 'sessions=1000000000/second'
+
+
+def time_checks(limiter, checks, users, threads=1):
+    """ Mean microseconds per hit() over `checks` calls spread across `users` users and IPs. """
+    per_thread = checks // threads
+
+    def run(offset):
+        for i in range(per_thread):
+            u = (i + offset) % users
+            limiter.hit('sessions', u, f"10.0.{u >> 8 & 255}.{u & 255}")
+
+    workers = [threading.Thread(target=run, args=(t * 7919,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e6
+
+
+def time_route(healthbot, client, requests, rounds):
+    """ Median /sessions latency in microseconds with the limiter (on, off), alternating rounds. """
+    samples = {True: [], False: []}
+    for r in range(rounds * 2):
+        enabled = r % 2 == 0
+        healthbot.RATE_LIMITING = enabled
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get('/sessions')
+            samples[enabled].append(time.perf_counter() - start)
+    healthbot.RATE_LIMITING = True
+    return statistics.median(samples[True]) * 1e6, statistics.median(samples[False]) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-request overhead of the rate limiter.")
+    parser.add_argument('--checks', type=int, default=100000, help="limiter checks per mode")
+    parser.add_argument('--users', type=int, default=5000, help="distinct users (and IPs) the checks cycle through")
+    parser.add_argument('--threads', type=int, default=4, help="threads for the contended run")
+    parser.add_argument('--requests', type=int, default=500, help="requests per round in the route comparison")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--budget-us', type=float, default=50.0, help="fail if an in-memory check costs more")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='healthbot-ratelimit-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['REPORT_CACHE_DIR'] = os.path.join(workdir, 'reports')
+    os.environ['MODEL_WARMUP'] = 'lazy'
+    os.environ['RATE_LIMITS'] = os.environ['IP_RATE_LIMITS'] = UNREACHABLE
+    import app as healthbot
+    from rate_limit import RateLimiter, parse_limits
+
+    limits = parse_limits(UNREACHABLE)
+    memory = RateLimiter(limits, limits)
+    shared = RateLimiter(limits, limits, path=os.path.join(workdir, 'rate_limit.db'))
+    results = [
+        ("memory, 1 thread", time_checks(memory, args.checks, args.users)),
+        (f"memory, {args.threads} threads", time_checks(memory, args.checks, args.users, args.threads)),
+        ("shared sqlite, 1 thread", time_checks(shared, args.checks // 10, args.users)),
+        (f"shared sqlite, {args.threads} threads", time_checks(shared, args.checks // 10, args.users, args.threads)),
+    ]
+    print(f"\n{'limiter check (user + ip bucket)':<36} {'us/check':>9}")
+    for name, us in results:
+        print(f"{name:<36} {us:>9.2f}")
+    print(f"in-memory buckets: {memory.info()['buckets']}")
+
+    with healthbot.app.app_context():
+        user = healthbot.User(username='ratelimit', password='x')
+        healthbot.db.session.add(user)
+        healthbot.db.session.commit()
+        user_id = user.id
+    client = healthbot.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    client.get('/sessions')
+    on, off = time_route(healthbot, client, args.requests, args.rounds)
+    print(f"\nGET /sessions median: {off:.1f} us without the limiter, {on:.1f} us with it ({on - off:+.1f} us)")
+
+    if results[0][1] > args.budget_us:
+        print(f"FAIL: an in-memory check costs {results[0][1]:.1f} us, over the {args.budget_us:.0f} us budget")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Retention on a seeded database spanning two years: what one maintenance run archives
+and reclaims, query latency before and after it, and what reading an archived session
+back costs through GET /get_chat_history.
+
+Run from the project root:
+    python -m benchmarks.bench_retention
+    python -m benchmarks.bench_retention --users 200 --sessions 50 --messages 40 --days 90
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+LINES = ["I have a fever and chills", "Yes Body Ache", "No", "my head hurts and I feel dizzy",
+         "To narrow it down: do you also have vomiting?", "I've had a cough since yesterday"]
+
+
+def seed(healthbot, rng, users, sessions_per_user, messages, span_days):
+    """ Sessions spread evenly over the last span_days, each with `messages` messages, written in bulk. """
+    db, ChatSession, ChatMessage = healthbot.db, healthbot.ChatSession, healthbot.ChatMessage
+    now = datetime.utcnow()
+    with healthbot.app.app_context():
+        for u in range(users):
+            user = healthbot.User(username=f'retention{u}', password='x')
+            db.session.add(user)
+            db.session.flush()
+            for _ in range(sessions_per_user):
+                started = now - timedelta(days=rng.uniform(0, span_days))
+                chat = ChatSession(user_id=user.id, title="Consultation: Malaria", status='diagnosed', created_at=started)
+                db.session.add(chat)
+                db.session.flush()
+                db.session.execute(ChatMessage.__table__.insert(), [
+                    {"session_id": chat.id, "sender": 'user' if i % 2 == 0 else 'bot', "kind": 'text',
+                     "content": rng.choice(LINES), "timestamp": started + timedelta(minutes=i)} for i in range(messages)
+                ])
+            db.session.commit()
+
+
+def time_history(client, session_ids, repeats):
+    samples = []
+    for _ in range(repeats):
+        for session_id in session_ids:
+            start = time.perf_counter()
+            client.get(f'/get_chat_history/{session_id}')
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="One retention/compaction run on a large seeded database.")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--sessions', type=int, default=40, help="sessions per user")
+    parser.add_argument('--messages', type=int, default=30, help="messages per session")
+    parser.add_argument('--span-days', type=float, default=730, help="sessions are spread over this many days")
+    parser.add_argument('--days', type=float, default=180, help="retention: archive sessions idle this long")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='healthbot-retention-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['REPORT_CACHE_DIR'] = os.path.join(workdir, 'reports')
+    os.environ['MODEL_WARMUP'] = 'lazy'
+    os.environ['RATE_LIMITING'] = '0'
+    import app as healthbot
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    seed(healthbot, rng, args.users, args.sessions, args.messages, args.span_days)
+    print(f"Seeded {args.users * args.sessions} sessions, {args.users * args.sessions * args.messages} messages "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    cutoff = datetime.utcnow() - timedelta(days=args.days)
+    with healthbot.app.app_context():
+        rows = healthbot.ChatSession.query.filter(healthbot.ChatSession.user_id == 1).all()
+    live = [s.id for s in rows if s.created_at >= cutoff][:20]
+    old = [s.id for s in rows if s.created_at < cutoff - timedelta(days=1)][:20]
+
+    client = healthbot.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    history_before = {"live": time_history(client, live, args.repeats), "old": time_history(client, old, args.repeats)}
+
+    with healthbot.app.app_context():
+        report = healthbot.run_maintenance(healthbot.db.engine, args.days)
+    history_after = {"live": time_history(client, live, args.repeats), "old": time_history(client, old, args.repeats)}
+
+    archived = report["archived"]
+    print(json.dumps(report, indent=2))
+    print(f"\narchived {archived['sessions']} sessions / {archived['messages']} messages: "
+          f"{archived['message_bytes'] / 1e6:.2f} MB of text -> {archived['archive_bytes'] / 1e6:.2f} MB compressed")
+    print(f"database: {report['bytes_before'] / 1e6:.1f} MB -> {report['bytes_after'] / 1e6:.1f} MB "
+          f"({report['bytes_reclaimed'] / 1e6:.1f} MB reclaimed) in {report['seconds']:.1f}s")
+    print(f"\n{'median ms':<34} {'before':>8} {'after':>8}")
+    print(f"{'history query (newest sessions)':<34} {report['latency_before']['history_ms']:>8.3f} {report['latency_after']['history_ms']:>8.3f}")
+    print(f"{'sidebar query':<34} {report['latency_before']['sidebar_ms']:>8.3f} {report['latency_after']['sidebar_ms']:>8.3f}")
+    print(f"{'GET /get_chat_history, live':<34} {history_before['live']:>8.3f} {history_after['live']:>8.3f}")
+    print(f"{'GET /get_chat_history, archived':<34} {history_before['old']:>8.3f} {history_after['old']:>8.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
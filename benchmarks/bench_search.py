@@ -0,0 +1,94 @@
+"""
+Full-text search on a seeded large database: GET /search latency for one user with
+tens of thousands of messages, among other users' data, plus the cost the FTS5
+triggers add to writing messages.
+
+Run from the project root:
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --messages 100000 --other-users 20 --requests 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+QUERIES = ['fever', 'headache', 'chest pain', 'malaria', 'itch', 'vomiting since yesterday', 'cough', 'dizzy', 'zzzz']
+
+
+def corpus_sentences(rng, n):
+    with open(os.path.join('data', 'symptom_synonyms.json')) as f:
+        phrases = [p for entries in json.load(f).values() for p in entries]
+    openers = ["I have", "I've had", "my", "there is some", "feeling", "also", "since yesterday I have", "no"]
+    return [f"{rng.choice(openers)} {' and '.join(rng.sample(phrases, rng.randint(1, 3)))}" for _ in range(n)]
+
+
+def seed(healthbot, rng, messages, other_users, sessions_per_user):
+    """ One heavy user with `messages` messages and `other_users` users with as many each, written in bulk. """
+    db, User, ChatSession, ChatMessage = healthbot.db, healthbot.User, healthbot.ChatSession, healthbot.ChatMessage
+    sentences = corpus_sentences(rng, 2000)
+    diseases = list(healthbot.KNOWLEDGE.cards)
+    per_session = max(1, messages // sessions_per_user)
+    start = time.perf_counter()
+    with healthbot.app.app_context():
+        for u in range(other_users + 1):
+            user = User(username=f'search{u}', password='x')
+            db.session.add(user)
+            db.session.flush()
+            for _ in range(sessions_per_user):
+                chat = ChatSession(user_id=user.id, title=f"Consultation: {rng.choice(diseases)}", status='diagnosed')
+                db.session.add(chat)
+                db.session.flush()
+                db.session.execute(ChatMessage.__table__.insert(), [
+                    {"session_id": chat.id, "sender": 'user' if i % 2 == 0 else 'bot', "kind": 'text',
+                     "content": rng.choice(sentences)} for i in range(per_session)
+                ])
+            db.session.commit()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="/search latency on a large seeded database.")
+    parser.add_argument('--messages', type=int, default=50000, help="messages of the searching user")
+    parser.add_argument('--other-users', type=int, default=5, help="other users with as many messages each")
+    parser.add_argument('--sessions', type=int, default=500, help="sessions per user")
+    parser.add_argument('--requests', type=int, default=200, help="searches per query")
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='healthbot-search-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['REPORT_CACHE_DIR'] = os.path.join(workdir, 'reports')
+    os.environ.setdefault('MODEL_WARMUP', 'lazy')
+    import app as healthbot
+
+    rng = random.Random(args.seed)
+    total = args.messages * (args.other_users + 1)
+    seconds = seed(healthbot, rng, args.messages, args.other_users, args.sessions)
+    print(f"Seeded {total} messages in {args.sessions * (args.other_users + 1)} sessions "
+          f"in {seconds:.1f}s ({total / seconds:,.0f} messages/s, FTS triggers included)")
+
+    client = healthbot.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    print(f"\n{'query':<26} {'hits/page':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for query in QUERIES:
+        samples, hits = [], 0
+        for i in range(args.requests):
+            start = time.perf_counter()
+            response = client.get('/search', query_string={'q': query, 'offset': (i % 5) * 20})
+            samples.append(time.perf_counter() - start)
+            hits = max(hits, len(response.get_json()['hits']))
+        p50, p95, p99 = (float(np.percentile(samples, q)) * 1e3 for q in (50, 95, 99))
+        print(f"{query:<26} {hits:>9} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Startup benchmark: how long after launching gunicorn the first /login byte arrives,
+and how long until /ready reports a loaded model, for each MODEL_WARMUP mode.
+
+Run from the project root (after python train.py):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 5 --modes preload background
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+MODES = ('preload', 'background', 'lazy')
+
+
+def poll(url, deadline, interval=0.01):
+    """ Seconds (perf_counter) at which `url` first answered 200, or None at the deadline. """
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read(1)
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(interval)
+    return None
+
+
+def measure(mode, port, timeout):
+    env = dict(os.environ, MODEL_WARMUP=mode)
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', '1', '-b', f'127.0.0.1:{port}']
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        login = poll(f'http://127.0.0.1:{port}/login', deadline)
+        ready = poll(f'http://127.0.0.1:{port}/ready', deadline, interval=0.05)
+        return (login - start if login else None, ready - start if ready else None)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def import_seconds():
+    """ Time for a bare `import app` in a fresh interpreter (no model load). """
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    out = subprocess.check_output([sys.executable, '-c', code], env=dict(os.environ, MODEL_WARMUP='lazy'),
+                                  stderr=subprocess.DEVNULL, text=True)
+    return float(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time-to-first-byte for /login and time-to-ready per warmup mode.")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args(argv)
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    print(f"import app (no model): median {statistics.median(imports) * 1e3:.0f} ms over {args.runs} runs\n")
+
+    print(f"{'MODEL_WARMUP':<12} {'/login TTFB s':>14} {'/ready s':>10}")
+    for mode in args.modes:
+        results = [measure(mode, args.port, args.timeout) for _ in range(args.runs)]
+        logins = [r[0] for r in results if r[0] is not None]
+        readies = [r[1] for r in results if r[1] is not None]
+        login = f"{statistics.median(logins):.2f}" if logins else 'timeout'
+        ready = f"{statistics.median(readies):.2f}" if readies else 'timeout'
+        print(f"{mode:<12} {login:>14} {ready:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
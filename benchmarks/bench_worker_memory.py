@@ -0,0 +1,85 @@
+"""
+Measures resident memory of a gunicorn deployment with and without --preload.
+
+Starts gunicorn with N workers, waits until /login answers, then sums PSS
+(proportional set size: shared pages are split between the processes sharing
+them) and USS (pages private to one process) over the master and workers from
+/proc/<pid>/smaps_rollup. Linux only.
+
+Run from the project root:
+    python -m benchmarks.bench_worker_memory --workers 4
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def smaps(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def wait_ready(port, n_workers, master, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=2).read()
+            if len(children(master)) >= n_workers:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def measure(preload, workers, port):
+    # Without the config file gunicorn falls back to the old behaviour: every worker imports app.py itself.
+    config = ['-c', 'gunicorn.conf.py'] if preload else ['-c', os.devnull]
+    cmd = [sys.executable, '-m', 'gunicorn', *config, '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:create_app()']
+    env = dict(os.environ, MODEL_WARMUP='preload')
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    try:
+        wait_ready(port, workers, proc.pid)
+        time.sleep(2)
+        pids = [proc.pid] + children(proc.pid)
+        stats = [smaps(p) for p in pids]
+        pss = sum(s.get('Pss', 0) for s in stats)
+        uss = [s.get('Private_Clean', 0) + s.get('Private_Dirty', 0) for s in stats]
+        return {'preload': preload, 'workers': workers, 'total_pss_mb': pss / 1024,
+                'worker_uss_mb': sum(uss[1:]) / max(1, len(uss) - 1) / 1024}
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'preload':>8} {'workers':>8} {'total PSS MB':>13} {'private MB/worker':>18}")
+    for preload in (False, True):
+        r = measure(preload, args.workers, args.port)
+        print(f"{str(r['preload']):>8} {r['workers']:>8} {r['total_pss_mb']:>13.1f} {r['worker_uss_mb']:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
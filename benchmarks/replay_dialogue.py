@@ -0,0 +1,77 @@
+"""
+Replays recorded conversations through the dialogue rules and reports throughput.
+
+Each corpus line is {"messages": [...], "expect": [...]}, where expect lists, per
+turn, the clarifying question tag asked or "diagnose". Turns that disagree with
+the corpus are printed and make the run fail, so the replay doubles as a check
+after editing data/dialogue_rules.json.
+
+Run from the project root:
+    python -m benchmarks.replay_dialogue
+    python -m benchmarks.replay_dialogue --rules my_rules.json --repeat 200
+"""
+import argparse
+import json
+import sys
+import time
+
+from dialogue import DialogueRules
+from symptom_matcher import SymptomMatcher
+
+CORPUS_PATH = 'benchmarks/dialogue_corpus.jsonl'
+RULES_PATH = 'data/dialogue_rules.json'
+SYNONYMS_PATH = 'data/symptom_synonyms.json'
+
+
+def replay(rules, matcher, messages):
+    """ Mirrors predict(): extract, apply the answer table, then ask or diagnose. Returns one outcome per turn. """
+    symptoms, outcomes, diagnosed = set(), [], False
+    for text in messages:
+        symptoms.update(matcher.match(text))
+        symptoms.update(rules.answer(text))
+        if not symptoms:
+            outcomes.append(None)
+            continue
+        question = None
+        if not diagnosed and not rules.should_diagnose(symptoms):
+            question = rules.next_question(symptoms)
+        if question is None:
+            diagnosed = True
+        outcomes.append(question.tag if question else 'diagnose')
+    return outcomes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--rules', default=RULES_PATH)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    rules = DialogueRules.from_file(args.rules)
+    matcher = SymptomMatcher.from_file(SYNONYMS_PATH)
+    with open(args.corpus) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    mismatches = 0
+    for i, convo in enumerate(corpus):
+        got = replay(rules, matcher, convo['messages'])
+        if 'expect' in convo and got != convo['expect']:
+            mismatches += 1
+            print(f"conversation {i}: expected {convo['expect']}, got {got}")
+
+    turns = sum(len(c['messages']) for c in corpus) * args.repeat
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for convo in corpus:
+            replay(rules, matcher, convo['messages'])
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(corpus)} conversations x {args.repeat}: {turns} turns in {elapsed:.3f}s "
+          f"({turns / elapsed:,.0f} turns/s, {elapsed / turns * 1e6:.1f} us/turn)")
+    print(f"mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
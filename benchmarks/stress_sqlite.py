@@ -0,0 +1,102 @@
+"""
+Concurrency stress test for the SQLite storage layer.
+
+Starts N worker processes, each importing app.py against the same temporary
+database (like N gunicorn workers), and has every worker register a user, open
+consultations and chat through /predict as fast as it can. Reports requests,
+failures and "database is locked" errors.
+
+Run from the project root:
+    python -m benchmarks.stress_sqlite --workers 8 --seconds 20
+    SQLITE_TUNING=0 python -m benchmarks.stress_sqlite --workers 8   # old default journaling, for comparison
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+import traceback
+
+MESSAGES = ["I have a fever and chills", "Yes Body Ache", "No", "my head hurts", "I feel dizzy and tired"]
+
+
+def worker(worker_id, database_url, seconds, results):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['PRELOAD_MODEL'] = '0'
+    # Hash in-process: N workers each spawning a hashing pool only adds processes to the test.
+    os.environ['PASSWORD_WORKERS'] = '0'
+    # One client sends every request; the per-user limits would turn most of them away.
+    os.environ.setdefault('RATE_LIMITING', '0')
+    import app as healthbot
+
+    client = healthbot.app.test_client()
+    stats = {'requests': 0, 'errors': 0, 'locked': 0}
+
+    def call(method, url, **kwargs):
+        stats['requests'] += 1
+        try:
+            r = getattr(client, method)(url, **kwargs)
+            if r.status_code >= 500:
+                stats['errors'] += 1
+            return r
+        except Exception as e:
+            stats['errors'] += 1
+            if 'locked' in str(e):
+                stats['locked'] += 1
+            elif stats['errors'] == 1:
+                traceback.print_exc()
+            return None
+
+    call('post', '/register', data={'username': f'stress{worker_id}', 'password': 'pw'})
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        r = call('post', '/new_chat')
+        if r is None or r.status_code != 200:
+            continue
+        session_id = r.get_json()['session_id']
+        for message in MESSAGES:
+            call('post', '/predict', json={'message': message, 'session_id': session_id})
+        call('get', f'/get_chat_history/{session_id}')
+    results.put(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'stress.db')}"
+        # Create the schema once up front, as the gunicorn master would.
+        os.environ['DATABASE_URL'] = database_url
+        os.environ['PRELOAD_MODEL'] = '0'
+        ctx = mp.get_context('spawn')
+        init = ctx.Process(target=_init_schema, args=(database_url,))
+        init.start()
+        init.join()
+
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(i, database_url, args.seconds, results)) for i in range(args.workers)]
+        for p in procs:
+            p.start()
+        totals = {'requests': 0, 'errors': 0, 'locked': 0}
+        for _ in procs:
+            for k, v in results.get().items():
+                totals[k] += v
+        for p in procs:
+            p.join()
+
+    print(f"workers={args.workers} sqlite_tuning={os.environ.get('SQLITE_TUNING', '1')} "
+          f"requests={totals['requests']} rps={totals['requests'] / args.seconds:.0f} "
+          f"errors={totals['errors']} locked={totals['locked']}")
+    return 1 if totals['errors'] else 0
+
+
+def _init_schema(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    import app  # noqa: F401  (init_db runs at import)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,282 @@
+"""
+Reproducible benchmark suite for the whole request path, runnable offline.
+
+Two parts:
+  micro  - the hot functions on their own: symptom extraction, dialogue rules,
+           session state, model load, single-row and batch inference, disease
+           details and PDF rendering.
+  routes - an in-process load generator. A seeded corpus of users, sessions and
+           messages is written to a throwaway database, then every route is
+           driven through the Flask test client.
+
+Every benchmark reports p50/p95/p99 latency and throughput. --json writes the
+results as a machine-readable file, and --compare checks them against a previous
+file, failing on any p95 regression beyond --tolerance.
+
+Run from the project root (after python train.py):
+    python -m benchmarks.suite
+    python -m benchmarks.suite --json bench-new.json --compare bench-old.json
+    python -m benchmarks.suite --only micro --requests 50
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+SEED_MESSAGES = [
+    "I have a fever and chills", "Yes Body Ache", "No", "my head hurts", "I feel dizzy and tired",
+    "I have chest pain", "Yes Sweating", "itching and a skin rash", "I keep coughing and sneezing",
+    "stomach pain and vomiting since yesterday", "Forehead (Sinus)", "yes", "no",
+]
+
+
+def summarize(samples, wall=None):
+    """ Latency percentiles in milliseconds and throughput for a list of per-call durations. """
+    arr = np.asarray(samples)
+    wall = wall if wall is not None else float(arr.sum())
+    return {
+        "n": int(arr.size),
+        "p50_ms": round(float(np.percentile(arr, 50)) * 1e3, 4),
+        "p95_ms": round(float(np.percentile(arr, 95)) * 1e3, 4),
+        "p99_ms": round(float(np.percentile(arr, 99)) * 1e3, 4),
+        "mean_ms": round(float(arr.mean()) * 1e3, 4),
+        "per_second": round(arr.size / wall, 2) if wall else None,
+    }
+
+
+def timed(fn, n, warmup=3):
+    for _ in range(min(warmup, n)):
+        fn()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def run_micro(healthbot, rng, n):
+    from model_registry import ModelRegistry
+    from reports import render_report
+    from session_state import SessionState, Vocabulary
+
+    loaded = healthbot.registry.get()
+    rules = healthbot.DIALOGUE.get()
+    vocab = Vocabulary(loaded.columns)
+    messages = [rng.choice(SEED_MESSAGES) for _ in range(64)]
+    symptom_sets = [rng.sample(loaded.columns, rng.randint(1, 5)) for _ in range(64)]
+    states = [SessionState.from_names(vocab, s) for s in symptom_sets]
+    bits = [s.bits() for s in states]
+    X = np.zeros((1000, len(loaded.columns)))
+    for i in range(X.shape[0]):
+        X[i, rng.sample(range(len(loaded.columns)), rng.randint(1, 6))] = 1
+    it = iter(range(1 << 62))
+
+    def pick(items):
+        return items[next(it) % len(items)]
+
+    results = {
+        "extract_symptoms": timed(lambda: healthbot.extract_symptoms(pick(messages)), n),
+        "dialogue_answer": timed(lambda: rules.answer(pick(messages)), n),
+        "dialogue_next_question": timed(lambda: rules.next_question(set(pick(symptom_sets))), n),
+        "session_state_roundtrip": timed(lambda: SessionState.from_columns(vocab, pick(bits), '').bits(), n),
+        "rank_diseases": timed(lambda: healthbot.rank_diseases(loaded, pick(states)), n),
+        "choose_followup": timed(lambda: healthbot.choose_followup(
+            loaded, pick(states), list(zip(*healthbot.rank_diseases(loaded, pick(states))))), n),
+        "predict_proba_batch_1000": timed(lambda: loaded.model.predict_proba(X), max(3, n // 100)),
+        "get_disease_details": timed(lambda: healthbot.get_disease_details('Malaria'), n),
+        "render_report": timed(lambda: render_report('bench', '2024-01-01 00:00:00', 'Consultation: Malaria',
+                                                     pick(symptom_sets)), max(5, n // 10)),
+        # A cold load re-reads and re-flattens the artifacts, like a freshly started worker.
+        "model_load": timed(lambda: ModelRegistry(healthbot.MODEL_PATH, healthbot.COLUMNS_PATH,
+                                                  frequencies_path=healthbot.FREQUENCIES_PATH).get(), 3, warmup=0),
+    }
+    return results
+
+
+def seed_corpus(healthbot, rng, users, sessions_per_user, messages_per_session):
+    """ Writes a deterministic corpus straight through the ORM and returns [(username, password, session ids)]. """
+    from werkzeug.security import generate_password_hash
+
+    db, User, ChatSession, ChatMessage = healthbot.db, healthbot.User, healthbot.ChatSession, healthbot.ChatMessage
+    corpus = []
+    with healthbot.app.app_context():
+        # One cheap hash for everyone: the suite measures routes, not pbkdf2.
+        password_hash = generate_password_hash('bench', method='pbkdf2:sha256:1000')
+        for u in range(users):
+            user = User(username=f'bench{u}', password=password_hash)
+            db.session.add(user)
+            db.session.flush()
+            session_ids = []
+            for _ in range(sessions_per_user):
+                chat = ChatSession(user_id=user.id, title="New Consultation", status="started")
+                db.session.add(chat)
+                db.session.flush()
+                db.session.add_all(
+                    ChatMessage(session_id=chat.id, sender='user' if i % 2 == 0 else 'bot', content=rng.choice(SEED_MESSAGES))
+                    for i in range(messages_per_session)
+                )
+                session_ids.append(chat.id)
+            corpus.append((user.username, 'bench', session_ids))
+        db.session.commit()
+    return corpus
+
+
+def run_routes(healthbot, rng, corpus, n):
+    clients = []
+    for username, password, session_ids in corpus:
+        client = healthbot.app.test_client()
+        client.post('/login', data={'username': username, 'password': password})
+        clients.append((client, session_ids))
+
+    def any_client():
+        return clients[rng.randrange(len(clients))]
+
+    def predict():
+        client, _ = any_client()
+        sid = client.post('/new_chat').get_json()['session_id']
+        return client.post('/predict', json={'message': rng.choice(SEED_MESSAGES), 'session_id': sid})
+
+    def predict_stream():
+        client, _ = any_client()
+        sid = client.post('/new_chat').get_json()['session_id']
+        response = client.post('/predict_stream', json={'message': rng.choice(SEED_MESSAGES), 'session_id': sid})
+        response.get_data()  # drain the event stream
+        return response
+
+    def history():
+        client, sids = any_client()
+        return client.get(f'/get_chat_history/{rng.choice(sids)}')
+
+    def report():
+        client, sids = any_client()
+        return client.get(f'/download_report/{rng.choice(sids)}')
+
+    batch_body = {"items": [{"message": rng.choice(SEED_MESSAGES)} for _ in range(100)]}
+    routes = {
+        "GET /": lambda: any_client()[0].get('/'),
+        "POST /new_chat": lambda: any_client()[0].post('/new_chat'),
+        "POST /predict": predict,
+        "POST /predict_stream": predict_stream,
+        "GET /get_chat_history": history,
+        "GET /sessions": lambda: any_client()[0].get('/sessions'),
+        "GET /download_report": report,
+        "POST /predict_batch (100 rows)": lambda: any_client()[0].post('/predict_batch', json=batch_body),
+        "GET /model_status": lambda: any_client()[0].get('/model_status'),
+    }
+
+    results = {}
+    for name, fn in routes.items():
+        errors = []
+
+        def call(fn=fn, errors=errors):
+            response = fn()
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+        count = max(5, n // 10) if 'batch' in name else n
+        results[name] = dict(timed(call, count), errors=len(errors))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """ Lists benchmarks whose p95 got more than `tolerance` (fractional) slower than the baseline. """
+    regressions = []
+    for section in ('micro', 'routes'):
+        for name, result in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before or not before.get('p95_ms'):
+                continue
+            ratio = result['p95_ms'] / before['p95_ms']
+            if ratio > 1 + tolerance:
+                regressions.append((f"{section}/{name}", before['p95_ms'], result['p95_ms'], ratio))
+    return regressions
+
+
+def print_table(title, results):
+    print(f"\n{title}")
+    print(f"{'benchmark':<34} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per s':>10}")
+    for name, r in results.items():
+        flag = f"  ({r['errors']} errors)" if r.get('errors') else ''
+        print(f"{name:<34} {r['n']:>6} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['per_second']:>10.1f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HealthBot benchmark suite.")
+    parser.add_argument('--only', choices=['micro', 'routes'])
+    parser.add_argument('--requests', type=int, default=300, help="calls per benchmark")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=5, help="seeded sessions per user")
+    parser.add_argument('--messages', type=int, default=60, help="seeded messages per session")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--compare', help="baseline JSON from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p95 slowdown vs the baseline")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='healthbot-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['REPORT_CACHE_DIR'] = os.path.join(workdir, 'reports')
+    # One client sends every request; the per-user limits would turn most of them away.
+    os.environ.setdefault('RATE_LIMITING', '0')
+    import app as healthbot
+
+    if healthbot.registry.get() is None or healthbot.registry.get().model is None:
+        print("No model loaded; run 'python train.py' first.")
+        return 1
+
+    rng = random.Random(args.seed)
+    np.random.seed(args.seed)
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "model_version": healthbot.registry.get().version,
+            "args": vars(args),
+        },
+    }
+    if args.only != 'routes':
+        report["micro"] = run_micro(healthbot, rng, args.requests)
+        print_table("Microbenchmarks", report["micro"])
+    if args.only != 'micro':
+        corpus = seed_corpus(healthbot, rng, args.users, args.sessions, args.messages)
+        report["routes"] = run_routes(healthbot, rng, corpus, args.requests)
+        print_table("Routes (Flask test client, in-process)", report["routes"])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: p95 {before:.3f} -> {after:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No p95 regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
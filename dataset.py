@@ -0,0 +1,111 @@
+"""
+Bit-packed symptom datasets: the binary format generate_data.py writes and train.py reads.
+
+A dataset is a directory holding:
+    meta.json   - format version, symptom columns, class names, row count and how it was made
+    bits.npy    - (rows, ceil(n_columns / 8)) uint8, each row's symptoms packed with
+                  np.packbits(bitorder='little'), the same layout as session bitmasks
+    labels.npy  - (rows,) uint16 index into meta["classes"]
+
+Both arrays are plain .npy files, so np.load(mmap_mode='r') maps them instead of
+reading them in. That is 19 bytes per row for 132 symptoms, against ~265 for CSV text.
+meta.json is written last, so a directory without it is an unfinished write.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+FORMAT = 'healthbot-symptom-bits'
+FORMAT_VERSION = 1
+
+
+def is_dataset(path):
+    return os.path.isfile(os.path.join(path, 'meta.json'))
+
+
+def _open_npy(path, dtype, shape):
+    """ A file with the .npy header for `shape` already written; the array data is appended after it. """
+    f = open(path, 'wb')
+    np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                                             'fortran_order': False, 'shape': shape})
+    return f
+
+
+class DatasetWriter:
+    """ Writes a dataset of a known row count block by block, appending to the files as it goes. """
+
+    def __init__(self, path, rows, columns, classes, info=None):
+        if len(classes) > np.iinfo(np.uint16).max:
+            raise ValueError(f"Too many classes for uint16 labels: {len(classes)}")
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self.path = path
+        self.rows = rows
+        self.meta = {"format": FORMAT, "version": FORMAT_VERSION, "rows": rows,
+                     "columns": list(columns), "classes": list(classes), "generator": info or {}}
+        self.bits = _open_npy(os.path.join(path, 'bits.npy'), np.uint8, (rows, (len(columns) + 7) // 8))
+        self.labels = _open_npy(os.path.join(path, 'labels.npy'), np.uint16, (rows,))
+        self.filled = 0
+
+    def write(self, X, codes):
+        """ Appends a (n, n_columns) boolean block and its class codes. """
+        if self.filled + X.shape[0] > self.rows:
+            raise ValueError(f"Dataset only has room for {self.rows} rows")
+        self.bits.write(np.packbits(X, axis=1, bitorder='little').tobytes())
+        self.labels.write(np.asarray(codes, dtype=np.uint16).tobytes())
+        self.filled += X.shape[0]
+
+    def close(self):
+        self.bits.close()
+        self.labels.close()
+        if self.filled != self.rows:
+            raise ValueError(f"Dataset has {self.filled} of its {self.rows} rows")
+        tmp = os.path.join(self.path, f'meta.json.tmp-{os.getpid()}')
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+
+def open_dataset(path):
+    """ (bits, labels, meta), with both arrays memory-mapped read-only. """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT or meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path}: not a version {FORMAT_VERSION} {FORMAT} dataset")
+    bits = np.load(os.path.join(path, 'bits.npy'), mmap_mode='r')
+    labels = np.load(os.path.join(path, 'labels.npy'), mmap_mode='r')
+    return bits, labels, meta
+
+
+def read_dataset(path, chunk_rows=1 << 16, max_rows=None):
+    """
+    The dataset as (X as CSR uint8, labels, columns), like train.read_symptom_csv.
+    Rows are unpacked one chunk at a time, so only the sparse result is held in memory.
+    """
+    from scipy import sparse
+
+    bits, codes, meta = open_dataset(path)
+    n_columns = len(meta['columns'])
+    rows = bits.shape[0] if max_rows is None else min(max_rows, bits.shape[0])
+    blocks = [sparse.csr_matrix(np.unpackbits(bits[start:min(start + chunk_rows, rows)], axis=1, count=n_columns,
+                                              bitorder='little'))
+              for start in range(0, rows, chunk_rows)]
+    X = sparse.vstack(blocks, format='csr', dtype=np.uint8) if blocks else sparse.csr_matrix((0, n_columns), dtype=np.uint8)
+    classes = np.array(meta['classes'], dtype=object)
+    return X, classes[np.asarray(codes[:rows])], meta['columns']
+
+
+def dataset_digest(path, chunk_size=1 << 20):
+    """ SHA-256 over the dataset's arrays and its columns/classes. """
+    h = hashlib.sha256()
+    _, _, meta = open_dataset(path)
+    h.update(json.dumps([meta['columns'], meta['classes']]).encode())
+    for name in ('bits.npy', 'labels.npy'):
+        with open(os.path.join(path, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    return h.hexdigest()
@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class DiagnosisCache:
+    """
+    LRU + TTL cache of finished diagnoses, keyed on (model version, sorted symptom set).
+    With a path, entries are also written to a small SQLite file so every gunicorn
+    worker on the machine can reuse each other's results.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, path=None, prune_every=256):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.prune_every = prune_every
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        if path:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS diagnosis_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def key(model_version, symptoms):
+        return f"{model_version}:{','.join(sorted(set(symptoms)))}"
+
+    def _db(self):
+        # A connection must never cross a fork, so one per (process, thread).
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self.stats["expired"] += 1
+
+        if self.path:
+            row = self._db().execute(
+                "SELECT value, expires FROM diagnosis_cache WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl
+        self._remember(key, value, expires)
+        if self.path:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO diagnosis_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires),
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                db.execute("DELETE FROM diagnosis_cache WHERE expires <= ?", (time.time(),))
+
+    def _remember(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            self._db().execute("DELETE FROM diagnosis_cache")
+
+    def info(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            return dict(
+                self.stats,
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                ttl=self.ttl,
+                shared=bool(self.path),
+                hit_rate=round((self.stats["hits"] + self.stats["disk_hits"]) / lookups, 4) if lookups else None,
+            )
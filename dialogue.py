@@ -0,0 +1,130 @@
+"""
+Table-driven dialogue rules: how answers to clarifying questions map onto symptoms,
+and which clarifying question (if any) to ask next.
+
+The table lives in data/dialogue_rules.json and is compiled once into
+  - a single regex that finds the highest-priority answer rule in one pass, and
+  - question predicates indexed by the symptoms that can trigger them, so only
+    rules touching the session's symptoms are ever evaluated.
+DialogueEngine reloads the file when it changes on disk.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+Question = namedtuple('Question', ['tag', 'question', 'options', 'all', 'any', 'none', 'priority'])
+
+
+class DialogueRules:
+    def __init__(self, answers, questions, diagnose_when_any=()):
+        # Answer rules keep the table order: the first rule with any needle in the text wins.
+        self.answers = [tuple(rule['add']) for rule in answers]
+        # Needles match whole words only, so "no" is not found in "nose", "know" or "cannot".
+        alternatives = [
+            f"(?P<a{i}>\\b(?:{'|'.join(re.escape(n.lower()) for n in rule['match'])})\\b)"
+            for i, rule in enumerate(answers)
+        ]
+        # A lookahead matches at every position, so overlapping needles are all seen.
+        self._answer_re = re.compile(f"(?=(?:{'|'.join(alternatives)}))") if alternatives else None
+
+        self.questions = []
+        self._by_trigger = {}
+        for priority, rule in enumerate(questions):
+            q = Question(rule['tag'], rule['question'], list(rule['options']),
+                         frozenset(rule.get('all', ())), frozenset(rule.get('any', ())),
+                         frozenset(rule.get('none', ())), priority)
+            if not q.all and not q.any:
+                raise ValueError(f"question {q.tag!r} needs an 'all' or 'any' trigger")
+            self.questions.append(q)
+            # One 'all' symptom is enough to index on; every 'any' symptom can trigger the rule.
+            for symptom in (q.any if not q.all else (min(q.all),)):
+                self._by_trigger.setdefault(symptom, []).append(q)
+        self.diagnose_when_any = frozenset(diagnose_when_any)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('answers', []), data.get('questions', []), data.get('diagnose_when_any', []))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def answer(self, text):
+        """ Symptoms and flags implied by a reply, from the first matching answer rule. """
+        if self._answer_re is None:
+            return ()
+        best = None
+        for m in self._answer_re.finditer(text.lower()):
+            rule = int(m.lastgroup[1:])
+            if best is None or rule < best:
+                best = rule
+                if rule == 0:
+                    break
+        return self.answers[best] if best is not None else ()
+
+    def next_question(self, symptoms):
+        """ The highest-priority clarifying question whose conditions hold, or None. """
+        symptoms = symptoms if isinstance(symptoms, (set, frozenset)) else set(symptoms)
+        best = None
+        for symptom in self._by_trigger.keys() & symptoms:
+            for q in self._by_trigger[symptom]:
+                if best is not None and q.priority >= best.priority:
+                    continue
+                if q.all <= symptoms and (not q.any or not q.any.isdisjoint(symptoms)) and q.none.isdisjoint(symptoms):
+                    best = q
+        return best
+
+    def should_diagnose(self, symptoms):
+        """ True once an answer has narrowed things down enough to stop asking. """
+        return not self.diagnose_when_any.isdisjoint(symptoms)
+
+
+class DialogueEngine:
+    """ Serves the compiled rules, recompiling when the rule file changes. A broken edit keeps the old rules. """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self._rules = DialogueRules.from_file(path)
+        self._checked = time.monotonic()
+        self.reloads = 0
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval:
+                    self._checked = now
+                    self._maybe_reload()
+        return self._rules
+
+    def _maybe_reload(self):
+        try:
+            stamp = self._file_stamp()
+        except OSError:
+            return
+        if stamp == self._stamp:
+            return
+        # Remember the stamp even if parsing fails, so a broken edit is reported once.
+        self._stamp = stamp
+        try:
+            rules = DialogueRules.from_file(self.path)
+        except (OSError, ValueError, KeyError, re.error) as e:
+            log.error("Dialogue rules not reloaded from %s: %s", self.path, e)
+            return
+        self._rules = rules
+        self.reloads += 1
+        log.info("Dialogue rules reloaded from %s", self.path)
@@ -0,0 +1,249 @@
+"""
+Model evaluation: candidate models trained side by side on Training.csv and compared on
+accuracy, single-row latency, batch throughput, artifact size and load time.
+
+    python evaluate.py                        # train and compare every candidate, write models/eval-<stamp>/
+    python evaluate.py --promote rf25         # ... then serve the rf25 candidate
+    python evaluate.py --promote-dir models/eval-20261017-120000/20261017-120001-17c5eb44-rf25
+
+Candidates:
+    rf100            the forest train.py builds (RandomForestClassifier, 100 trees)
+    rf50, rf25, rf10 fewer trees
+    rf100-depth12/8  shallower trees
+    rf100-pruned     the smallest subset of rf100's trees, picked greedily, within
+                     --prune-tolerance of its validation accuracy
+    tree-distilled   one decision tree fitted to rf100's answers on noisy copies of the
+                     training rows
+    bernoulli-nb     naive Bayes over the binary symptom columns
+
+Every candidate is fitted on the same stratified split of the training data. Accuracy
+is reported on the held-out part, on Testing.csv, and on "noisy" rows generated from
+the Testing.csv templates with --noisy-drop of each row's symptoms left out, which is
+closer to what the chat sees: a patient names a few symptoms, not all of them.
+Latency is measured the way the app predicts: one dense row through the flattened
+forest for tree models (see flat_forest.py), through sklearn otherwise, and batches
+as sparse rows through predict_proba, as /predict_batch does.
+
+Each candidate is written as a normal model version (train.write_version) and the
+comparison to report.json next to them; promoting one copies it to the paths app.py
+loads, exactly as train.py does.
+"""
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import BernoulliNB
+from sklearn.tree import DecisionTreeClassifier
+
+from generate_data import generate, read_templates
+from model_registry import ModelRegistry
+from train import (ARTIFACTS_DIR, DATASET_PATH, MODEL_PATH, TEST_PATH, align_columns, load_training_data, promote,
+                   read_symptom_csv, write_version)
+
+SEED = 42
+
+
+def forest(n_estimators, max_depth=None):
+    return RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, n_jobs=-1, random_state=SEED)
+
+
+# name -> a fresh unfitted model; rf100 is also the teacher of the derived candidates.
+TRAINED = {
+    'rf100': lambda: forest(100),
+    'rf50': lambda: forest(50),
+    'rf25': lambda: forest(25),
+    'rf10': lambda: forest(10),
+    'rf100-depth12': lambda: forest(100, max_depth=12),
+    'rf100-depth8': lambda: forest(100, max_depth=8),
+    'bernoulli-nb': lambda: BernoulliNB(alpha=1.0),
+}
+
+
+def noisy_rows(path, columns, rows, drop, add, seed):
+    """ (X as CSR, labels) sampled from a symptom CSV's rows with generate_data's noise, aligned to `columns`. """
+    templates, codes, classes, template_columns, _ = read_templates(path)
+    drop_rates = np.full(len(template_columns), drop, dtype=np.float32)
+    add_rates = np.full(len(template_columns), add, dtype=np.float32)
+    X, y = next(generate(templates, codes, rows, drop_rates, add_rates, seed, rows))
+    return align_columns(sparse.csr_matrix(X, dtype=np.uint8), template_columns, columns), np.array(classes, dtype=object)[y]
+
+
+def prune_forest(model, X_val, y_val, tolerance):
+    """ A copy of a fitted forest keeping the fewest trees, added greedily, within `tolerance` of its accuracy. """
+    target = np.searchsorted(model.classes_, y_val)
+    # Per-tree class probabilities: (n_trees, n_rows, n_classes)
+    P = np.stack([tree.predict_proba(X_val).astype(np.float32) for tree in model.estimators_])
+    goal = float((P.mean(axis=0).argmax(axis=1) == target).mean()) - tolerance
+    chosen, total = [], np.zeros(P.shape[1:], dtype=np.float32)
+    remaining = list(range(len(P)))
+    while remaining:
+        accuracy = ((total[None] + P[remaining]).argmax(axis=2) == target).mean(axis=1)
+        best = int(np.argmax(accuracy))
+        chosen.append(remaining.pop(best))
+        total += P[chosen[-1]]
+        if accuracy[best] >= goal:
+            break
+    pruned = copy.copy(model)
+    pruned.estimators_ = [model.estimators_[i] for i in chosen]
+    pruned.n_estimators = len(chosen)
+    return pruned
+
+
+def distill_tree(teacher, X, rows, drop, seed):
+    """ One decision tree fitted to the teacher's predictions on noisy copies of the training rows. """
+    templates = X.toarray().astype(bool)
+    drop_rates = np.full(X.shape[1], drop, dtype=np.float32)
+    X_noisy, _ = next(generate(templates, np.zeros(len(templates), dtype=int), rows, drop_rates,
+                               np.zeros(X.shape[1], dtype=np.float32), seed, rows))
+    X_aug = sparse.vstack([X, sparse.csr_matrix(X_noisy, dtype=np.uint8)], format='csr')
+    student = DecisionTreeClassifier(random_state=SEED)
+    student.fit(X_aug, teacher.predict(X_aug))
+    return student
+
+
+def accuracy(model, X, y):
+    return round(float((model.predict(X) == y).mean()), 4)
+
+
+def single_row_latency(model, X, calls):
+    """ (p50, p99) microseconds for one dense row, through the flat forest when the app would use one. """
+    flat = ModelRegistry._flatten(model)
+    predict = flat.predict_proba if flat is not None else model.predict_proba
+    rows = [X[i % X.shape[0]].toarray().astype(np.float64) for i in range(min(calls, 512))]
+    for row in rows[:20]:
+        predict(row)
+    samples = []
+    for i in range(calls):
+        row = rows[i % len(rows)]
+        start = time.perf_counter()
+        predict(row)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+
+def batch_throughput(model, X, repeats=3):
+    """ Rows per second through predict_proba on sparse float32 rows, best of `repeats`. """
+    X = X.astype(np.float32)
+    best = min(_timed(model.predict_proba, X) for _ in range(repeats))
+    return X.shape[0] / best
+
+
+def load_seconds(path, repeats=3):
+    """ Median time to unpickle an artifact and flatten it, as a worker does on startup. """
+    def load():
+        ModelRegistry._flatten(joblib.load(path))
+    return statistics.median(_timed(load) for _ in range(repeats))
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare candidate disease models on accuracy, latency and size.")
+    parser.add_argument('--data', default=DATASET_PATH, help="symptom CSV, or a dataset directory from generate_data.py")
+    parser.add_argument('--test', default=TEST_PATH)
+    parser.add_argument('--out', default=ARTIFACTS_DIR)
+    parser.add_argument('--holdout', type=float, default=0.2, help="fraction of the training data held out")
+    parser.add_argument('--noisy-rows', type=int, default=5000, help="noisy evaluation rows from the test templates")
+    parser.add_argument('--noisy-drop', type=float, default=0.5, help="chance each symptom of a noisy row is left out")
+    parser.add_argument('--prune-tolerance', type=float, default=0.005)
+    parser.add_argument('--calls', type=int, default=2000, help="single-row predictions timed per candidate")
+    parser.add_argument('--batch-rows', type=int, default=10000)
+    parser.add_argument('--promote', metavar='NAME', help="serve this candidate once the comparison is done")
+    parser.add_argument('--promote-dir', help="serve a candidate saved by an earlier run, without evaluating")
+    args = parser.parse_args(argv)
+
+    if args.promote_dir:
+        promote(args.promote_dir)
+        print(f"Promoted {args.promote_dir} -> {MODEL_PATH}")
+        return 0
+    if args.promote and args.promote not in list(TRAINED) + ['rf100-pruned', 'tree-distilled']:
+        parser.error(f"Unknown candidate: {args.promote}")
+
+    X, y, columns, data_hash = load_training_data(args.data)
+    X_train, X_holdout, y_train, y_holdout = train_test_split(X, y, test_size=args.holdout, stratify=y, random_state=SEED)
+    X_test, y_test, test_columns = read_symptom_csv(args.test)
+    X_test = align_columns(X_test, test_columns, columns)
+    # Two independent draws: one to pick the pruned forest's trees, one to report on.
+    X_val, y_val = noisy_rows(args.test, columns, args.noisy_rows, args.noisy_drop, 0.0, SEED + 1)
+    X_noisy, y_noisy = noisy_rows(args.test, columns, args.noisy_rows, args.noisy_drop, 0.0, SEED)
+    X_batch = sparse.vstack([X_noisy] * (args.batch_rows // X_noisy.shape[0] + 1), format='csr')[:args.batch_rows]
+
+    models, fit_seconds = {}, {}
+    for name, build in TRAINED.items():
+        start = time.perf_counter()
+        models[name] = build().fit(X_train, y_train)
+        fit_seconds[name] = time.perf_counter() - start
+        if hasattr(models[name], 'n_jobs'):
+            models[name].set_params(n_jobs=None)
+        print(f"fitted {name} in {fit_seconds[name]:.2f}s")
+    start = time.perf_counter()
+    models['rf100-pruned'] = prune_forest(models['rf100'], X_val, y_val, args.prune_tolerance)
+    fit_seconds['rf100-pruned'] = fit_seconds['rf100'] + time.perf_counter() - start
+    start = time.perf_counter()
+    models['tree-distilled'] = distill_tree(models['rf100'], X_train, 10 * X_train.shape[0], args.noisy_drop, SEED)
+    fit_seconds['tree-distilled'] = fit_seconds['rf100'] + time.perf_counter() - start
+
+    eval_dir = os.path.join(args.out, 'eval-' + datetime.utcnow().strftime('%Y%m%d-%H%M%S'))
+    results = []
+    for name, model in models.items():
+        evaluation = {
+            "holdout_accuracy": accuracy(model, X_holdout, y_holdout),
+            "test_accuracy": accuracy(model, X_test, y_test),
+            "noisy_accuracy": accuracy(model, X_noisy, y_noisy),
+        }
+        p50, p99 = single_row_latency(model, X_noisy, args.calls)
+        evaluation.update(p50_us=round(p50, 1), p99_us=round(p99, 1),
+                          batch_rows_per_s=round(batch_throughput(model, X_batch)))
+        version_dir, manifest = write_version(eval_dir, model, columns, X_train, y_train, {
+            "params": {"candidate": name, **{k: v for k, v in model.get_params().items() if k in
+                                             ('n_estimators', 'max_depth', 'alpha', 'random_state')}},
+            "training_data": os.path.basename(os.path.normpath(args.data)),
+            "training_data_sha256": data_hash,
+            "fit_seconds": round(fit_seconds[name], 3),
+            "test_data": os.path.basename(args.test),
+            "test_accuracy": evaluation["test_accuracy"],
+            "evaluation": evaluation,
+        }, name=name)
+        evaluation.update(model_bytes=manifest["model_bytes"],
+                          load_ms=round(load_seconds(os.path.join(version_dir, 'model.pkl')) * 1e3, 1))
+        n_trees = len(model.estimators_) if hasattr(model, 'estimators_') else 1 if hasattr(model, 'tree_') else None
+        results.append({"name": name, "version_dir": version_dir, "n_trees": n_trees,
+                        "fit_seconds": round(fit_seconds[name], 3), **evaluation})
+
+    report = {"data": args.data, "training_rows": int(X_train.shape[0]), "holdout_rows": int(X_holdout.shape[0]),
+              "noisy_rows": args.noisy_rows, "noisy_drop": args.noisy_drop, "candidates": results}
+    with open(os.path.join(eval_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'candidate':<16} {'holdout':>8} {'test':>6} {'noisy':>6} {'p50 us':>8} {'p99 us':>8} "
+          f"{'batch rows/s':>13} {'size KB':>9} {'load ms':>8}")
+    for r in results:
+        print(f"{r['name']:<16} {r['holdout_accuracy']:>8.4f} {r['test_accuracy']:>6.3f} {r['noisy_accuracy']:>6.3f} "
+              f"{r['p50_us']:>8.1f} {r['p99_us']:>8.1f} {r['batch_rows_per_s']:>13,} {r['model_bytes'] / 1e3:>9.0f} "
+              f"{r['load_ms']:>8.1f}")
+    print(f"\nCandidates and report.json written to {eval_dir}")
+
+    if args.promote:
+        chosen = next(r for r in results if r["name"] == args.promote)
+        promote(chosen["version_dir"])
+        print(f"Promoted {args.promote} ({chosen['version_dir']}) -> {MODEL_PATH}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
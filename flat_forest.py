@@ -0,0 +1,183 @@
+"""
+Flattened tree-ensemble evaluator.
+
+All trees of a fitted RandomForestClassifier (or a single DecisionTreeClassifier)
+are copied into a handful of contiguous numpy arrays, and every tree is walked
+at once with array indexing. For one-row predictions this skips sklearn's input
+validation, joblib dispatch and per-tree Python calls.
+
+    python flat_forest.py disease_model.pkl      # export + check + benchmark
+"""
+import sys
+import timeit
+
+import numpy as np
+
+
+class FlatForest:
+    """ A fitted tree ensemble as flat arrays. Leaves point at themselves, so walking never branches. """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, depth, n_features):
+        self.feature = feature        # (n_nodes,) int32, 0 for leaves
+        self.threshold = threshold    # (n_nodes,) float64, +inf for leaves
+        self.children = children      # (n_nodes, 2) int32: [right, left]; a leaf's children are itself
+        self.value = value            # (n_nodes, n_classes) float64 class distribution at each node
+        self.roots = roots            # (n_trees,) int32 index of each tree's root
+        self.classes = classes
+        self.depth = depth
+        self.n_features = n_features
+        inner = np.isfinite(threshold)
+        # Trees grown on 0/1 symptom columns only ever split at thresholds strictly between 0 and 1.
+        self.binary = bool(((threshold[inner] > 0) & (threshold[inner] < 1)).all())
+        self._spine = None
+
+    @classmethod
+    def from_sklearn(cls, model):
+        trees = [e.tree_ for e in getattr(model, 'estimators_', [model])]
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            n = tree.node_count
+            node_ids = np.arange(n, dtype=np.int32) + offset
+            leaf = tree.children_left == -1
+            left = np.where(leaf, node_ids, tree.children_left + offset)
+            right = np.where(leaf, node_ids, tree.children_right + offset)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            children.append(np.stack([right, left], axis=1))
+            # Older sklearn stores raw counts in tree_.value; normalise like predict_proba does.
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            values.append(value / totals)
+            roots.append(offset)
+            offset += n
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children=np.ascontiguousarray(np.concatenate(children), dtype=np.int32),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+            depth=max(tree.max_depth for tree in trees),
+            n_features=int(model.n_features_in_),
+        )
+
+    def save(self, path):
+        np.savez(path, feature=self.feature, threshold=self.threshold, children=self.children,
+                 value=self.value, roots=self.roots, classes=self.classes.astype(str),
+                 depth=np.array(self.depth), n_features=np.array(self.n_features))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['feature'], data['threshold'], data['children'], data['value'],
+                   data['roots'], data['classes'].astype(object), int(data['depth']), int(data['n_features']))
+
+    def leaves(self, X):
+        """ Leaf index reached in every tree for every row of X, shape (n_rows, n_trees). """
+        # sklearn compares float32 inputs against float64 thresholds; do the same so splits agree.
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        feature, threshold, children = self.feature, self.threshold, self.children
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for step in range(self.depth):
+            go_left = X[rows, feature[node]] <= threshold[node]
+            node = children[node, go_left.view(np.int8)]
+            # Most paths are much shorter than the deepest one.
+            if step % 8 == 7 and np.isinf(threshold[node]).all():
+                break
+        return node
+
+    def _build_spine(self):
+        """
+        For binary splits a walk goes left on every absent symptom, so a row with k symptoms
+        turns right at most k times. spine_hit[n, f] is the first node on n's all-left path
+        that tests feature f (-1 if none), and zero_leaf[n] is where that all-left path ends.
+        """
+        n_nodes = len(self.feature)
+        right, left = self.children[:, 0], self.children[:, 1]
+        spine_hit = np.full((n_nodes, self.n_features), -1, dtype=np.int32)
+        zero_leaf = np.arange(n_nodes, dtype=np.int32)
+        depth = np.zeros(n_nodes, dtype=np.int32)
+        is_leaf = left == np.arange(n_nodes)
+        # Children always have larger ids than their parent, so sweep ids in reverse.
+        for n in range(n_nodes - 1, -1, -1):
+            if not is_leaf[n]:
+                spine_hit[n] = spine_hit[left[n]]
+                spine_hit[n, self.feature[n]] = n
+                zero_leaf[n] = zero_leaf[left[n]]
+        for n in range(n_nodes):
+            if not is_leaf[n]:
+                depth[left[n]] = depth[right[n]] = depth[n] + 1
+        self._spine = (spine_hit, zero_leaf, depth, right)
+
+    def _leaves_sparse(self, active):
+        """ Leaf per tree for a single 0/1 row given the indices of its set features. """
+        if self._spine is None:
+            self._build_spine()
+        spine_hit, zero_leaf, depth, right = self._spine
+        node = self.roots.astype(np.intp)
+        if len(active) == 0:
+            return zero_leaf[node]
+        trees = np.arange(len(node))
+        far = np.iinfo(np.int32).max
+        while True:
+            hits = spine_hit[node[:, None], active]                    # (n_trees, k)
+            hit_depth = np.where(hits >= 0, depth[hits], far)
+            first = hit_depth.argmin(axis=1)
+            turned = hit_depth[trees, first] != far
+            if not turned.any():
+                return zero_leaf[node]
+            node = np.where(turned, right[hits[trees, first]], zero_leaf[node])
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if self.binary and (X.ndim == 1 or X.shape[0] == 1):
+            row = X.ravel()
+            active = np.flatnonzero(row)
+            if (row[active] == 1).all():
+                # Summing axis 0 adds tree by tree, the same order as the loop below.
+                return (self.value[self._leaves_sparse(active)].sum(axis=0) / len(self.roots))[None, :]
+        node = self.leaves(X)
+        # Accumulate tree by tree in float64, the same order sklearn sums per-tree probabilities,
+        # so argmax ties resolve identically.
+        proba = np.zeros((node.shape[0], self.value.shape[1]))
+        for t in range(node.shape[1]):
+            proba += self.value[node[:, t]]
+        proba /= node.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def benchmark(model, flat, columns_count, repeat=200):
+    rng = np.random.default_rng(0)
+    X = (rng.random((2000, columns_count)) < 0.04).astype(np.float64)
+
+    expected = model.predict(X)
+    mismatches = int((expected != flat.predict(X)).sum())
+    mismatches += sum(expected[i] != flat.predict(X[i:i + 1])[0] for i in range(300))
+    row = X[:1]
+    sk = min(timeit.repeat(lambda: model.predict(row), number=repeat, repeat=3)) / repeat
+    fl = min(timeit.repeat(lambda: flat.predict(row), number=repeat, repeat=3)) / repeat
+    sk_batch = min(timeit.repeat(lambda: model.predict(X), number=3, repeat=3)) / 3
+    fl_batch = min(timeit.repeat(lambda: flat.predict(X), number=3, repeat=3)) / 3
+    print(f"mismatches vs model.predict ({len(X)} rows batched + 300 one at a time): {mismatches}")
+    print(f"single row: sklearn {sk * 1e6:9.1f} us   flat {fl * 1e6:9.1f} us   ({sk / fl:.1f}x)")
+    print(f"{len(X)} rows:  sklearn {sk_batch * 1e3:9.1f} ms   flat {fl_batch * 1e3:9.1f} ms   ({sk_batch / fl_batch:.1f}x)")
+    return mismatches
+
+
+if __name__ == '__main__':
+    import joblib
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'disease_model.pkl'
+    model = joblib.load(model_path)
+    flat = FlatForest.from_sklearn(model)
+    flat.save(model_path.rsplit('.', 1)[0] + '.flat.npz')
+    sys.exit(1 if benchmark(model, flat, model.n_features_in_) else 0)
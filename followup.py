@@ -0,0 +1,73 @@
+"""
+Information-gain follow-up questions.
+
+train.py stores, for every disease, how often each symptom column is present in
+Training.csv. Given the model's current ranking of candidate diseases, the most
+useful next question is the unasked symptom whose yes/no answer is expected to
+reduce the entropy of that ranking the most. All candidate symptoms are scored
+at once with a few (k x n_symptoms) array operations.
+"""
+import numpy as np
+
+
+def _entropy(p, axis=0):
+    # Smoothed frequencies keep every term positive; the guard only matters for exact zeros.
+    return -np.sum(np.where(p > 0, p * np.log2(np.where(p > 0, p, 1)), 0.0), axis=axis)
+
+
+class SymptomFrequencies:
+    """ P(symptom present | disease) for every (disease, symptom column) pair, Laplace-smoothed. """
+
+    def __init__(self, classes, columns, freq):
+        self.classes = np.asarray(classes, dtype=object)
+        self.columns = list(columns)
+        self.freq = np.asarray(freq, dtype=np.float64)      # (n_classes, n_columns)
+        self.class_index = {c: i for i, c in enumerate(self.classes)}
+
+    @classmethod
+    def from_matrix(cls, X, y, columns, alpha=1.0):
+        """ Counts from a 0/1 (sparse or dense) training matrix and its labels. """
+        classes, codes = np.unique(np.asarray(y, dtype=str), return_inverse=True)
+        onehot = np.zeros((len(classes), X.shape[0]))
+        onehot[codes, np.arange(X.shape[0])] = 1
+        counts = np.asarray((X.T @ onehot.T).T if hasattr(X, 'tocsr') else onehot @ X, dtype=np.float64)
+        totals = onehot.sum(axis=1, keepdims=True)
+        return cls(classes.astype(object), columns, (counts + alpha) / (totals + 2 * alpha))
+
+    def save(self, path):
+        np.savez(path, classes=self.classes.astype(str), columns=np.array(self.columns, dtype=str), freq=self.freq)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['classes'].astype(object), data['columns'].tolist(), data['freq'])
+
+    def aligned(self, classes, columns):
+        """ Reordered to a model's class and column order; None if they don't describe the same data. """
+        classes = [str(c) for c in classes]
+        if set(classes) != set(self.class_index) or set(columns) != set(self.columns):
+            return None
+        column_pos = {c: i for i, c in enumerate(self.columns)}
+        rows = [self.class_index[c] for c in classes]
+        cols = [column_pos[c] for c in columns]
+        return SymptomFrequencies(classes, columns, self.freq[np.ix_(rows, cols)])
+
+    def information_gain(self, candidates, probabilities):
+        """ Expected entropy reduction over `candidates` (disease names) from asking about each column. """
+        p = np.asarray(probabilities, dtype=np.float64)
+        p = p / p.sum()
+        F = self.freq[[self.class_index[c] for c in candidates]]         # (k, n_columns)
+        joint_yes = p[:, None] * F
+        joint_no = p[:, None] - joint_yes
+        p_yes = joint_yes.sum(axis=0)
+        p_no = 1.0 - p_yes
+        h_yes = _entropy(joint_yes / p_yes)
+        h_no = _entropy(joint_no / p_no)
+        return _entropy(p) - (p_yes * h_yes + p_no * h_no)
+
+    def best_question(self, candidates, probabilities, exclude, min_gain=0.05):
+        """ (column index, gain) of the most informative column not masked by `exclude`, or None. """
+        gain = self.information_gain(candidates, probabilities)
+        gain[exclude] = -np.inf
+        best = int(np.argmax(gain))
+        return (best, float(gain[best])) if gain[best] >= min_gain else None
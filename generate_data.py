@@ -1,39 +1,127 @@
-import pandas as pd
+"""
+Synthetic training data: rows sampled from the Testing.csv templates, with per-symptom noise.
+
+    python generate_data.py                                        # Training.csv, 120 rows per template, 2% drop
+    python generate_data.py --rows 10000000 --out data/synthetic --seed 7
+    python generate_data.py --rows 1000000 --add-rate 0.002 --rates rates.json --out data/noisy
+
+Each row copies a randomly chosen template row. Then each symptom the template has is
+dropped with its drop rate (the patient forgets to mention it), and each one it lacks
+is added with its add rate (a spurious mention). --rates is a JSON file of per-symptom
+overrides: {"high_fever": {"drop": 0.1, "add": 0.0}, ...}.
+
+Rows are generated and written one chunk at a time from a seeded numpy Generator, so
+memory stays flat whatever --rows is, and the same seed and chunk size give the same data.
+An --out ending in .csv writes CSV text. Anything else is a directory in the bit-packed
+format from dataset.py, which train.py reads memory-mapped: python train.py --data data/synthetic
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
 import numpy as np
 
-# 1. Load your existing Testing.csv (which has the correct 132 columns)
-try:
-    df_test = pd.read_csv('Testing.csv')
-    print("Loaded Testing.csv successfully.")
-except FileNotFoundError:
-    print("Error: Could not find Testing.csv. Make sure it is in this folder.")
-    exit()
-
-# 2. Replicate the data to simulate a larger dataset
-# We repeat the existing rows 120 times to get ~4900 rows (standard size)
-df_train = pd.concat([df_test] * 120, ignore_index=True)
-
-# 3. Add some "Noise" (Randomness)
-# In real life, people don't have EVERY symptom perfectly. 
-# We will randomly flip some 1s to 0s (missed symptoms) to make the model robust.
-def add_noise(row):
-    # Get the symptoms (all columns except the last 'prognosis')
-    symptoms = row[:-1]
-    
-    # 5% chance to flip a symptom (simulate user forgetting to mention something)
-    mask = np.random.rand(len(symptoms)) < 0.05
-    symptoms[mask] = 0 # Turn off some symptoms randomly
-    
-    return row
-
-# Apply noise to the new training data
-# (We exclude the target column 'prognosis' from noise)
-cols = df_train.columns[:-1]
-df_train[cols] = df_train[cols].apply(lambda x: x.mask(np.random.random(x.shape) < 0.02, 0))
-
-# 4. Save the new file
-df_train.to_csv('Training.csv', index=False)
-print("------------------------------------------------")
-print(f"SUCCESS! Generated 'Training.csv' with {len(df_train)} rows.")
-print("You can now run 'python app.py' to train your model.")
-print("------------------------------------------------")
\ No newline at end of file
+from dataset import DatasetWriter
+
+SOURCE_PATH = 'Testing.csv'
+OUTPUT_PATH = 'Training.csv'
+ROWS_PER_TEMPLATE = 120
+
+
+def read_templates(path):
+    """ (templates as a bool matrix, class codes, classes, columns, header) from a symptom CSV. """
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [row for row in reader if row]
+    columns = [c.strip() for c in header[:-1]]
+    templates = np.array([row[:-1] for row in rows], dtype=np.uint8).astype(bool)
+    classes, codes = np.unique([row[-1].strip() for row in rows], return_inverse=True)
+    return templates, codes, [str(c) for c in classes], columns, header
+
+
+def symptom_rates(columns, drop_rate, add_rate, overrides):
+    """ Per-column (drop, add) probability vectors, with any per-symptom overrides applied. """
+    drop = np.full(len(columns), drop_rate, dtype=np.float32)
+    add = np.full(len(columns), add_rate, dtype=np.float32)
+    index = {c: i for i, c in enumerate(columns)}
+    for symptom, rates in overrides.items():
+        if symptom not in index:
+            raise ValueError(f"Unknown symptom in rates: {symptom}")
+        drop[index[symptom]] = rates.get('drop', drop_rate)
+        add[index[symptom]] = rates.get('add', add_rate)
+    return drop, add
+
+
+def generate(templates, codes, rows, drop, add, seed, chunk_rows):
+    """ Yields (X, codes) blocks of at most chunk_rows rows; X is a (n, n_columns) bool array. """
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        pick = rng.integers(0, len(templates), n)
+        # One draw per cell: a present symptom survives above its drop rate, an absent one appears below its add rate.
+        noise = rng.random((n, templates.shape[1]), dtype=np.float32)
+        yield np.where(templates[pick], noise >= drop, noise < add), codes[pick]
+
+
+def write_csv(path, header, classes, blocks):
+    labels = [f",{c}\n".encode() for c in classes]
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        f.write((','.join(header) + '\n').encode())
+        for X, codes in blocks:
+            # "0,1,0,...": digits in the even byte positions, commas in between, one row per line.
+            text = np.full((X.shape[0], 2 * X.shape[1] - 1), ord(','), dtype=np.uint8)
+            text[:, 0::2] = X + ord('0')
+            f.write(b''.join(row.tobytes() + labels[code] for row, code in zip(text, codes)))
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate noisy synthetic training rows from symptom templates.")
+    parser.add_argument('--source', default=SOURCE_PATH, help="template rows (a symptom CSV)")
+    parser.add_argument('--out', default=OUTPUT_PATH, help="a .csv file, or a directory for the bit-packed format")
+    parser.add_argument('--rows', type=int, help=f"rows to generate (default {ROWS_PER_TEMPLATE} per template)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drop-rate', type=float, default=0.02, help="chance a template symptom is left out")
+    parser.add_argument('--add-rate', type=float, default=0.0, help="chance a symptom the template lacks is added")
+    parser.add_argument('--rates', help="JSON file of per-symptom {\"drop\": p, \"add\": p} overrides")
+    parser.add_argument('--chunk-rows', type=int, default=1 << 16)
+    args = parser.parse_args(argv)
+
+    templates, codes, classes, columns, header = read_templates(args.source)
+    rows = args.rows if args.rows is not None else len(templates) * ROWS_PER_TEMPLATE
+    overrides = {}
+    if args.rates:
+        with open(args.rates) as f:
+            overrides = json.load(f)
+    try:
+        drop, add = symptom_rates(columns, args.drop_rate, args.add_rate, overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    blocks = generate(templates, codes, rows, drop, add, args.seed, args.chunk_rows)
+    if args.out.endswith('.csv'):
+        write_csv(args.out, header, classes, blocks)
+        size = os.path.getsize(args.out)
+    else:
+        writer = DatasetWriter(args.out, rows, columns, classes, info={
+            "source": os.path.basename(args.source), "seed": args.seed, "chunk_rows": args.chunk_rows,
+            "drop_rate": args.drop_rate, "add_rate": args.add_rate, "rates": overrides,
+        })
+        for X, block_codes in blocks:
+            writer.write(X, block_codes)
+        writer.close()
+        size = sum(os.path.getsize(os.path.join(args.out, name)) for name in os.listdir(args.out))
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {rows} rows to {args.out} ({size / 1e6:.1f} MB) in {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f} rows/s, seed {args.seed})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
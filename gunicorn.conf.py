@@ -0,0 +1,53 @@
+import gc
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Load app.py (and with it the model) once in the master, then fork the workers from it.
+# Pages holding the forest are shared copy-on-write, so memory no longer grows by one
+# full model per worker. MODEL_WARMUP=background boots faster instead: workers start
+# serving at once and each loads its own copy in a thread.
+preload_app = True
+wsgi_app = 'app:create_app()'
+os.environ.setdefault('MODEL_WARMUP', 'preload')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '7860')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+# Threaded workers: a streaming chat turn (/predict_stream) only waits on the app's
+# inference pool, so each worker can keep many conversations open at once.
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def when_ready(server):
+    # Move everything allocated during preload out of the GC's reach. Otherwise the first
+    # collection in each worker writes to every object header and un-shares those pages.
+    gc.freeze()
+    import app
+    if app.MAINTENANCE_INTERVAL_HOURS > 0:
+        threading.Thread(target=maintenance_schedule, args=(server, app.MAINTENANCE_INTERVAL_HOURS),
+                         name='maintenance', daemon=True).start()
+
+
+def maintenance_schedule(server, interval_hours):
+    # Retention and compaction run from the master, never in a worker. Each check is a separate
+    # `flask maintenance` process, so the master's database connections (which the workers it
+    # forks would inherit) stay untouched. --if-due makes all but one check per interval a
+    # no-op, including the first one after a restart.
+    env = dict(os.environ, FLASK_APP='app')
+    command = [sys.executable, '-m', 'flask', 'maintenance', '--if-due', str(interval_hours)]
+    while True:
+        time.sleep(min(interval_hours, 1) * 3600)
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode:
+            server.log.error("Maintenance run failed:\n%s", result.stderr)
+        else:
+            server.log.info("Maintenance: %s", result.stdout.strip())
+
+
+def post_fork(server, worker):
+    import app
+    if app.MODEL_WARMUP == 'background':
+        app.start_warmup()
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def build_symptom_matrix(symptom_lists, column_index):
+    """ Turns many symptom lists into one sparse 0/1 matrix. Unknown names are returned per row. """
+    # Only the batch endpoint needs scipy; importing it here keeps it off the startup path.
+    from scipy import sparse
+
+    indptr = [0]
+    indices = []
+    unknown = []
+    for symptoms in symptom_lists:
+        row = set()
+        missing = []
+        for s in symptoms:
+            idx = column_index.get(s)
+            if idx is None:
+                missing.append(s)
+            else:
+                row.add(idx)
+        indices.extend(sorted(row))
+        indptr.append(len(indices))
+        unknown.append(missing)
+
+    data = np.ones(len(indices), dtype=np.float32)
+    X = sparse.csr_matrix(
+        (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(symptom_lists), len(column_index)),
+    )
+    return X, unknown
+
+
+def top_k(probabilities, classes, k):
+    """ Returns (labels, probabilities) of the k most likely classes per row, best first. """
+    k = max(1, min(k, probabilities.shape[1]))
+    # Stable sort keeps ties in class order, so column 0 always agrees with model.predict().
+    idx = np.argsort(-probabilities, axis=1, kind='stable')[:, :k]
+    rows = np.arange(probabilities.shape[0])[:, None]
+    return classes[idx], probabilities[rows, idx]
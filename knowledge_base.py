@@ -0,0 +1,84 @@
+"""
+Educational details for the diagnosis card, one entry per disease the model can predict.
+
+data/disease_info.json is read once into a read-only index of finished cards, so a
+diagnosis looks its card up instead of building it. A name the file doesn't cover
+(e.g. a class added by retraining) gets a generic card with a search link. That card
+is built once per name and kept in a small LRU cache; missing() lists those names
+so startup can report them, along with the labels app.py's safety check can
+answer with in place of the model's.
+"""
+import argparse
+import json
+import sys
+from functools import lru_cache
+from types import MappingProxyType
+from urllib.parse import quote_plus
+
+FIELDS = ('desc', 'causes', 'risk', 'action', 'link')
+
+GENERIC = {
+    "desc": "A medical condition affecting the body's normal functions.",
+    "causes": "Various factors including infections, genetics, or lifestyle.",
+    "risk": "Complications may arise if left untreated.",
+    "action": "Consult a general physician for a proper diagnosis.",
+}
+
+
+def search_link(name):
+    return f"https://www.google.com/search?q={quote_plus(name)}+symptoms+treatment"
+
+
+class KnowledgeBase:
+    def __init__(self, entries):
+        cards = {}
+        for name, entry in entries.items():
+            unknown = set(entry) - set(FIELDS)
+            if unknown:
+                raise ValueError(f"{name}: unknown fields {sorted(unknown)}")
+            name = name.strip()
+            cards[name] = dict(GENERIC, link=search_link(name))
+            cards[name].update(entry)
+        # Cards are shared by every response that uses them; nothing may modify them.
+        self.cards = MappingProxyType(cards)
+        self._generic = lru_cache(maxsize=256)(self._generic_card)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _generic_card(name):
+        return dict(GENERIC, link=search_link(name))
+
+    def card(self, disease_name):
+        name = disease_name.strip()
+        card = self.cards.get(name)
+        return card if card is not None else self._generic(name)
+
+    def missing(self, classes):
+        """ Names (model classes, safety-check labels) without an entry, which would get the generic card. """
+        return sorted({str(c).strip() for c in classes} - set(self.cards))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that every diagnosis the app can give has a knowledge base entry.")
+    parser.add_argument('--info', default='data/disease_info.json')
+    parser.add_argument('--manifest', default='model_manifest.json')
+    args = parser.parse_args(argv)
+
+    # The labels the safety check can answer with instead of the model; importing app.py never loads the model.
+    from app import SAFETY_LABELS
+
+    with open(args.manifest) as f:
+        names = sorted(set(json.load(f)['classes']) | set(SAFETY_LABELS))
+    missing = KnowledgeBase.from_file(args.info).missing(names)
+    for name in missing:
+        print(f"missing: {name}")
+    print(f"{len(names) - len(missing)}/{len(names)} diagnoses (model classes and safety-check labels) have an entry in {args.info}")
+    return 1 if missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+In-process latency metrics in the Prometheus text format, without a client library.
+
+    with metrics.timer('inference'):
+        ...
+
+Every timer feeds a histogram labelled by stage. When a request is sampled for
+tracing, its stage timings are also collected on flask.g and written as one
+structured log line at the end of the request. Each gunicorn worker keeps its own
+numbers, so the worker pid is part of every sample.
+"""
+import bisect
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Seconds; the hot path is mostly sub-millisecond, page renders and commits reach tens of ms.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+trace_log = logging.getLogger('healthbot.trace')
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+
+
+class Metrics:
+    def __init__(self, trace_sample_rate=0.0):
+        self.trace_sample_rate = trace_sample_rate
+        self._lock = threading.Lock()
+        self._histograms = {}   # (metric name, label tuple) -> Histogram
+        self._counters = {}     # (metric name, label tuple) -> int
+        self._gauges = []       # callables returning [(name, labels, value, help)]
+        self._help = {}
+
+    def observe(self, name, seconds, help_text='', **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+                self._help.setdefault(name, help_text)
+            hist.observe(seconds)
+
+    def inc(self, name, help_text='', **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            self._help.setdefault(name, help_text)
+
+    def gauge(self, fn):
+        """ Registers a callable evaluated at scrape time; returns fn so it can decorate. """
+        self._gauges.append(fn)
+        return fn
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('healthbot_stage_seconds', elapsed, 'Time spent per processing stage.', stage=stage)
+            if has_request_context():
+                trace = g.get('trace')
+                if trace is not None:
+                    trace.append((stage, round(elapsed * 1e3, 3)))
+
+    def init_app(self, app):
+        @app.before_request
+        def _start_request():
+            g.request_start = time.perf_counter()
+            g.trace = [] if self.trace_sample_rate and random.random() < self.trace_sample_rate else None
+
+        @app.after_request
+        def _finish_request(response):
+            start = g.get('request_start')
+            if start is None:
+                return response
+            elapsed = time.perf_counter() - start
+            endpoint = request.endpoint or 'unknown'
+            self.observe('healthbot_request_seconds', elapsed, 'Request latency by endpoint.',
+                         endpoint=endpoint, method=request.method)
+            self.inc('healthbot_requests_total', 'Requests by endpoint and status.',
+                     endpoint=endpoint, method=request.method, status=response.status_code)
+            trace = g.get('trace')
+            if trace is not None:
+                trace_log.info(json.dumps({
+                    "endpoint": endpoint, "method": request.method, "status": response.status_code,
+                    "ms": round(elapsed * 1e3, 3), "stages": trace,
+                }))
+            return response
+
+    def render(self):
+        """ All metrics in the Prometheus text exposition format. """
+        pid = os.getpid()
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            helps = dict(self._help)
+
+        seen = set()
+        for (name, labels), hist in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {helps.get(name, '')}", f"# TYPE {name} histogram"]
+            labels = labels + (('pid', pid),)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float('inf'),), hist.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{{_labels(labels + (("le", le),))}}} {cumulative}')
+            lines.append(f'{name}_sum{{{_labels(labels)}}} {hist.total:.6f}')
+            lines.append(f'{name}_count{{{_labels(labels)}}} {hist.count}')
+
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {helps.get(name, '')}", f"# TYPE {name} counter"]
+            lines.append(f'{name}{{{_labels(labels + (("pid", pid),))}}} {value}')
+
+        for fn in self._gauges:
+            for name, labels, value, help_text in fn():
+                if value is None:
+                    continue
+                if name not in seen:
+                    seen.add(name)
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                labels = tuple(sorted(labels.items())) + (('pid', pid),)
+                lines.append(f'{name}{{{_labels(labels)}}} {float(value):g}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,145 @@
+"""
+Schema and data migrations for site.db.
+
+    python migrations.py                 # convert legacy HTML diagnoses and JSON symptom lists, then VACUUM
+    python migrations.py --db other.db --columns symptom_columns.pkl
+
+add_missing_columns() runs on every startup (see init_db in app.py) so older
+databases gain new nullable/defaulted columns. The data conversion is a one-off
+and is only run from the command line.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+
+from sqlalchemy import inspect, text
+
+from session_state import SessionState, Vocabulary
+
+DEFAULT_DB = os.path.join('instance', 'site.db')
+DEFAULT_COLUMNS = 'symptom_columns.pkl'
+
+# The only dynamic parts of the old card are the prediction heading and the disease details,
+# and the details are looked up from the prediction again when the card is rendered.
+LEGACY_CARD_RE = re.compile(r'Analysis Result</p>\s*<h3[^>]*>(.*?)</h3>', re.S)
+
+
+def add_missing_columns(engine, metadata):
+    """ ALTER TABLE ... ADD COLUMN for model columns an existing table doesn't have yet. """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(engine.dialect)}'
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT '{column.server_default.arg}'"
+                conn.execute(text(ddl))
+
+
+def convert_legacy_diagnoses(conn, batch_size=500):
+    """ Rewrites old rendered-HTML diagnosis messages as compact records. Returns (rows, bytes before, bytes after). """
+    rows = before = after = 0
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            "SELECT id, content FROM chat_message WHERE id > ? AND sender = 'bot' AND kind = 'text' "
+            "AND content LIKE '%Analysis Result%' ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not batch:
+            break
+        updates = []
+        for msg_id, content in batch:
+            last_id = msg_id
+            m = LEGACY_CARD_RE.search(content)
+            if not m:
+                continue
+            prediction = m.group(1).strip()
+            record = json.dumps({"prediction": prediction, "details": prediction, "model": None}, separators=(',', ':'))
+            updates.append((record, msg_id))
+            before += len(content.encode())
+            after += len(record.encode())
+        conn.executemany("UPDATE chat_message SET kind = 'diagnosis', content = ?, options = NULL WHERE id = ?", updates)
+        conn.commit()
+        rows += len(updates)
+    return rows, before, after
+
+
+def convert_symptom_lists(conn, columns, batch_size=500):
+    """ Rewrites JSON collected_symptoms lists as bitmask + flags over `columns`. Returns (rows, bytes before, bytes after). """
+    vocab = Vocabulary(columns)
+    conn.execute("INSERT OR IGNORE INTO symptom_vocabulary (digest, columns) VALUES (?, ?)",
+                 (vocab.digest, json.dumps(vocab.columns)))
+    rows = before = after = 0
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            "SELECT id, collected_symptoms FROM chat_session WHERE id > ? AND symptom_bits IS NULL "
+            "AND collected_symptoms IS NOT NULL ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not batch:
+            break
+        updates = []
+        for session_id, collected in batch:
+            last_id = session_id
+            state = SessionState.from_names(vocab, json.loads(collected or '[]'))
+            bits, flags = state.bits(), state.flags_text()
+            updates.append((bits, vocab.digest, flags, session_id))
+            before += len(collected.encode())
+            after += len(bits) + len(flags)
+        conn.executemany(
+            "UPDATE chat_session SET symptom_bits = ?, symptom_vocab = ?, flags = ?, collected_symptoms = NULL WHERE id = ?",
+            updates,
+        )
+        conn.commit()
+        rows += len(updates)
+    return rows, before, after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert stored HTML diagnosis cards and JSON symptom lists to compact records.")
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--columns', default=DEFAULT_COLUMNS, help="symptom columns the session bitmasks are laid out over")
+    parser.add_argument('--no-vacuum', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No database at {args.db}")
+        return 1
+    size_before = os.path.getsize(args.db)
+    conn = sqlite3.connect(args.db)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(chat_message)")}
+    if 'kind' not in columns:
+        conn.execute("ALTER TABLE chat_message ADD COLUMN kind VARCHAR(10) NOT NULL DEFAULT 'text'")
+    session_columns = {row[1] for row in conn.execute("PRAGMA table_info(chat_session)")}
+    for name, ddl in (('symptom_bits', 'BLOB'), ('symptom_vocab', 'VARCHAR(16)'), ('flags', "TEXT NOT NULL DEFAULT ''")):
+        if name not in session_columns:
+            conn.execute(f"ALTER TABLE chat_session ADD COLUMN {name} {ddl}")
+    conn.execute("CREATE TABLE IF NOT EXISTS symptom_vocabulary (digest VARCHAR(16) NOT NULL PRIMARY KEY, columns TEXT NOT NULL)")
+    conn.commit()
+
+    rows, before, after = convert_legacy_diagnoses(conn)
+    print(f"Converted {rows} diagnosis messages: {before} -> {after} content bytes")
+    import joblib  # only the command line needs it; app.py imports this module at startup
+
+    rows, before, after = convert_symptom_lists(conn, joblib.load(args.columns))
+    print(f"Converted {rows} session symptom lists: {before} -> {after} bytes")
+    if not args.no_vacuum:
+        conn.execute("VACUUM")
+    conn.close()
+    size_after = os.path.getsize(args.db)
+    print(f"{args.db}: {size_before} -> {size_after} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from flat_forest import FlatForest
+from followup import SymptomFrequencies
+
+log = logging.getLogger('healthbot.model')
+
+# One immutable snapshot of everything the prediction path needs. The registry
+# swaps the whole tuple in a single assignment, so readers never see a model
+# paired with the columns of a different artifact.
+LoadedModel = namedtuple('LoadedModel', [
+    'model', 'columns', 'column_index', 'version', 'loaded_at', 'load_seconds', 'stamp', 'manifest', 'flat',
+    'frequencies',
+])
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Loads the model + symptom columns once per worker and reloads them when the files change.
+
+    When a manifest is there, it decides: a new set of files is only swapped in once each
+    file's sha256 (and the column list) matches what the manifest records. Until then, as
+    in the middle of train.py's promote(), the current model stays in service.
+    """
+
+    def __init__(self, model_path, columns_path, manifest_path=None, check_interval=2.0, mmap_mode=None,
+                 frequencies_path=None):
+        self.model_path = model_path
+        self.columns_path = columns_path
+        self.manifest_path = manifest_path
+        # Optional per-disease symptom frequencies (train.py) for follow-up questions.
+        self.frequencies_path = frequencies_path
+        self.check_interval = check_interval
+        # 'r' maps the numpy arrays of an uncompressed artifact read-only instead of copying them.
+        self.mmap_mode = mmap_mode
+        self._lock = threading.Lock()
+        self._current = None
+        self._last_check = 0.0
+        self._digests = {}
+        self._rejected = None
+        self.reloads = 0
+
+    def _stamp(self):
+        # (mtime, size) of each artifact; None for a file that isn't there yet.
+        stamp = []
+        for path in (self.model_path, self.columns_path, self.frequencies_path, self.manifest_path):
+            if path is None:
+                stamp.append(None)
+                continue
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _load(self, stamp):
+        start = time.perf_counter()
+        model_stamp, columns_stamp, frequencies_stamp, manifest_stamp = stamp
+        if columns_stamp is None:
+            return None
+
+        digests = {}
+        for path, s in ((self.model_path, model_stamp), (self.columns_path, columns_stamp),
+                        (self.frequencies_path, frequencies_stamp), (self.manifest_path, manifest_stamp)):
+            if s is not None:
+                digests[path] = file_digest(path)
+
+        # Touching a file without changing it only costs a hash, not an unpickle.
+        current = self._current
+        if current is not None and digests == self._digests:
+            return current._replace(stamp=stamp)
+
+        manifest = self._read_manifest() if manifest_stamp is not None else None
+        problem = self._check_digests(manifest, digests)
+        if problem is not None:
+            return self._reject(stamp, f"{problem} in {self.manifest_path}")
+
+        import joblib  # with it sklearn, once the model unpickles; kept off the import path
+
+        columns = list(joblib.load(self.columns_path))
+        if manifest is not None and manifest.get('columns') is not None and manifest['columns'] != columns:
+            return self._reject(stamp, f"symptom columns differ from {self.manifest_path}")
+        model = joblib.load(self.model_path, mmap_mode=self.mmap_mode) if model_stamp is not None else None
+        version = hashlib.sha256(''.join(digests[p] for p in (self.model_path, self.columns_path) if p in digests).encode()).hexdigest()[:12]
+
+        flat = self._flatten(model)
+        frequencies = self._read_frequencies(model, columns) if frequencies_stamp is not None else None
+        self._digests = digests
+        self.reloads += 1
+        return LoadedModel(
+            model=model,
+            columns=columns,
+            column_index={name: i for i, name in enumerate(columns)},
+            version=version,
+            loaded_at=time.time(),
+            load_seconds=time.perf_counter() - start,
+            stamp=stamp,
+            manifest=manifest,
+            flat=flat,
+            frequencies=frequencies,
+        )
+
+    def _check_digests(self, manifest, digests):
+        """ Why the files don't match the manifest's sha256s, or None if they do (or it records none). """
+        if manifest is None:
+            return None
+        for key, path in (('model_sha256', self.model_path), ('columns_sha256', self.columns_path),
+                          ('frequencies_sha256', self.frequencies_path)):
+            expected = manifest.get(key)
+            if expected is not None and digests.get(path) != expected:
+                return f"{path} does not match {key}"
+        return None
+
+    def _reject(self, stamp, problem):
+        # Logged once per set of files; get() doesn't try the same stamp again.
+        self._rejected = stamp
+        current = self._current
+        log.warning("Not loading the model files: %s. %s", problem,
+                    "Keeping the current model." if current is not None else "No model is loaded.")
+        return current
+
+    @staticmethod
+    def _flatten(model):
+        # Tree models also get a flattened copy for fast one-row predictions; anything else
+        # is served through sklearn as-is.
+        if model is None or not hasattr(getattr(model, 'estimators_', [model])[0], 'tree_'):
+            return None
+        flat = FlatForest.from_sklearn(model)
+        if flat.binary:
+            flat.predict_proba(np.zeros(flat.n_features))  # builds the lookup tables up front
+        return flat
+
+    def _read_frequencies(self, model, columns):
+        # Tables from another training run are ignored rather than misaligned.
+        if model is None:
+            return None
+        try:
+            frequencies = SymptomFrequencies.load(self.frequencies_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return frequencies.aligned(model.classes_, columns)
+
+    def _read_manifest(self):
+        # A manifest that doesn't record the model's digest can't vouch for it and is ignored.
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get('model_sha256') else None
+
+    @property
+    def current(self):
+        """ The loaded model, if any, without checking the files or loading anything. """
+        return self._current
+
+    def get(self):
+        """ Returns the active LoadedModel (or None if no columns file exists yet). """
+        now = time.monotonic()
+        current = self._current
+        if current is not None and now - self._last_check < self.check_interval:
+            return current
+
+        with self._lock:
+            current = self._current
+            if current is not None and now - self._last_check < self.check_interval:
+                return current
+            stamp = self._stamp()
+            if (current is None or stamp != current.stamp) and stamp != self._rejected:
+                try:
+                    self._current = self._load(stamp)
+                except Exception as e:
+                    # A corrupt or truncated artifact: don't retry (and re-hash) it on every request.
+                    self._current = self._reject(stamp, f"could not read {self.model_path} or its companions ({type(e).__name__}: {e})")
+            self._last_check = now
+            return self._current
+
+    def status(self):
+        current = self.get()
+        if current is None:
+            return {"loaded": False}
+        return {
+            "loaded": current.model is not None,
+            "version": current.version,
+            "loaded_at": datetime_iso(current.loaded_at),
+            "load_seconds": round(current.load_seconds, 4),
+            "n_features": len(current.columns),
+            "follow_up_questions": current.frequencies is not None,
+            "reloads": self.reloads,
+            "artifact_version": current.manifest.get('version') if current.manifest else None,
+            "test_accuracy": current.manifest.get('test_accuracy') if current.manifest else None,
+        }
+
+
+def datetime_iso(ts):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
@@ -0,0 +1,168 @@
+"""
+Token-bucket rate limiting per user and per client IP.
+
+    limiter = RateLimiter({'predict': Limit.parse('30/minute')}, {'predict': Limit.parse('120/minute')})
+    denied = limiter.hit('predict', user_id, ip)   # None when allowed, else (scope, seconds to wait)
+
+A bucket holds up to `count` tokens and refills at count/period per second; each
+request takes one. Buckets live in memory, so every gunicorn worker counts on its
+own and a client spread across N workers gets up to N times the limit. With a
+path, buckets are kept in a small SQLite file shared by all workers on the
+machine instead, which is exact but costs a write transaction per request.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(?:(second|minute|hour|day)|(\d+(?:\.\d+)?)s)\s*$')
+
+
+class Limit(namedtuple('Limit', 'count period')):
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        return self.count / self.period
+
+    @classmethod
+    def parse(cls, text):
+        """ '30/minute', '5/second' or '100/3600s'. """
+        m = LIMIT_RE.match(text)
+        if not m or int(m.group(1)) < 1:
+            raise ValueError(f"Bad rate limit: {text!r}")
+        return cls(int(m.group(1)), PERIODS[m.group(2)] if m.group(2) else float(m.group(3)))
+
+
+def parse_limits(spec):
+    """ {endpoint: Limit} from 'predict=30/minute,new_chat=10/minute'. An empty spec means no limits. """
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        endpoint, _, limit = part.partition('=')
+        limits[endpoint.strip()] = Limit.parse(limit)
+    return limits
+
+
+def refill(tokens, updated, now, limit):
+    """ A bucket's tokens at `now`; a bucket never seen before starts full. """
+    if tokens is None:
+        return float(limit.count)
+    return min(limit.count, tokens + (now - updated) * limit.rate)
+
+
+def admit(checks, levels):
+    """ None if every bucket has a token, else (scope, seconds until the emptiest one has). """
+    denied = None
+    for (scope, _, limit), tokens in zip(checks, levels):
+        if tokens < 1:
+            wait = (1 - tokens) / limit.rate
+            if denied is None or wait > denied[1]:
+                denied = (scope, wait)
+    return denied
+
+
+class RateLimiter:
+    def __init__(self, user_limits, ip_limits, path=None, max_buckets=100000):
+        self.user_limits = user_limits
+        self.ip_limits = ip_limits
+        self.endpoints = frozenset(user_limits) | frozenset(ip_limits)
+        self.path = path
+        self.max_buckets = max_buckets
+        self._buckets = {}       # key -> (tokens, updated)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"allowed": 0, "limited_user": 0, "limited_ip": 0}
+        if path:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS rate_bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _db(self):
+        # A connection must never cross a fork, so one per (process, thread).
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _checks(self, endpoint, user_id, ip):
+        checks = []
+        limit = self.user_limits.get(endpoint)
+        if limit is not None and user_id is not None:
+            checks.append(('user', f"{endpoint}:u:{user_id}", limit))
+        limit = self.ip_limits.get(endpoint)
+        if limit is not None and ip:
+            checks.append(('ip', f"{endpoint}:ip:{ip}", limit))
+        return checks
+
+    def hit(self, endpoint, user_id, ip):
+        """ Takes a token from each of the request's buckets. Returns None if allowed, else (scope, seconds to wait). """
+        checks = self._checks(endpoint, user_id, ip)
+        if not checks:
+            return None
+        now = time.time()
+        denied = self._hit_shared(checks, now) if self.path else self._hit_memory(checks, now)
+        with self._lock:
+            if denied is None:
+                self.stats["allowed"] += 1
+            else:
+                self.stats["limited_" + denied[0]] += 1
+        return denied
+
+    def _hit_memory(self, checks, now):
+        with self._lock:
+            levels = [refill(*self._buckets.get(key, (None, now)), now, limit) for _, key, limit in checks]
+            denied = admit(checks, levels)
+            # A refused request takes no tokens, so leaving its buckets untouched is exact.
+            if denied is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune(now)
+                for (_, key, _), tokens in zip(checks, levels):
+                    self._buckets[key] = (tokens - 1, now)
+        return denied
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket at all.
+        for key, (tokens, updated) in list(self._buckets.items()):
+            limit = self._limit_for(key)
+            if refill(tokens, updated, now, limit) >= limit.count:
+                del self._buckets[key]
+        if len(self._buckets) >= self.max_buckets:
+            self._buckets.clear()
+
+    def _limit_for(self, key):
+        endpoint, scope, _ = key.split(':', 2)
+        return (self.user_limits if scope == 'u' else self.ip_limits)[endpoint]
+
+    def _hit_shared(self, checks, now):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            keys = [key for _, key, _ in checks]
+            rows = dict((k, (t, u)) for k, t, u in db.execute(
+                f"SELECT key, tokens, updated FROM rate_bucket WHERE key IN ({','.join('?' * len(keys))})", keys))
+            levels = [refill(*rows.get(key, (None, now)), now, limit) for _, key, limit in checks]
+            denied = admit(checks, levels)
+            if denied is None:
+                db.executemany("INSERT OR REPLACE INTO rate_bucket (key, tokens, updated) VALUES (?, ?, ?)",
+                               [(key, tokens - 1, now) for (_, key, _), tokens in zip(checks, levels)])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return denied
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, buckets=len(self._buckets), shared=bool(self.path))
+
+
+def retry_after_header(seconds):
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,233 @@
+"""
+PDF consultation reports, rendered off the request thread and cached on disk.
+
+A report is identified by its session id plus a hash of everything printed on
+it, so any change to the session (new title, new symptoms) produces a new
+cache key and the stale files are removed when the new one is written (only
+files from before it was requested, so a slow render of an older version can't
+remove a newer one). Rendering
+runs in a small process pool; the cache directory is shared, so a report
+rendered by one gunicorn worker is served by all of them.
+
+A render that raises is logged with its report key and surfaces as ReportFailed. If the
+pool itself has died, calls raise ReportsUnavailable and the next one starts a new pool.
+"""
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+log = logging.getLogger('healthbot.reports')
+
+
+class ReportFailed(Exception):
+    """ Rendering a report raised; the cause is logged with the report key. """
+
+
+class ReportsUnavailable(Exception):
+    """ The render pool is broken. It is replaced on the next call, so retrying later can work. """
+
+
+def report_key(session_id, username, created_at, title, symptoms):
+    digest = hashlib.sha256(
+        json.dumps([username, created_at, title, symptoms]).encode()
+    ).hexdigest()[:16]
+    return f"{session_id}-{digest}"
+
+
+def render_report(username, created_at, title, symptoms):
+    """ Builds the report PDF and returns its bytes. Runs inside the pool processes. """
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(200, 10, txt="HealthBot AI - Consultation Report", ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"Patient: {username}", ln=True)
+    pdf.cell(200, 10, txt=f"Date: {created_at}", ln=True)
+    pdf.ln(10)
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(200, 10, txt="Diagnosis Result:", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"{title}", ln=True)
+    pdf.ln(5)
+    formatted_symptoms = [s.replace('_', ' ').title() for s in symptoms]
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(200, 10, txt="Reported Symptoms:", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, txt=", ".join(formatted_symptoms) if formatted_symptoms else "No specific symptoms recorded.")
+    pdf.ln(10)
+    pdf.set_font("Arial", 'I', 10)
+    pdf.set_text_color(128, 128, 128)
+    pdf.multi_cell(0, 10, txt="Disclaimer: AI-generated report. Consult a doctor.")
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def remove_reports(cache_dir, session_id, keep=None, older_than=None):
+    """ Deletes a session's cached reports, except the file named `keep` and files modified since `older_than`. """
+    for path in glob.glob(os.path.join(cache_dir, f"{session_id}-*.pdf")):
+        if os.path.basename(path) != keep:
+            try:
+                if older_than is None or os.stat(path).st_mtime < older_than:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _render_to_file(path, fields, requested_at):
+    data = render_report(**fields)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    # Renders of the same session written before this one was requested are stale now.
+    cache_dir, name = os.path.split(path)
+    remove_reports(cache_dir, name.split('-', 1)[0], keep=name, older_than=requested_at)
+    return path
+
+
+class ReportService:
+    def __init__(self, cache_dir, workers=2):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self._pool = None
+        self._pool_pid = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _executor(self):
+        # Created lazily in each worker process; a pool must not be inherited across fork.
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'))
+            self._pool_pid = os.getpid()
+            self._jobs = {}
+        return self._pool
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def status(self, key):
+        """ 'ready', 'pending', 'failed' or 'missing' for a report key. """
+        if os.path.exists(self.path(key)):
+            return 'ready'
+        with self._lock:
+            future = self._jobs.get(key)
+        if future is None:
+            return 'missing'
+        if not future.done():
+            return 'pending'
+        return 'failed' if future.exception() else 'ready'
+
+    def submit(self, key, fields):
+        """ Queues a render unless the report is cached or already queued. Returns the future or None. """
+        if os.path.exists(self.path(key)):
+            return None
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is not None and not (future.done() and future.exception()):
+                return future
+            try:
+                future = self._executor().submit(_render_to_file, self.path(key), fields, time.time())
+            except BrokenProcessPool:
+                self._pool = None
+                log.error("Report pool is broken, not rendering %s", key)
+                raise ReportsUnavailable() from None
+            self._jobs[key] = future
+        future.add_done_callback(lambda f, key=key: self._finished(key, f))
+        return future
+
+    def _finished(self, key, future):
+        # Failed jobs stay visible to status() until they are resubmitted.
+        if future.exception() is None:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def get(self, key, fields, wait=None):
+        """
+        Path of the rendered report, rendering it (and waiting up to `wait` seconds) if needed.
+        Raises FutureTimeout, ReportFailed or ReportsUnavailable.
+        """
+        future = self.submit(key, fields)
+        if future is None:
+            return self.path(key)
+        try:
+            future.result(timeout=wait)
+        except FutureTimeout:
+            raise
+        except BrokenProcessPool:
+            with self._lock:
+                self._pool = None
+                self._jobs.pop(key, None)
+            log.error("Report pool broke while rendering %s", key)
+            raise ReportsUnavailable() from None
+        except Exception as e:
+            log.error("Report %s failed to render", key, exc_info=True)
+            raise ReportFailed(key) from e
+        return self.path(key)
+
+    def invalidate(self, session_id):
+        remove_reports(self.cache_dir, session_id)
+
+    def stream_zip(self, items, wait=60):
+        """
+        A ZIP archive of many reports as a generator of chunks. `items` is an iterable of
+        (filename, key, fields). Every render is queued before this returns, so the pool
+        works ahead and a broken pool raises ReportsUnavailable before anything is sent.
+        A report that fails or times out is left out and listed in missing_reports.txt.
+        """
+        items = list(items)
+        for _, key, fields in items:
+            self.submit(key, fields)
+        return self._zip_chunks(items, wait)
+
+    def _zip_chunks(self, items, wait):
+        buffer = _ChunkBuffer()
+        missing = []
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for filename, key, fields in items:
+                try:
+                    path = self.get(key, fields, wait=wait)
+                except FutureTimeout:
+                    log.error("Report %s took over %ss, leaving it out of the archive", key, wait)
+                    missing.append(f"{filename}: not ready in time")
+                    continue
+                except (ReportFailed, ReportsUnavailable):
+                    missing.append(f"{filename}: could not be rendered")
+                    continue
+                with open(path, 'rb') as f:
+                    archive.writestr(filename, f.read())
+                yield buffer.take()
+            if missing:
+                archive.writestr('missing_reports.txt', "These reports could not be included:\n" + "\n".join(missing) + "\n")
+        yield buffer.take()
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """ Write-only, unseekable sink; zipfile then streams entries with data descriptors. """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
@@ -0,0 +1,230 @@
+"""
+Retention for the chat database: old consultations are archived, then the file is compacted.
+
+    flask --app app maintenance               # archive sessions idle for RETENTION_DAYS, ANALYZE, VACUUM if worth it
+    python retention.py --days 90 --no-vacuum # the same, by hand
+
+archive_sessions() moves the messages of every session with no activity since the
+cutoff into chat_archive, as one gzip-compressed JSON document per session, and
+marks the session archived_at. The chat_session row stays as the stub: the sidebar,
+titles, title search and PDF reports work from it unchanged. get_chat_history reads
+an archived session's messages back from its document on demand, and the next chat
+turn in it restores them to chat_message first. Archived messages drop out of the
+message search index until then.
+
+compact() runs ANALYZE, and VACUUM once at least VACUUM_FREE_FRACTION of the file is
+free pages (VACUUM rewrites the whole file and blocks writers while it runs).
+run_maintenance() does both and reports rows moved, bytes reclaimed and history
+query latency before and after. Nothing runs it inside the web workers: it runs from
+the `flask maintenance` command, which cron or the gunicorn master (with
+MAINTENANCE_INTERVAL_HOURS set) calls, and claim_run() records each run so --if-due
+can skip one that isn't due yet.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from storage import write_transaction
+
+log = logging.getLogger('healthbot.retention')
+
+VACUUM_FREE_FRACTION = 0.1
+
+# Enough of a ChatMessage for serialize_message().
+ArchivedMessage = namedtuple('ArchivedMessage', 'id sender kind content options timestamp')
+
+CANDIDATES_SQL = """
+SELECT s.id FROM chat_session s
+WHERE s.archived_at IS NULL AND s.created_at < :cutoff
+  AND EXISTS (SELECT 1 FROM chat_message m WHERE m.session_id = s.id)
+  AND NOT EXISTS (SELECT 1 FROM chat_message m WHERE m.session_id = s.id AND m.timestamp >= :cutoff)
+ORDER BY s.id LIMIT :limit
+"""
+
+# What the chat page asks for most: the newest page of a session, and the sidebar.
+HISTORY_SQL = "SELECT id, sender, kind, content, options FROM chat_message WHERE session_id = :id ORDER BY id DESC LIMIT 51"
+SIDEBAR_SQL = "SELECT id, title, created_at FROM chat_session WHERE user_id = :user ORDER BY created_at DESC, id DESC LIMIT 31"
+
+
+def pack_messages(rows):
+    """ gzip-compressed JSON of (id, sender, kind, content, options, timestamp) rows. """
+    records = [[r[0], r[1], r[2], r[3], r[4], None if r[5] is None else str(r[5])] for r in rows]
+    return gzip.compress(json.dumps(records, separators=(',', ':')).encode(), compresslevel=6)
+
+
+def unpack_messages(payload):
+    return [ArchivedMessage(*record) for record in json.loads(gzip.decompress(payload))]
+
+
+def archive_sessions(engine, cutoff, batch_size=200):
+    """ Archives every session idle since `cutoff`, batch_size per transaction. Returns counts and bytes. """
+    stats = {"sessions": 0, "messages": 0, "message_bytes": 0, "archive_bytes": 0}
+    while True:
+        with write_transaction(), engine.begin() as conn:
+            ids = [row[0] for row in conn.execute(text(CANDIDATES_SQL), {"cutoff": cutoff, "limit": batch_size})]
+            if not ids:
+                return stats
+            id_list = ','.join(str(int(i)) for i in ids)
+            by_session = {i: [] for i in ids}
+            for row in conn.execute(text(
+                    "SELECT session_id, id, sender, kind, content, options, timestamp FROM chat_message "
+                    f"WHERE session_id IN ({id_list}) ORDER BY id")):
+                by_session[row[0]].append(row[1:])
+            now = datetime.utcnow()
+            archives = []
+            for session_id, rows in by_session.items():
+                payload = pack_messages(rows)
+                archives.append({"session_id": session_id, "archived_at": now, "count": len(rows), "payload": payload})
+                stats["messages"] += len(rows)
+                stats["message_bytes"] += sum(len((r[3] or '').encode()) + len(r[4] or '') for r in rows)
+                stats["archive_bytes"] += len(payload)
+            conn.execute(text("INSERT INTO chat_archive (session_id, archived_at, message_count, payload) "
+                              "VALUES (:session_id, :archived_at, :count, :payload)"), archives)
+            conn.execute(text(f"DELETE FROM chat_message WHERE session_id IN ({id_list})"))
+            conn.execute(text(f"UPDATE chat_session SET archived_at = :now WHERE id IN ({id_list})"), {"now": now})
+            stats["sessions"] += len(ids)
+
+
+def archived_messages(session, session_id):
+    """ An archived session's messages, oldest first; [] if it has no archive. """
+    payload = session.execute(text("SELECT payload FROM chat_archive WHERE session_id = :id"), {"id": session_id}).scalar()
+    return unpack_messages(payload) if payload is not None else []
+
+
+def restore_session(session, session_id):
+    """ Puts an archived session's messages back in chat_message and drops its archive. Returns the message count. """
+    messages = archived_messages(session, session_id)
+    if messages:
+        # Message ids are normally kept, so cursors the client already holds stay valid. SQLite can
+        # hand a deleted id out again, though, and then the restored messages are renumbered in order.
+        ids = ','.join(str(int(m.id)) for m in messages)
+        taken = session.execute(text(f"SELECT 1 FROM chat_message WHERE id IN ({ids}) LIMIT 1")).first()
+        columns = "session_id, sender, kind, content, options, timestamp"
+        rows = [{"id": m.id, "session_id": session_id, "sender": m.sender, "kind": m.kind, "content": m.content,
+                 "options": m.options, "timestamp": m.timestamp} for m in messages]
+        if taken:
+            session.execute(text(f"INSERT INTO chat_message ({columns}) VALUES "
+                                 "(:session_id, :sender, :kind, :content, :options, :timestamp)"), rows)
+        else:
+            session.execute(text(f"INSERT INTO chat_message (id, {columns}) VALUES "
+                                 "(:id, :session_id, :sender, :kind, :content, :options, :timestamp)"), rows)
+    session.execute(text("DELETE FROM chat_archive WHERE session_id = :id"), {"id": session_id})
+    session.execute(text("UPDATE chat_session SET archived_at = NULL WHERE id = :id"), {"id": session_id})
+    return len(messages)
+
+
+def database_bytes(engine):
+    """ Size of the SQLite file and its WAL, or None for other databases. """
+    path = engine.url.database
+    if engine.dialect.name != 'sqlite' or not path or path == ':memory:':
+        return None
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def compact(engine, vacuum_free_fraction=VACUUM_FREE_FRACTION):
+    """ ANALYZE, then VACUUM if enough of the file is free pages, then truncate the WAL. SQLite only. """
+    if engine.dialect.name != 'sqlite':
+        return {"analyzed": False, "vacuumed": False}
+    # Straight on the driver connection: VACUUM can't run inside the transaction SQLAlchemy would begin.
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        cursor.execute("ANALYZE")
+        vacuumed = page_count > 0 and free_pages / page_count >= vacuum_free_fraction
+        if vacuumed:
+            cursor.execute("VACUUM")
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        cursor.close()
+    finally:
+        raw.close()
+    return {"analyzed": True, "vacuumed": vacuumed, "free_pages": free_pages, "pages": page_count}
+
+
+def query_latency(engine, samples=50, repeats=5):
+    """ Median milliseconds of the history-page and sidebar queries over the newest live sessions. """
+    timings = {"history_ms": [], "sidebar_ms": []}
+    with engine.connect() as conn:
+        sessions = conn.execute(text("SELECT id, user_id FROM chat_session WHERE archived_at IS NULL "
+                                     "ORDER BY id DESC LIMIT :n"), {"n": samples}).all()
+        for session_id, user_id in sessions:
+            for name, sql, params in (("history_ms", HISTORY_SQL, {"id": session_id}),
+                                      ("sidebar_ms", SIDEBAR_SQL, {"user": user_id})):
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    conn.execute(text(sql), params).all()
+                    timings[name].append((time.perf_counter() - start) * 1e3)
+    return {name: round(statistics.median(values), 4) if values else None for name, values in timings.items()}
+
+
+def run_maintenance(engine, retention_days, vacuum=True):
+    """ Archives sessions idle for retention_days (0 skips archiving) and compacts. Returns the report. """
+    start = time.perf_counter()
+    report = {"retention_days": retention_days, "bytes_before": database_bytes(engine),
+              "latency_before": query_latency(engine)}
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    report["archived"] = archive_sessions(engine, cutoff) if retention_days > 0 else None
+    report["compact"] = compact(engine) if vacuum else None
+    report["bytes_after"] = database_bytes(engine)
+    if report["bytes_before"] is not None:
+        report["bytes_reclaimed"] = report["bytes_before"] - report["bytes_after"]
+    report["latency_after"] = query_latency(engine)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    log.info("Maintenance: %s", json.dumps(report))
+    return report
+
+
+def claim_run(engine, interval_seconds):
+    """ Records the start of a run unless another one started within the interval. Returns its id or None. """
+    now = datetime.utcnow()
+    with write_transaction(), engine.begin() as conn:
+        last = conn.execute(text("SELECT MAX(started_at) FROM maintenance_run")).scalar()
+        if isinstance(last, str):
+            last = datetime.fromisoformat(last)
+        if last is not None and now - last < timedelta(seconds=interval_seconds):
+            return None
+        conn.execute(text("INSERT INTO maintenance_run (started_at) VALUES (:now)"), {"now": now})
+        return conn.execute(text("SELECT MAX(id) FROM maintenance_run")).scalar()
+
+
+def finish_run(engine, run_id, report):
+    with write_transaction(), engine.begin() as conn:
+        conn.execute(text("UPDATE maintenance_run SET finished_at = :now, report = :report WHERE id = :id"),
+                     {"now": datetime.utcnow(), "report": json.dumps(report), "id": run_id})
+
+
+def last_report(engine):
+    """ The report of the most recent finished run, or None. """
+    with engine.connect() as conn:
+        report = conn.execute(text("SELECT report FROM maintenance_run WHERE report IS NOT NULL "
+                                   "ORDER BY id DESC LIMIT 1")).scalar()
+    return json.loads(report) if report else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive idle chat sessions and compact the database.")
+    parser.add_argument('--days', type=float, default=None,
+                        help="archive sessions with no messages for this many days (default RETENTION_DAYS, 0 only compacts)")
+    parser.add_argument('--no-vacuum', action='store_true')
+    args = parser.parse_args(argv)
+
+    # The app's DATABASE_URL and schema; importing app.py creates any missing tables and columns.
+    import app as healthbot
+
+    report = healthbot.maintain(args.days, vacuum=not args.no_vacuum)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Full-text search over a user's consultations, backed by SQLite FTS5.
+
+Two FTS5 tables mirror the searchable text:
+    message_search  rowid = chat_message.id; body is the message text, or the predicted
+                    disease for a diagnosis record
+    session_search  rowid = chat_session.id; body is the session title
+Both carry an `owner` column holding "u<user id>". Every query is ANDed with
+owner:u<id>, so FTS5 intersects the term lists with the user's own list instead
+of filtering other users' hits afterwards.
+
+Triggers on chat_message and chat_session keep the tables in step with every
+insert, update and delete, including the per-message deletes of delete_chat's
+cascade and raw-SQL writes from migrations.py. install_search() creates the
+tables and triggers and indexes existing rows once; it is a no-op after that.
+"""
+import html
+import re
+
+from sqlalchemy import text
+
+MARK_START, MARK_END = '\x02', '\x03'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+MESSAGE_BODY = "CASE WHEN {row}.kind = 'diagnosis' THEN json_extract({row}.content, '$.prediction') ELSE {row}.content END"
+MESSAGE_OWNER = "'u' || (SELECT user_id FROM chat_session WHERE id = {row}.session_id)"
+
+SCHEMA = [
+    "CREATE VIRTUAL TABLE message_search USING fts5(owner, body, session_id UNINDEXED, tokenize = 'porter unicode61')",
+    "CREATE VIRTUAL TABLE session_search USING fts5(owner, body, tokenize = 'porter unicode61')",
+    f"""CREATE TRIGGER message_search_insert AFTER INSERT ON chat_message BEGIN
+        INSERT INTO message_search (rowid, owner, body, session_id)
+        VALUES (new.id, {MESSAGE_OWNER.format(row='new')}, {MESSAGE_BODY.format(row='new')}, new.session_id);
+    END""",
+    f"""CREATE TRIGGER message_search_update AFTER UPDATE OF content, kind ON chat_message BEGIN
+        DELETE FROM message_search WHERE rowid = old.id;
+        INSERT INTO message_search (rowid, owner, body, session_id)
+        VALUES (new.id, {MESSAGE_OWNER.format(row='new')}, {MESSAGE_BODY.format(row='new')}, new.session_id);
+    END""",
+    """CREATE TRIGGER message_search_delete AFTER DELETE ON chat_message BEGIN
+        DELETE FROM message_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER session_search_insert AFTER INSERT ON chat_session BEGIN
+        INSERT INTO session_search (rowid, owner, body) VALUES (new.id, 'u' || new.user_id, new.title);
+    END""",
+    """CREATE TRIGGER session_search_update AFTER UPDATE OF title ON chat_session BEGIN
+        DELETE FROM session_search WHERE rowid = old.id;
+        INSERT INTO session_search (rowid, owner, body) VALUES (new.id, 'u' || new.user_id, new.title);
+    END""",
+    """CREATE TRIGGER session_search_delete AFTER DELETE ON chat_session BEGIN
+        DELETE FROM session_search WHERE rowid = old.id;
+    END""",
+]
+
+BACKFILL = [
+    f"""INSERT INTO message_search (rowid, owner, body, session_id)
+        SELECT m.id, {MESSAGE_OWNER.format(row='m')}, {MESSAGE_BODY.format(row='m')}, m.session_id FROM chat_message m""",
+    "INSERT INTO session_search (rowid, owner, body) SELECT id, 'u' || user_id, title FROM chat_session",
+]
+
+# bm25 weights: the owner column only scopes the query and must not affect ranking.
+SEARCH_SQL = """
+SELECT kind, id, session_id, rank FROM (
+    SELECT 'session' AS kind, rowid AS id, rowid AS session_id, bm25(session_search, 0.0, 1.0) AS rank
+    FROM session_search WHERE session_search MATCH :query
+    UNION ALL
+    SELECT 'message', rowid, session_id, bm25(message_search, 0.0, 1.0)
+    FROM message_search WHERE message_search MATCH :query
+) ORDER BY rank, id DESC LIMIT :limit OFFSET :offset
+"""
+
+# Snippets only for the page being returned, not for every match.
+SNIPPET_SQL = {
+    'session': "SELECT rowid, snippet(session_search, 1, :start, :end, '…', 12) FROM session_search "
+               "WHERE session_search MATCH :query AND rowid IN ({ids})",
+    'message': "SELECT rowid, snippet(message_search, 1, :start, :end, '…', 12) FROM message_search "
+               "WHERE message_search MATCH :query AND rowid IN ({ids})",
+}
+
+
+def search_supported(engine):
+    return engine.dialect.name == 'sqlite'
+
+
+def install_search(engine):
+    """ Creates the FTS5 tables and triggers if missing, indexing the rows that already exist. """
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_search'")).first()
+        if exists:
+            return False
+        for statement in SCHEMA + BACKFILL:
+            conn.exec_driver_sql(statement)
+    return True
+
+
+def match_expression(user_id, query):
+    """ FTS5 query matching all the words in `query`, scoped to one user. None if it has no words. """
+    # Whole words only: the porter tokenizer already matches "cough" to "coughing", and a
+    # prefix term costs a merge of every matching token's list on each query (~10x slower).
+    words = TOKEN_RE.findall(query)
+    if not words:
+        return None
+    terms = ' '.join(f'"{w}"' for w in words)
+    return f'owner:"u{int(user_id)}" AND body:({terms})'
+
+
+def snippet_html(snippet):
+    """ The snippet HTML-escaped, with matched terms wrapped in <mark>. """
+    return html.escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search_hits(session, user_id, query, limit, offset=0):
+    """ One page of ranked hits for a user, best first: ([{kind, id, session_id, snippet}], has_more). """
+    expression = match_expression(user_id, query)
+    if expression is None:
+        return [], False
+    rows = session.execute(text(SEARCH_SQL), {"query": expression, "limit": limit + 1, "offset": offset}).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    snippets = {}
+    for kind in ('session', 'message'):
+        ids = [row.id for row in rows if row.kind == kind]
+        if ids:
+            sql = SNIPPET_SQL[kind].format(ids=','.join(str(int(i)) for i in ids))
+            params = {"query": expression, "start": MARK_START, "end": MARK_END}
+            snippets.update(((kind, rowid), s) for rowid, s in session.execute(text(sql), params))
+    hits = [{"kind": row.kind, "id": row.id, "session_id": row.session_id,
+             "snippet": snippet_html(snippets.get((row.kind, row.id)))} for row in rows]
+    return hits, has_more
@@ -0,0 +1,88 @@
+"""
+Compact per-session symptom state.
+
+A session's symptoms are a fixed-width bitmask over the model's symptom vocabulary
+(one bit per training column, 17 bytes for the current 132 columns), stored next to
+a short digest of that vocabulary. Dialogue control flags such as `checked_chest`
+are not symptoms and live in a separate space-separated field. The model input row
+is unpacked straight from the bits.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+
+class Vocabulary:
+    """ The ordered symptom columns a bitmask is laid out over. """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.size = len(self.columns)
+        self.digest = hashlib.sha256(json.dumps(self.columns).encode()).hexdigest()[:16]
+        self._names = np.array(self.columns, dtype=object)
+
+    def unpack(self, bits):
+        """ Bytes from SessionState.bits() back to a boolean mask. """
+        return np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=self.size, bitorder='little').view(bool)
+
+    def names(self, mask):
+        return self._names[mask].tolist()
+
+
+class SessionState:
+    __slots__ = ('vocab', 'mask', 'flags')
+
+    def __init__(self, vocab, mask=None, flags=()):
+        self.vocab = vocab
+        self.mask = np.zeros(vocab.size, dtype=bool) if mask is None else mask
+        self.flags = set(flags)
+
+    @classmethod
+    def from_columns(cls, vocab, bits, flags_text):
+        mask = vocab.unpack(bits) if bits else None
+        return cls(vocab, None if mask is None else mask.copy(), (flags_text or '').split())
+
+    @classmethod
+    def from_names(cls, vocab, names):
+        """ Builds state from a plain list mixing symptoms and flags (the old JSON format). """
+        state = cls(vocab)
+        state.add(names)
+        return state
+
+    def add(self, names):
+        """ Sets the given symptoms; names outside the vocabulary are kept as flags. Returns True if anything changed. """
+        changed = False
+        index = self.vocab.index
+        for name in names:
+            i = index.get(name)
+            if i is None:
+                if name not in self.flags:
+                    self.flags.add(name)
+                    changed = True
+            elif not self.mask[i]:
+                self.mask[i] = True
+                changed = True
+        return changed
+
+    def __bool__(self):
+        return bool(self.flags) or bool(self.mask.any())
+
+    def symptoms(self):
+        """ Set symptoms in vocabulary order. """
+        return self.vocab.names(self.mask)
+
+    def names(self):
+        """ Symptoms and flags together, as the dialogue rules see them. """
+        return self.flags.union(self.symptoms())
+
+    def row(self, dtype=np.float64):
+        """ The (1, n_features) model input row. """
+        return self.mask.astype(dtype)[None, :]
+
+    def bits(self):
+        return np.packbits(self.mask, bitorder='little').tobytes()
+
+    def flags_text(self):
+        return ' '.join(sorted(self.flags))
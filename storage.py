@@ -0,0 +1,87 @@
+"""
+Database configuration for app.py.
+
+DATABASE_URL picks any SQLAlchemy URL (defaults to the bundled SQLite file).
+For SQLite every connection is switched to WAL with a busy timeout, and
+requests that write (POST/PUT/PATCH/DELETE) open their transaction with
+BEGIN IMMEDIATE: the write lock is taken up front and waited for via the
+busy timeout, instead of a read transaction failing with "database is locked"
+when it later tries to upgrade to a write while another worker holds the lock.
+Work that writes outside a request, on an executor thread, opts in with
+write_transaction().
+"""
+import contextvars
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_DATABASE_URL = 'sqlite:///site.db'
+WRITE_METHODS = frozenset(['POST', 'PUT', 'PATCH', 'DELETE'])
+
+# POST endpoints that don't write in the request's own transaction (or take the lock later via
+# write_transaction()); they shouldn't queue behind (or block) real writers.
+read_only_endpoints = set()
+
+_writing = contextvars.ContextVar('write_transaction', default=False)
+
+
+@contextmanager
+def write_transaction():
+    """ Transactions begun inside this block take the write lock up front, as a writing request's do. """
+    token = _writing.set(True)
+    try:
+        yield
+    finally:
+        _writing.reset(token)
+
+
+def configure_database(app):
+    url = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Heroku-style URLs still say postgres://, which SQLAlchemy 1.4+ no longer accepts.
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') == '1'
+
+    if url.startswith('sqlite'):
+        options = {'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    else:
+        options = {
+            'pool_pre_ping': True,
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_recycle': 1800,
+        }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    if url.startswith('sqlite') and app.config['SQLITE_TUNING']:
+        install_sqlite_tuning(app.config['SQLITE_BUSY_TIMEOUT_MS'])
+
+
+def install_sqlite_tuning(busy_timeout_ms):
+    @event.listens_for(Engine, 'connect')
+    def on_connect(dbapi_conn, connection_record):
+        if not isinstance(dbapi_conn, sqlite3.Connection):
+            return
+        # Let SQLAlchemy emit BEGIN itself (see on_begin) instead of pysqlite's implicit one.
+        dbapi_conn.isolation_level = None
+        cursor = dbapi_conn.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+    @event.listens_for(Engine, 'begin')
+    def on_begin(conn):
+        if conn.dialect.name != 'sqlite':
+            return
+        if _writing.get() or has_request_context() and request.method in WRITE_METHODS and request.endpoint not in read_only_endpoints:
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        else:
+            conn.exec_driver_sql('BEGIN')
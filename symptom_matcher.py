@@ -0,0 +1,96 @@
+import json
+import string
+from itertools import compress, count
+
+# ASCII punctuation becomes a word break; apostrophes are dropped so "can't" and "cant" match.
+_PUNCTUATION = {c: ' ' for c in string.punctuation + string.whitespace}
+_PUNCTUATION.update({"'": None, "’": None})
+NORMALIZE_TABLE = str.maketrans(_PUNCTUATION)
+
+
+def tokenize(text):
+    return text.lower().translate(NORMALIZE_TABLE).split()
+
+
+class SymptomMatcher:
+    """ Maps free text to canonical names using whole-word lookups built once from a synonym table. """
+
+    def __init__(self, table):
+        self.table = {name: list(phrases) for name, phrases in table.items()}
+        self.order = {name: i for i, name in enumerate(self.table)}
+
+        # single word form -> canonical
+        self._single = {}
+        phrases = []
+        for name, entries in self.table.items():
+            for entry in entries:
+                words = tokenize(entry)
+                if not words:
+                    continue
+                # Inflected forms ("sweats", "coughing") are spelled out in the table: generated
+                # suffixes would also turn "head" into "headed" and "fat" into "fats".
+                if len(words) == 1:
+                    # First entry wins if two canonicals share a word, same as the old dict scan.
+                    self._single.setdefault(words[0], name)
+                else:
+                    phrases.append((words, name))
+
+        # first two words -> [(phrase words, canonical, offsets of the words it shadows)].
+        # A phrase "shadows" a single keyword of another canonical that it contains,
+        # e.g. "mild fever" (mild_fever) contains "fever" (high_fever).
+        self._phrases = {}
+        self._shadowed = set()
+        for form, name in phrases:
+            inner = tuple(i for i, w in enumerate(form) if self._single.get(w, name) != name)
+            self._shadowed.update(form[i] for i in inner)
+            self._phrases.setdefault(tuple(form[:2]), []).append((tuple(form), name, inner))
+        self._single_words = frozenset(self._single)
+        self._phrase_firsts = frozenset(first for first, _ in self._phrases)
+        self._firsts = self._single_words | self._phrase_firsts
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def match(self, text):
+        """ Returns every canonical name mentioned in the text, in table order, without duplicates. """
+        words = tokenize(text)
+        hits = self._firsts & set(words)
+        if not hits:
+            return []
+
+        single = self._single
+        found = set()
+        deferred = set()
+        for w in hits & self._single_words:
+            if w in self._shadowed:
+                deferred.add(w)
+            else:
+                found.add(single[w])
+
+        # One pass over the words: compress() picks out the ones that can begin a phrase or are
+        # shadowed, without a Python-level step for the others, and the next word selects the
+        # phrases to compare.
+        covered = set()
+        shadowed_at = []
+        starts = hits & self._phrase_firsts
+        if starts:
+            phrases = self._phrases
+            words.append('')  # so every word has a next one; no phrase contains ''
+            for i in compress(count(), map((starts | deferred).__contains__, words)):
+                w = words[i]
+                if w in deferred:
+                    shadowed_at.append(i)
+                for form, name, inner in phrases.get((w, words[i + 1]), ()):
+                    if len(form) == 2 or tuple(words[i:i + len(form)]) == form:
+                        found.add(name)
+                        covered.update([i + k for k in inner])
+        else:
+            found.update(single[w] for w in deferred)
+
+        # A shadowed word only counts on its own where it isn't part of one of those phrases.
+        for i in shadowed_at:
+            if i not in covered:
+                found.add(single[words[i]])
+        return sorted(found, key=self.order.__getitem__)
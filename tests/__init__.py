@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Tests that import app.py get a throwaway database and report cache, and never load the model up front.
+_workdir = tempfile.mkdtemp(prefix='healthbot-tests-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_workdir, 'test.db')}")
+os.environ.setdefault('REPORT_CACHE_DIR', os.path.join(_workdir, 'reports'))
+os.environ.setdefault('MODEL_WARMUP', 'lazy')
+os.environ.setdefault('RATE_LIMITING', '0')
+os.environ.setdefault('PASSWORD_WORKERS', '0')
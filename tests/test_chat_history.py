@@ -0,0 +1,54 @@
+import unittest
+from collections import namedtuple
+
+import app as healthbot
+
+Message = namedtuple('Message', ['id'])
+
+
+class ChatHistoryPagingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with healthbot.app.app_context():
+            user = healthbot.User(username='history-tests', password='x')
+            healthbot.db.session.add(user)
+            healthbot.db.session.commit()
+            session = healthbot.ChatSession(user_id=user.id)
+            healthbot.db.session.add(session)
+            healthbot.db.session.flush()
+            healthbot.db.session.add_all(healthbot.ChatMessage(session_id=session.id, sender='user', content=str(i))
+                                         for i in range(5))
+            healthbot.db.session.commit()
+            cls.user_id, cls.session_id = user.id, session.id
+
+    def setUp(self):
+        self.client = healthbot.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+
+    def page_back(self, limit):
+        url = f'/get_chat_history/{self.session_id}?limit={limit}'
+        contents = []
+        for _ in range(10):
+            body = self.client.get(url).get_json()
+            contents = [m['content'] for m in body['messages']] + contents
+            if not body['has_more']:
+                return contents
+            url = f"/get_chat_history/{self.session_id}?limit={limit}&before_id={body['messages'][0]['id']}"
+        self.fail(f"limit={limit} never reached the first message")
+
+    def test_limit_below_one_pages_one_message_at_a_time(self):
+        for limit in (0, -3):
+            self.assertEqual(self.page_back(limit), ['0', '1', '2', '3', '4'])
+
+    def test_archived_page(self):
+        messages = [Message(i) for i in range(1, 4)]
+        self.assertEqual(healthbot.archived_page(messages, None, None, 1), ([Message(3)], True))
+        self.assertEqual(healthbot.archived_page(messages, None, None, 5), (messages, False))
+        self.assertEqual(healthbot.archived_page(messages, 3, None, 1), ([Message(2)], True))
+        self.assertEqual(healthbot.archived_page(messages, None, 1, 5), (messages[1:], False))
+
+
+if __name__ == '__main__':
+    unittest.main()
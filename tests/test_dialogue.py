@@ -0,0 +1,31 @@
+import os
+import unittest
+
+from dialogue import DialogueRules
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'data', 'dialogue_rules.json')
+
+
+class DialogueRulesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.rules = DialogueRules.from_file(RULES_PATH)
+
+    def test_no_is_a_whole_word(self):
+        for text in ("I have a runny nose", "I know it hurts", "I cannot sleep"):
+            self.assertEqual(self.rules.answer(text), (), text)
+        self.assertIn('checked_malaria', self.rules.answer("No"))
+        self.assertIn('checked_malaria', self.rules.answer("no, nothing else"))
+
+    def test_phrase_needles(self):
+        self.assertIn('visual_disturbances', self.rules.answer("One Side (Migraine)"))
+        self.assertEqual(self.rules.answer("someone sided with me"), ())
+
+    def test_malaria_question_after_runny_nose(self):
+        symptoms = set(self.rules.answer("I have a runny nose"))
+        symptoms |= {'high_fever', 'chills'}
+        self.assertEqual(self.rules.next_question(symptoms).tag, 'clarifying_malaria')
+
+
+if __name__ == '__main__':
+    unittest.main()
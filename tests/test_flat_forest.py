@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from flat_forest import FlatForest
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'disease_model.pkl')
+
+
+def symptom_rows(n_features, n_rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = (rng.random((n_rows, n_features)) < 0.04).astype(np.float64)
+    X[0] = 0  # no symptoms at all
+    return X
+
+
+class ShippedModelParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if not os.path.exists(MODEL_PATH):
+            raise unittest.SkipTest("no disease_model.pkl; run python train.py")
+        cls.model = joblib.load(MODEL_PATH)
+        cls.flat = FlatForest.from_sklearn(cls.model)
+        cls.X = symptom_rows(cls.model.n_features_in_)
+
+    def test_binary_splits(self):
+        self.assertTrue(self.flat.binary)
+
+    def test_batch(self):
+        np.testing.assert_array_equal(self.flat.predict_proba(self.X), self.model.predict_proba(self.X))
+
+    def test_single_rows(self):
+        # One 0/1 row takes the sparse walk; a 1-d row is accepted as well.
+        for row in self.X[:100]:
+            expected = self.model.predict_proba(row[None, :])
+            np.testing.assert_array_equal(self.flat.predict_proba(row[None, :]), expected)
+            np.testing.assert_array_equal(self.flat.predict_proba(row), expected)
+            self.assertEqual(self.flat.predict(row[None, :])[0], self.model.predict(row[None, :])[0])
+
+    def test_non_binary_row_falls_back_to_the_full_walk(self):
+        row = self.X[1:2] * 0.7
+        np.testing.assert_array_equal(self.flat.predict_proba(row), self.model.predict_proba(row))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp(prefix='healthbot-flat-')
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'model.flat.npz')
+        self.flat.save(path)
+        loaded = FlatForest.load(path)
+        np.testing.assert_array_equal(loaded.predict_proba(self.X), self.model.predict_proba(self.X))
+        self.assertEqual(list(loaded.predict(self.X)), list(self.model.predict(self.X)))
+
+
+class ContinuousFeaturesParityTest(unittest.TestCase):
+    def test_forest_and_single_tree(self):
+        rng = np.random.default_rng(1)
+        X = rng.normal(loc=5, size=(300, 6))
+        y = np.array(['a', 'b', 'c'])[(X[:, 0] > 5).astype(int) + (X[:, 1] > 5.5).astype(int)]
+        for model in (RandomForestClassifier(n_estimators=7, random_state=0), DecisionTreeClassifier(random_state=0)):
+            model.fit(X, y)
+            flat = FlatForest.from_sklearn(model)
+            self.assertFalse(flat.binary)
+            np.testing.assert_allclose(flat.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+            np.testing.assert_allclose(flat.predict_proba(X[:1]), model.predict_proba(X[:1]), rtol=0, atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from followup import SymptomFrequencies
+
+# Column 0 separates A from B, column 1 says nothing, column 2 is common to both.
+FREQUENCIES = SymptomFrequencies(['A', 'B'], ['splits', 'coin_flip', 'common'],
+                                 [[0.95, 0.5, 0.9],
+                                  [0.05, 0.5, 0.9]])
+
+
+def entropy(p):
+    p = np.asarray([x for x in p if x > 0])
+    return float(-(p * np.log2(p)).sum())
+
+
+class InformationGainTest(unittest.TestCase):
+    def test_asks_the_separating_symptom(self):
+        best, gain = FREQUENCIES.best_question(['A', 'B'], [0.5, 0.5], np.zeros(3, dtype=bool))
+        self.assertEqual(best, 0)
+        self.assertAlmostEqual(gain, 1 - entropy([0.95, 0.05]), places=6)
+
+    def test_gain_matches_a_direct_computation(self):
+        p = np.array([0.7, 0.3])
+        gain = FREQUENCIES.information_gain(['A', 'B'], p)
+        for column in range(3):
+            f = FREQUENCIES.freq[:, column]
+            p_yes = float((p * f).sum())
+            expected = entropy(p) - p_yes * entropy(p * f / p_yes) - (1 - p_yes) * entropy(p * (1 - f) / (1 - p_yes))
+            self.assertAlmostEqual(gain[column], expected, places=9)
+        self.assertAlmostEqual(gain[1], 0.0, places=9)
+
+    def test_candidate_order_and_unnormalized_scores(self):
+        forward = FREQUENCIES.information_gain(['A', 'B'], [0.6, 0.2])
+        backward = FREQUENCIES.information_gain(['B', 'A'], [0.2, 0.6])
+        np.testing.assert_allclose(forward, backward)
+
+    def test_excluded_and_uninformative_columns(self):
+        self.assertIsNone(FREQUENCIES.best_question(['A', 'B'], [0.5, 0.5], np.array([True, False, False])))
+        # A near-certain ranking leaves nothing worth asking.
+        self.assertIsNone(FREQUENCIES.best_question(['A', 'B'], [0.999, 0.001], np.zeros(3, dtype=bool)))
+
+
+class SymptomFrequenciesTest(unittest.TestCase):
+    def test_from_matrix_is_laplace_smoothed(self):
+        X = np.array([[1, 0], [1, 1], [0, 0]])
+        frequencies = SymptomFrequencies.from_matrix(X, ['B', 'B', 'A'], ['x', 'y'])
+        self.assertEqual(list(frequencies.classes), ['A', 'B'])
+        np.testing.assert_allclose(frequencies.freq, [[1 / 3, 1 / 3], [3 / 4, 2 / 4]])
+
+    def test_aligned_to_the_model_order(self):
+        aligned = FREQUENCIES.aligned(['B', 'A'], ['common', 'splits', 'coin_flip'])
+        np.testing.assert_allclose(aligned.freq, [[0.9, 0.05, 0.5], [0.9, 0.95, 0.5]])
+        self.assertIsNone(FREQUENCIES.aligned(['A', 'C'], FREQUENCIES.columns))
+        self.assertIsNone(FREQUENCIES.aligned(['A', 'B'], ['splits', 'coin_flip']))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp(prefix='healthbot-followup-')
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'frequencies.npz')
+        FREQUENCIES.save(path)
+        loaded = SymptomFrequencies.load(path)
+        self.assertEqual(list(loaded.classes), ['A', 'B'])
+        self.assertEqual(loaded.columns, FREQUENCIES.columns)
+        np.testing.assert_array_equal(loaded.freq, FREQUENCIES.freq)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import os
+import unittest
+
+import app as healthbot
+from knowledge_base import KnowledgeBase
+
+INFO_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'data', 'disease_info.json')
+
+
+class KnowledgeBaseTest(unittest.TestCase):
+    def test_safety_labels_have_entries(self):
+        self.assertEqual(KnowledgeBase.from_file(INFO_PATH).missing(healthbot.SAFETY_LABELS), [])
+
+    def test_safety_check_only_gives_safety_labels(self):
+        for prediction in ('Paralysis (brain hemorrhage)', 'Heart attack'):
+            for symptoms in ([], ['headache'], ['chest_pain']):
+                result = healthbot.apply_safety_check(prediction, symptoms)
+                self.assertIn(result, (prediction, *healthbot.SAFETY_LABELS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+from unittest import mock
+
+import app as healthbot
+
+
+class MetricsTest(unittest.TestCase):
+    def test_scrape_does_not_load_the_model(self):
+        client = healthbot.app.test_client()
+        with mock.patch.object(healthbot.registry, '_current', None), \
+                mock.patch.object(healthbot.registry, 'get', side_effect=AssertionError("scrape loaded the model")):
+            response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response.get_data(as_text=True), r'healthbot_model_loaded\{pid="\d+"\} 0\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
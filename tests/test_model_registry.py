@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from model_registry import ModelRegistry
+from train import write_atomic, write_version
+
+FILES = {'model.pkl': 'disease_model.pkl', 'columns.pkl': 'symptom_columns.pkl',
+         'frequencies.npz': 'symptom_frequencies.npz', 'manifest.json': 'model_manifest.json'}
+
+
+class ModelRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='healthbot-registry-')
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.registry = ModelRegistry(*self.live('model.pkl', 'columns.pkl'), manifest_path=self.live('manifest.json')[0],
+                                      frequencies_path=self.live('frequencies.npz')[0], check_interval=0)
+
+    def live(self, *names):
+        return [os.path.join(self.dir, FILES[name]) for name in names]
+
+    def version(self, name, n_columns):
+        rng = np.random.default_rng(len(name))
+        X = rng.integers(0, 2, size=(40, n_columns))
+        y = np.array(['A', 'B'])[X[:, 0]]
+        columns = [f'symptom_{i}' for i in range(n_columns)]
+        model = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y)
+        version_dir, _ = write_version(os.path.join(self.dir, 'models'), model, columns, X, y,
+                                       {"training_data_sha256": '0' * 64}, name=name)
+        return version_dir
+
+    def install(self, version_dir, *names):
+        for name in names:
+            write_atomic(os.path.join(version_dir, name), *self.live(name))
+
+    def test_keeps_current_model_until_files_match_manifest(self):
+        old, new = self.version('old', 4), self.version('new', 6)
+        self.install(old, *FILES)
+        served = self.registry.get()
+        self.assertEqual(len(served.columns), 4)
+
+        # Halfway through a promote: new columns and model, old manifest.
+        with self.assertLogs('healthbot.model', 'WARNING'):
+            self.install(new, 'columns.pkl', 'model.pkl')
+            self.assertIs(self.registry.get(), served)
+            self.install(new, 'frequencies.npz')
+            self.assertIs(self.registry.get(), served)
+
+        self.install(new, 'manifest.json')
+        self.assertEqual(len(self.registry.get().columns), 6)
+        self.assertEqual(self.registry.get().model.n_features_in_, 6)
+
+    def test_loads_nothing_from_mismatched_files(self):
+        old, new = self.version('old', 4), self.version('new', 6)
+        self.install(old, 'model.pkl', 'columns.pkl', 'frequencies.npz')
+        self.install(new, 'manifest.json')
+        with self.assertLogs('healthbot.model', 'WARNING'):
+            self.assertIsNone(self.registry.get())
+
+    def test_keeps_current_model_when_a_file_is_corrupt(self):
+        self.install(self.version('old', 4), 'model.pkl', 'columns.pkl', 'frequencies.npz')
+        served = self.registry.get()
+        model_path, = self.live('model.pkl')
+        with open(model_path, 'r+b') as f:
+            f.truncate(100)
+        with self.assertLogs('healthbot.model', 'WARNING') as logs:
+            self.assertIs(self.registry.get(), served)
+        self.assertIn('UnpicklingError', logs.output[0])
+        # The same broken files are not read (or hashed) again.
+        with mock.patch('model_registry.file_digest') as digest, self.assertNoLogs('healthbot.model'):
+            self.assertIs(self.registry.get(), served)
+        digest.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import sqlite3
+import unittest
+from unittest import mock
+
+import app as healthbot
+
+
+class PredictTransactionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with healthbot.app.app_context():
+            user = healthbot.User(username='predict-tests', password='x')
+            healthbot.db.session.add(user)
+            healthbot.db.session.commit()
+            cls.user_id = user.id
+            cls.database = healthbot.db.engine.url.database
+
+    def setUp(self):
+        self.client = healthbot.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+        self.session_id = self.client.post('/new_chat').get_json()['session_id']
+        # The first turn against a model records its vocabulary under the write lock; the next one caches it.
+        self.say("hello")
+        self.say("hello")
+
+    def say(self, message):
+        response = self.client.post('/predict', json={'message': message, 'session_id': self.session_id})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def during_inference(self, action):
+        rank = healthbot.rank_diseases
+
+        def ranked(*args):
+            action()
+            return rank(*args)
+        return mock.patch.object(healthbot, 'rank_diseases', ranked)
+
+    def test_write_lock_is_free_during_inference(self):
+        def write_elsewhere():
+            other = sqlite3.connect(self.database, timeout=0, isolation_level=None)
+            other.execute('BEGIN IMMEDIATE')
+            other.execute('ROLLBACK')
+            other.close()
+
+        with self.during_inference(write_elsewhere):
+            body = self.say("I have itching, skin rash and nodal skin eruptions")
+        self.assertEqual(body['new_title'], 'Consultation: Fungal infection')
+
+    def test_turn_replays_on_top_of_a_concurrent_one(self):
+        def concurrent_turn():
+            other = sqlite3.connect(self.database, timeout=5, isolation_level=None)
+            other.execute("UPDATE chat_session SET flags = 'checked_other' WHERE id = ?", (self.session_id,))
+            other.close()
+
+        with self.during_inference(concurrent_turn):
+            body = self.say("I have continuous sneezing, shivering and chills")
+        with healthbot.app.app_context():
+            chat_session = healthbot.db.session.get(healthbot.ChatSession, self.session_id)
+            self.assertIn('checked_other', chat_session.flags.split())
+            self.assertEqual(chat_session.status, 'diagnosed')
+        history = self.client.get(f'/get_chat_history/{self.session_id}').get_json()['messages']
+        self.assertEqual([m['id'] for m in history[-2:]], body['message_ids'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+import app as healthbot
+
+
+class PredictBatchValidationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with healthbot.app.app_context():
+            user = healthbot.User(username='batch-tests', password='x')
+            healthbot.db.session.add(user)
+            healthbot.db.session.commit()
+            cls.user_id = user.id
+
+    def setUp(self):
+        self.client = healthbot.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+
+    def assertBadRequest(self, response):
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.get_json())
+
+    def test_top_k_not_a_number(self):
+        self.assertBadRequest(self.client.post('/predict_batch?top_k=abc', json={'items': [['headache']]}))
+        self.assertBadRequest(self.client.post('/predict_batch', json={'items': [['headache']], 'top_k': 'abc'}))
+
+    def test_body_not_an_object(self):
+        self.assertBadRequest(self.client.post('/predict_batch', json=[['headache']]))
+        self.assertBadRequest(self.client.post('/predict_batch', json={'items': 'headache'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
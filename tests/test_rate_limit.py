@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import app as healthbot
+from rate_limit import Limit, RateLimiter, parse_limits, retry_after_header
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('rate_limit.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def limiter(self, **kwargs):
+        return RateLimiter({'predict': Limit.parse('2/10s')}, {'predict': Limit.parse('3/10s')}, **kwargs)
+
+    def assertRefills(self, limiter):
+        self.assertIsNone(limiter.hit('predict', 1, '10.0.0.1'))
+        self.assertIsNone(limiter.hit('predict', 1, '10.0.0.1'))
+        scope, wait = limiter.hit('predict', 1, '10.0.0.1')
+        self.assertEqual(scope, 'user')
+        self.assertAlmostEqual(wait, 5.0)
+        # Refused requests take no tokens, so half the wait still isn't enough ...
+        self.clock.now += 2.5
+        self.assertAlmostEqual(limiter.hit('predict', 1, '10.0.0.1')[1], 2.5)
+        # ... and the full wait is.
+        self.clock.now += 2.5
+        self.assertIsNone(limiter.hit('predict', 1, '10.0.0.1'))
+        self.assertIsNotNone(limiter.hit('predict', 1, '10.0.0.1'))
+
+    def test_refill(self):
+        self.assertRefills(self.limiter())
+
+    def test_refill_shared(self):
+        directory = tempfile.mkdtemp(prefix='healthbot-rate-')
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'buckets.db')
+        self.assertRefills(self.limiter(path=path))
+        # Another worker sees the same, empty buckets.
+        self.assertEqual(self.limiter(path=path).hit('predict', 1, '10.0.0.1')[0], 'user')
+
+    def test_users_and_addresses(self):
+        limiter = self.limiter()
+        for user in (1, 2, 3):
+            self.assertIsNone(limiter.hit('predict', user, '10.0.0.1'))
+        # A fourth user from the same address runs into the address's bucket.
+        self.assertEqual(limiter.hit('predict', 4, '10.0.0.1')[0], 'ip')
+        self.assertIsNone(limiter.hit('predict', 4, '10.0.0.2'))
+        self.assertIsNone(limiter.hit('new_chat', 4, '10.0.0.1'))
+        self.assertEqual(limiter.info()['limited_ip'], 1)
+
+    def test_prune_keeps_buckets_that_are_still_draining(self):
+        limiter = self.limiter(max_buckets=2)
+        limiter.hit('predict', 1, None)
+        limiter.hit('predict', 1, None)
+        self.clock.now += 60
+        limiter.hit('predict', 2, None)
+        limiter.hit('predict', 3, None)
+        self.assertEqual(set(limiter._buckets), {'predict:u:2', 'predict:u:3'})
+
+    def test_parsing(self):
+        self.assertEqual(parse_limits('predict=30/minute, new_chat = 100/3600s'),
+                         {'predict': Limit(30, 60), 'new_chat': Limit(100, 3600.0)})
+        self.assertEqual(parse_limits(''), {})
+        for bad in ('0/minute', '30/fortnight', 'thirty/minute'):
+            with self.assertRaises(ValueError):
+                Limit.parse(bad)
+        self.assertEqual(retry_after_header(0.2), '1')
+        self.assertEqual(retry_after_header(4.1), '5')
+
+
+class RateLimitedRequestTest(unittest.TestCase):
+    def test_429_with_retry_after(self):
+        with healthbot.app.app_context():
+            user = healthbot.User(username='rate-tests', password='x')
+            healthbot.db.session.add(user)
+            healthbot.db.session.commit()
+            user_id = user.id
+        client = healthbot.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+        limiter = RateLimiter({'new_chat': Limit.parse('1/minute')}, {})
+        with mock.patch.object(healthbot, 'RATE_LIMITING', True), mock.patch.object(healthbot, 'rate_limiter', limiter):
+            self.assertEqual(client.post('/new_chat').status_code, 200)
+            response = client.post('/new_chat')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '60')
+        self.assertEqual(response.get_json()['retry_after'], 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
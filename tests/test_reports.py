@@ -0,0 +1,67 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+
+from reports import ReportFailed, ReportService, ReportsUnavailable, _render_to_file, report_key
+
+FIELDS = {"username": 'alice', "created_at": '2024-01-01 10:00:00', "title": 'Consultation: Malaria',
+          "symptoms": ['high_fever', 'chills']}
+# render_report() rejects the unknown field inside the pool process.
+BROKEN = dict(FIELDS, colour='red')
+
+
+class ReportServiceTest(unittest.TestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp(prefix='healthbot-reports-')
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.reports = ReportService(cache_dir, workers=1)
+        self.addCleanup(lambda: self.reports._pool and self.reports._pool.shutdown())
+
+    def test_render_failure_is_logged(self):
+        with self.assertLogs('healthbot.reports', 'ERROR') as logs:
+            with self.assertRaises(ReportFailed):
+                self.reports.get('1-broken', BROKEN, wait=60)
+        self.assertIn('1-broken', logs.output[0])
+        self.assertEqual(self.reports.status('1-broken'), 'failed')
+
+    def test_zip_leaves_out_failed_reports(self):
+        items = [('ok.pdf', report_key(1, **FIELDS), FIELDS), ('broken.pdf', '2-broken', BROKEN)]
+        with self.assertLogs('healthbot.reports', 'ERROR'):
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(self.reports.stream_zip(items))))
+        self.assertEqual(archive.namelist(), ['ok.pdf', 'missing_reports.txt'])
+        self.assertIn(b'broken.pdf', archive.read('missing_reports.txt'))
+
+    def test_new_render_removes_older_versions(self):
+        old = self.reports.get(report_key(1, **FIELDS), FIELDS, wait=60)
+        renamed = dict(FIELDS, title='Consultation: Dengue')
+        new = self.reports.get(report_key(1, **renamed), renamed, wait=60)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+    def test_late_render_of_an_older_version_keeps_the_newer_one(self):
+        requested_at = time.time()
+        renamed = dict(FIELDS, title='Consultation: Dengue')
+        new = self.reports.get(report_key(1, **renamed), renamed, wait=60)
+        # The older version was requested first but its render finishes last.
+        old = _render_to_file(self.reports.path(report_key(1, **FIELDS)), FIELDS, requested_at)
+        self.assertTrue(os.path.exists(new))
+        self.assertTrue(os.path.exists(old))
+
+    def test_broken_pool(self):
+        self.reports.get(report_key(1, **FIELDS), FIELDS, wait=60)
+        for process in list(self.reports._executor()._processes.values()):
+            process.kill()
+            process.join()
+        with self.assertLogs('healthbot.reports', 'ERROR'):
+            with self.assertRaises(ReportsUnavailable):
+                self.reports.get(report_key(2, **FIELDS), FIELDS, wait=60)
+        # The next call starts a new pool.
+        self.reports.get(report_key(3, **FIELDS), FIELDS, wait=60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from sqlalchemy import text
+
+import app as healthbot
+from search import match_expression
+
+
+class SearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.users = {}
+        with healthbot.app.app_context():
+            for name in ('search-alice', 'search-bob'):
+                user = healthbot.User(username=name, password='x')
+                healthbot.db.session.add(user)
+                healthbot.db.session.flush()
+                session = healthbot.ChatSession(user_id=user.id, title=f"Consultation: Zanzibar fever ({name})")
+                healthbot.db.session.add(session)
+                healthbot.db.session.flush()
+                healthbot.db.session.add(healthbot.ChatMessage(session_id=session.id, sender='user',
+                                                               content="my zanzibar rash is itching"))
+                cls.users[name] = (user.id, session.id)
+            healthbot.db.session.commit()
+
+    def client_for(self, name):
+        client = healthbot.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.users[name][0])
+            session['_fresh'] = True
+        return client
+
+    def search(self, name, query):
+        response = self.client_for(name).get('/search', query_string={'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['hits']
+
+    def indexed(self, table, rowid):
+        with healthbot.app.app_context():
+            return healthbot.db.session.execute(text(f"SELECT count(*) FROM {table} WHERE rowid = :id"),
+                                                {"id": rowid}).scalar()
+
+    def test_hits_are_scoped_to_the_owner(self):
+        for name in ('search-alice', 'search-bob'):
+            hits = self.search(name, 'zanzibar')
+            self.assertEqual({h['kind'] for h in hits}, {'session', 'message'})
+            self.assertEqual({h['session_id'] for h in hits}, {self.users[name][1]})
+            self.assertTrue(all('<mark>' in h['snippet'] for h in hits))
+
+    def test_query_syntax_cannot_widen_the_scope(self):
+        for query in ('zanzibar OR owner:*', 'owner:"u0" OR zanzibar', 'zanzibar" OR "x', '*'):
+            self.assertTrue({h['session_id'] for h in self.search('search-alice', query)}
+                            <= {self.users['search-alice'][1]}, query)
+        self.assertIsNone(match_expression(1, ' "*" - '))
+
+    def test_porter_stemming(self):
+        self.assertTrue(any(h['kind'] == 'message' for h in self.search('search-alice', 'itch')))
+
+    def test_delete_removes_the_session_and_its_messages(self):
+        with healthbot.app.app_context():
+            user_id = self.users['search-alice'][0]
+            session = healthbot.ChatSession(user_id=user_id, title="Consultation: Quokka pox")
+            healthbot.db.session.add(session)
+            healthbot.db.session.flush()
+            message = healthbot.ChatMessage(session_id=session.id, sender='user', content="quokka bites everywhere")
+            healthbot.db.session.add(message)
+            healthbot.db.session.commit()
+            session_id, message_id = session.id, message.id
+        self.assertEqual(len(self.search('search-alice', 'quokka')), 2)
+
+        response = self.client_for('search-alice').delete(f'/delete_chat/{session_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('search-alice', 'quokka'), [])
+        self.assertEqual(self.indexed('session_search', session_id), 0)
+        self.assertEqual(self.indexed('message_search', message_id), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
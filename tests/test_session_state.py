@@ -0,0 +1,112 @@
+import json
+import unittest
+from collections import namedtuple
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+import app as healthbot
+from session_state import SessionState, Vocabulary
+
+FakeModel = namedtuple('FakeModel', ['version', 'columns'])
+COLUMNS = [f'symptom_{i}' for i in range(132)]
+
+
+class SessionStateTest(unittest.TestCase):
+    def setUp(self):
+        self.vocab = Vocabulary(COLUMNS)
+
+    def test_bits_round_trip(self):
+        state = SessionState.from_names(self.vocab, ['symptom_0', 'symptom_7', 'symptom_8', 'symptom_131', 'checked_chest'])
+        bits = state.bits()
+        self.assertEqual(len(bits), 17)
+        restored = SessionState.from_columns(self.vocab, bits, state.flags_text())
+        self.assertEqual(restored.symptoms(), ['symptom_0', 'symptom_7', 'symptom_8', 'symptom_131'])
+        self.assertEqual(restored.flags, {'checked_chest'})
+        np.testing.assert_array_equal(restored.row(), state.row())
+        self.assertEqual(restored.row().shape, (1, 132))
+
+    def test_empty_state(self):
+        state = SessionState.from_columns(self.vocab, None, '')
+        self.assertFalse(state)
+        self.assertFalse(SessionState.from_columns(self.vocab, state.bits(), ''))
+
+    def test_add_reports_changes(self):
+        state = SessionState(self.vocab)
+        self.assertTrue(state.add(['symptom_3', 'ask:symptom_4']))
+        self.assertFalse(state.add(['symptom_3', 'ask:symptom_4']))
+
+    def test_digest_follows_column_order(self):
+        self.assertNotEqual(Vocabulary(COLUMNS).digest, Vocabulary(COLUMNS[::-1]).digest)
+
+
+class LoadStateTest(unittest.TestCase):
+    def test_bits_from_another_vocabulary_are_relaid(self):
+        old = Vocabulary(['fever', 'cough', 'rash'])
+        new = Vocabulary(['rash', 'headache', 'fever'])
+        bits = SessionState.from_names(old, ['fever', 'rash']).bits()
+        chat_session = SimpleNamespace(symptom_bits=bits, symptom_vocab=old.digest, flags='checked_fever',
+                                       collected_symptoms=None)
+        with mock.patch.dict(healthbot._vocabularies, {old.digest: old}):
+            state = healthbot.load_state(chat_session, new)
+        self.assertEqual(state.symptoms(), ['rash', 'fever'])
+        self.assertEqual(state.flags, {'checked_fever'})
+
+    def test_unknown_vocabulary_keeps_flags(self):
+        chat_session = SimpleNamespace(symptom_bits=b'\x07', symptom_vocab='0' * 16, flags='checked_chest',
+                                       collected_symptoms=None)
+        with healthbot.app.app_context():
+            state = healthbot.load_state(chat_session, Vocabulary(['fever', 'cough', 'rash']))
+        self.assertEqual(state.symptoms(), [])
+        self.assertEqual(state.flags, {'checked_chest'})
+
+    def test_old_json_format(self):
+        chat_session = SimpleNamespace(symptom_bits=None, symptom_vocab=None, flags='',
+                                       collected_symptoms=json.dumps(['cough', 'checked_fever']))
+        state = healthbot.load_state(chat_session, Vocabulary(['fever', 'cough']))
+        self.assertEqual(state.symptoms(), ['cough'])
+        self.assertEqual(state.flags, {'checked_fever'})
+
+
+class ModelVocabularyTest(unittest.TestCase):
+    def setUp(self):
+        self.context = healthbot.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        self.addCleanup(healthbot.db.session.remove)
+
+    def stored(self, vocab):
+        healthbot.db.session.expire_all()
+        return healthbot.db.session.get(healthbot.SymptomVocabulary, vocab.digest) is not None
+
+    def test_cached_only_once_committed(self):
+        loaded = FakeModel('vocab-rollback', ['fever', 'cough'])
+        vocab = healthbot.model_vocabulary(loaded)
+        healthbot.db.session.rollback()
+        self.assertNotIn(loaded.version, healthbot._vocabularies)
+
+        healthbot.model_vocabulary(loaded)
+        healthbot.db.session.commit()
+        self.assertEqual(healthbot.model_vocabulary(loaded).digest, vocab.digest)
+        self.assertIn(loaded.version, healthbot._vocabularies)
+        self.assertTrue(self.stored(vocab))
+
+    def test_another_worker_inserts_first(self):
+        loaded = FakeModel('vocab-race', ['fever', 'rash'])
+        vocab = healthbot.Vocabulary(loaded.columns)
+        healthbot.db.session.add(healthbot.SymptomVocabulary(digest=vocab.digest, columns='[]'))
+        healthbot.db.session.commit()
+
+        # This worker's lookup ran before the other one committed.
+        get = healthbot.db.session.get
+        with mock.patch.object(healthbot.db.session, 'get',
+                               lambda model, key: None if model is healthbot.SymptomVocabulary else get(model, key)):
+            healthbot.db.session.expunge_all()
+            self.assertEqual(healthbot.model_vocabulary(loaded).digest, vocab.digest)
+        healthbot.db.session.commit()
+        self.assertTrue(self.stored(vocab))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import unittest
+
+from symptom_matcher import SymptomMatcher
+
+SYNONYMS_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'data', 'symptom_synonyms.json')
+
+
+class SymptomMatcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.matcher = SymptomMatcher.from_file(SYNONYMS_PATH)
+
+    def test_cannot_breathe(self):
+        self.assertEqual(self.matcher.match("I cannot breathe"), ['breathlessness'])
+
+    def test_whole_words_only(self):
+        self.assertEqual(self.matcher.match("I got a shot and I know it"), [])
+
+    def test_listed_inflections(self):
+        self.assertEqual(self.matcher.match("coughs, sweats and itching joints"),
+                         ['sweating', 'cough', 'itching', 'joint_pain'])
+
+    def test_no_generated_suffixes(self):
+        for text in ("I headed to bed early", "heading out", "cutting down on fats", "I was panted at"):
+            self.assertEqual(self.matcher.match(text), [], text)
+
+    def test_phrase_shadows_keyword(self):
+        self.assertEqual(self.matcher.match("just a mild fever"), ['mild_fever'])
+        self.assertEqual(self.matcher.match("a mild fever then a fever"), ['high_fever', 'mild_fever'])
+
+    def test_repeated_phrase(self):
+        self.assertEqual(self.matcher.match("mild fever mild fever"), ['mild_fever'])
+
+
+if __name__ == '__main__':
+    unittest.main()
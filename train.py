@@ -0,0 +1,203 @@
+"""
+Offline training for the disease model. The web app never trains; it only loads
+the artifact this script promotes.
+
+    python train.py                      # train on Training.csv, evaluate on Testing.csv, promote
+    python train.py --no-promote         # only write a new version under models/
+    python train.py --n-estimators 200 --n-jobs 4
+    python train.py --data data/synthetic --max-rows 1000000   # bit-packed output of generate_data.py
+
+Every run writes models/<version>/ with model.pkl, columns.pkl, manifest.json
+(columns, classes, hashes, timing, held-out accuracy) and frequencies.npz (how
+often each symptom occurs per disease, used to pick follow-up questions). Promoting copies those
+files to the paths app.py loads, replacing them atomically so running workers
+pick up the new model on their next registry check.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import sklearn
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+
+from dataset import dataset_digest, is_dataset, read_dataset
+from followup import SymptomFrequencies
+from model_registry import file_digest
+
+DATASET_PATH = 'Training.csv'
+TEST_PATH = 'Testing.csv'
+ARTIFACTS_DIR = 'models'
+MODEL_PATH = 'disease_model.pkl'
+COLUMNS_PATH = 'symptom_columns.pkl'
+MANIFEST_PATH = 'model_manifest.json'
+FREQUENCIES_PATH = 'symptom_frequencies.npz'
+
+
+def read_symptom_csv(path, chunk_rows=4096, max_rows=None):
+    """
+    Streams a symptom CSV into a sparse uint8 matrix without building a dense frame.
+    Returns (X as CSR, labels, columns). The last CSV column is the label.
+    """
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [c.strip() for c in header[:-1]]
+        n_features = len(columns)
+
+        blocks, labels = [], []
+        chunk = np.zeros((chunk_rows, n_features), dtype=np.uint8)
+        filled = 0
+        for line_no, row in enumerate(reader, start=2):
+            if len(labels) == max_rows:
+                break
+            if not row:
+                continue
+            if len(row) != n_features + 1:
+                raise ValueError(f"{path}:{line_no}: expected {n_features + 1} fields, got {len(row)}")
+            chunk[filled] = row[:-1]
+            labels.append(row[-1].strip())
+            filled += 1
+            if filled == chunk_rows:
+                blocks.append(sparse.csr_matrix(chunk))
+                filled = 0
+        if filled:
+            blocks.append(sparse.csr_matrix(chunk[:filled]))
+
+    X = sparse.vstack(blocks, format='csr', dtype=np.uint8) if blocks else sparse.csr_matrix((0, n_features), dtype=np.uint8)
+    return X, np.array(labels, dtype=object), columns
+
+
+def load_training_data(path, max_rows=None):
+    """ (X, labels, columns, sha256) from a symptom CSV or a bit-packed dataset directory. """
+    if is_dataset(path):
+        return read_dataset(path, max_rows=max_rows) + (dataset_digest(path),)
+    return read_symptom_csv(path, max_rows=max_rows) + (file_digest(path),)
+
+
+def align_columns(X, columns, target_columns):
+    """ Reorders X's columns to target_columns (missing ones stay zero). """
+    if columns == target_columns:
+        return X
+    index = {c: i for i, c in enumerate(columns)}
+    out = sparse.lil_matrix((X.shape[0], len(target_columns)), dtype=np.uint8)
+    for j, c in enumerate(target_columns):
+        if c in index:
+            out[:, j] = X[:, index[c]]
+    return out.tocsr()
+
+
+def build_model(n_estimators, n_jobs, random_state=42):
+    return RandomForestClassifier(n_estimators=n_estimators, n_jobs=n_jobs, random_state=random_state)
+
+
+def write_atomic(src, dest):
+    tmp = f"{dest}.tmp-{os.getpid()}"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+def promote(version_dir):
+    """ Makes a trained version the one the web app serves. """
+    # Each file is replaced atomically, but not all of them together. A worker that checks in
+    # between sees files that don't match the manifest's digests and keeps its current model;
+    # the manifest goes last, so it swaps once every file has landed.
+    write_atomic(os.path.join(version_dir, 'columns.pkl'), COLUMNS_PATH)
+    write_atomic(os.path.join(version_dir, 'model.pkl'), MODEL_PATH)
+    write_atomic(os.path.join(version_dir, 'frequencies.npz'), FREQUENCIES_PATH)
+    write_atomic(os.path.join(version_dir, 'manifest.json'), MANIFEST_PATH)
+
+
+def write_version(out, model, columns, X, y, info, name=None):
+    """ Writes a fitted model as out/<version>/. `info` holds the run's own manifest fields. Returns (version_dir, manifest). """
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    version = f"{stamp}-{info['training_data_sha256'][:8]}" + (f"-{name}" if name else '')
+    version_dir = os.path.join(out, version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    model_file = os.path.join(version_dir, 'model.pkl')
+    columns_file = os.path.join(version_dir, 'columns.pkl')
+    frequencies_file = os.path.join(version_dir, 'frequencies.npz')
+    joblib.dump(model, model_file)
+    joblib.dump(columns, columns_file)
+    SymptomFrequencies.from_matrix(X, y, columns).save(frequencies_file)
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "algorithm": type(model).__name__,
+        "sklearn_version": sklearn.__version__,
+        "columns": columns,
+        "classes": [str(c) for c in model.classes_],
+        "training_rows": int(X.shape[0]),
+        **info,
+        "model_sha256": file_digest(model_file),
+        "model_bytes": os.path.getsize(model_file),
+        # The app only serves the files once all three digests match (see model_registry.py).
+        "columns_sha256": file_digest(columns_file),
+        "frequencies_sha256": file_digest(frequencies_file),
+    }
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return version_dir, manifest
+
+
+def train(args):
+    start = time.perf_counter()
+    X, y, columns, data_hash = load_training_data(args.data, args.max_rows)
+    load_seconds = time.perf_counter() - start
+
+    model = build_model(args.n_estimators, args.n_jobs)
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+    # Parallelism is for fitting only; a web request scoring one row shouldn't fan out to a thread pool.
+    model.set_params(n_jobs=None)
+
+    accuracy = None
+    if args.test and os.path.exists(args.test):
+        X_test, y_test, test_columns = read_symptom_csv(args.test)
+        X_test = align_columns(X_test, test_columns, columns)
+        accuracy = float((model.predict(X_test) == y_test).mean())
+
+    return write_version(args.out, model, columns, X, y, {
+        "params": {"n_estimators": args.n_estimators, "n_jobs": args.n_jobs, "random_state": 42},
+        "training_data": os.path.basename(os.path.normpath(args.data)),
+        "training_data_sha256": data_hash,
+        "load_seconds": round(load_seconds, 3),
+        "fit_seconds": round(fit_seconds, 3),
+        "test_data": os.path.basename(args.test) if accuracy is not None else None,
+        "test_accuracy": accuracy,
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and version the HealthBot disease model.")
+    parser.add_argument('--data', default=DATASET_PATH, help="symptom CSV, or a dataset directory from generate_data.py")
+    parser.add_argument('--max-rows', type=int, help="train on only the first N rows")
+    parser.add_argument('--test', default=TEST_PATH)
+    parser.add_argument('--out', default=ARTIFACTS_DIR)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--n-jobs', type=int, default=-1, help="cores used for fitting (-1 = all)")
+    parser.add_argument('--no-promote', action='store_true', help="don't make this version the served model")
+    args = parser.parse_args(argv)
+
+    version_dir, manifest = train(args)
+    print(f"Trained {manifest['version']} on {manifest['training_rows']} rows in {manifest['fit_seconds']}s")
+    if manifest['test_accuracy'] is not None:
+        print(f"Accuracy on {manifest['test_data']}: {manifest['test_accuracy']:.4f}")
+    if not args.no_promote:
+        promote(version_dir)
+        print(f"Promoted {version_dir} -> {MODEL_PATH}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())